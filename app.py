@@ -1,11 +1,15 @@
 import streamlit as st
-import altair as alt
 import psycopg2
 import plotly.express as px
+import pandas as pd
 from dotenv import load_dotenv
 import os
-from db import run_query
+from db import run_query, sincronizar_versoes
 import plot_querys as pq
+import queries as q
+import leaderboards as lb
+from metrics import start_exporter
+from prefetch import aquecer_cache, carregar_aba, limpar_abas, tarefas_artistas, tarefas_geral, tarefas_usuario
 
 # ----------------------------------------
 # 1. Função para carregar o CSS
@@ -56,6 +60,7 @@ if not st.session_state.logged_in:
 def do_logout():
     st.session_state.logged_in = False
     st.session_state.username = ""
+    limpar_abas()  # Os dados guardados eram do usuário que saiu
     st.switch_page("pages/login.py") # Redireciona de volta ao login
 
 # ----------------------------------------
@@ -63,6 +68,16 @@ def do_logout():
 # ----------------------------------------
 load_css("app.css") # <-- Carrega o arquivo .css da página
 
+# Sobe (uma vez por processo) o refresh periódico dos rankings materializados
+# e o aquecimento do cache das consultas globais
+lb.start_scheduler()
+aquecer_cache()
+start_exporter()
+
+# Uma leitura barata de table_versions por rerun: invalida no cache só o que
+# depende das tabelas que mudaram
+sincronizar_versoes()
+
 # ----------------------------------------
 # 3. Layout do Dashboard (SÓ EXECUTA SE ESTIVER LOGADO)
 # ----------------------------------------
@@ -88,91 +103,108 @@ with col2:
     #st.image("assets\images\logo_spotify.svg", width=200)
     st.markdown("<p class='image-label'>Um dashboard sobre uma aplicação análoga ao Spotify</p>", unsafe_allow_html=True)
 
-# Sistema de Tabs
-tab1, tab2, tab3 = st.tabs(["📊 Visão Geral", "🎤 Análise Artistas", "👤 Análise do Usuário"])
+user_id_logado = st.session_state.user_id
+
+# Sistema de Tabs (lazy): só a aba ativa roda queries e monta gráficos.
+# Os dados de cada aba são buscados em paralelo na primeira vez que ela é
+# aberta e ficam guardados na sessão.
+ABAS = ["📊 Visão Geral", "🎤 Análise Artistas", "👤 Análise do Usuário"]
+aba_ativa = st.radio("Aba", ABAS, horizontal=True, key="aba_ativa",
+                     label_visibility="collapsed")
 
 
 # TAB 1: Visão Geral
-with tab1:
+if aba_ativa == ABAS[0]:
+    dados = carregar_aba("geral", tarefas_geral())
+
     st.markdown("<div class='content-box'>", unsafe_allow_html=True)
     st.header("📊 Visão Geral")
 
+    # Todos os dados da aba em uma única query
+    overview = dados.get("overview", q.build_overview_snapshot({}),
+                         "Erro ao carregar a visão geral")
+
     # Placeholder para gráficos
     col1, col2= st.columns(2)
 
     with col1:
-        pq.plot_total_musicas()
-        pq.plot_total_artistas()
+        pq.plot_total_musicas(overview)
+        pq.plot_total_artistas(overview)
         st.subheader("Top 5 Músicas Mais Reproduzidas: 🎧")
-        pq.plot_top5_musicas_geral()
+        pq.plot_top5_musicas_geral(overview)
         st.subheader("Top 5 álbuns mais salvos pelos usuários ⭐")
-        pq.plot_top_5_albuns_salvos()
+        pq.plot_top_5_albuns_salvos(overview)
 
     with col2:
-        pq.plot_total_album()
-        pq.plot_total_podcast()
+        pq.plot_total_album(overview)
+        pq.plot_total_podcast(overview)
         st.subheader("Top 10 álbuns com mais Faixas 💿")
-        pq.plot_top_10_albuns()
+        pq.plot_top_10_albuns(overview)
         st.subheader("Top 5 podcasts mais seguidos 📈")
-        pq.plot_top_5_podcasts_seguidos()
+        pq.plot_top_5_podcasts_seguidos(overview)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
 
 # TAB 2: Análise de Artistas
 
-with tab2:
+elif aba_ativa == ABAS[1]:
+    dados = carregar_aba("artistas", tarefas_artistas())
+
     st.header("🎤 Análise dos Artistas")
     st.subheader("Destaques da Categoria")
     col1, col2= st.columns(2)
     with col1:
-        pq.plot_artista_mais_seguido()
+        pq.plot_artista_mais_seguido(dados.get("art_mais_seguidores", pd.DataFrame()))
     with col2:
-        pq.plot_artista_mais_mus_publi()
+        pq.plot_artista_mais_mus_publi(dados.get("art_mais_mus_publi", pd.DataFrame()))
     st.markdown("---")
-    pq.plot_info_artista()
+    pq.plot_info_artista(dados.get("tops", q.TopsPorArtista(), "Erro ao carregar os rankings dos artistas"))
 
 # TAB 3: Análise do Usuário
 
-with tab3:
-    # Pegue o ID do usuário da sessão
-    user_id_logado = st.session_state.user_id
+else:
+    dados = carregar_aba("usuario", tarefas_usuario(user_id_logado))
+
+    # Nome do usuário da sessão
     username_logado = st.session_state.username
 
     st.markdown("<div class='content-box'>", unsafe_allow_html=True)
     st.header(f"👤 Análise de {st.session_state.username}")  # Nome vindo do login
     st.subheader("Suas estatísticas pessoais")
 
-    # Métricas do usuário
+    # Métricas do usuário (todas derivadas de uma única leitura das escutas)
+    profile = dados.get("profile", q.build_user_profile(pd.DataFrame()),
+                        "Erro ao carregar suas estatísticas")
 
     col1, col2, col3, col4, col5 = st.columns(5)
 
     with col1:
-        pq.plot_total_musicas_user(user_id_logado)
+        pq.plot_total_musicas_user(profile)
 
     with col2:
-        pq.plot_tempo_total_escutado(user_id_logado)
+        pq.plot_tempo_total_escutado(profile)
 
     with col3:
-        pq.plot_genero_musica_preferido(user_id_logado)
+        pq.plot_genero_musica_preferido(profile)
 
     with col4:
-        pq.plot_musica_favorita(user_id_logado)
+        pq.plot_musica_favorita(profile)
 
     with col5:
-        pq.plot_artista_favorito(user_id_logado)
+        pq.plot_artista_favorito(profile)
 
     st.markdown("---")
 
     st.subheader("📈 Análise de estatísticas")
     with st.expander("Ver estatísticas detalhadas"):
-        pq.plot_top5_musicas_usuario(user_id_logado)
+        pq.plot_top5_musicas_usuario(profile)
 
         col1, col2 =st.columns(2)
         with col1:
-            pq.plot_top5_genero_musicas_ouvidas(user_id_logado)
+            pq.plot_top5_genero_musicas_ouvidas(profile)
         with col2:    
-            pq.plot_top5_artistas_ouvidos(user_id_logado)
+            pq.plot_top5_artistas_ouvidos(profile)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
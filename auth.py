@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+from dotenv import load_dotenv
+
+from cache import get_cache
+from db import init_connection, raise_query_errors, sincronizar_versoes
+from metrics import get_metrics
+
+# ----------------------------------------
+# Busca da conta no login
+# ----------------------------------------
+# Fora do run_query: o login precisa enxergar contas recém-criadas e não deve
+# ocupar o cache de resultados com um DataFrame por nome digitado. A busca lê
+# só o índice conta_usuario_idx (migration 006). Apenas os nomes que NÃO
+# existem são guardados, num cache pequeno (LRU + TTL) para tentativas
+# repetidas, e descartados assim que Conta muda (table_versions).
+
+
+class CacheNegativo:
+    def __init__(self, max_itens, ttl):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # nome de usuário -> (expira_em, versão de Conta quando foi guardado)
+        self._itens = OrderedDict()
+
+    def contem(self, nome, versao):
+        with self._lock:
+            item = self._itens.get(nome)
+            if item is None:
+                return False
+            expira_em, versao_guardada = item
+            if versao_guardada != versao or time.monotonic() >= expira_em:
+                del self._itens[nome]
+                return False
+            self._itens.move_to_end(nome)
+            return True
+
+    def adicionar(self, nome, versao):
+        with self._lock:
+            self._itens[nome] = (time.monotonic() + self.ttl, versao)
+            self._itens.move_to_end(nome)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._itens)
+
+
+@st.cache_resource
+def _cache_negativo():
+    load_dotenv()
+    return CacheNegativo(
+        max_itens=int(os.getenv("AUTH_NEGATIVE_CACHE_SIZE") or 1024),
+        ttl=float(os.getenv("AUTH_NEGATIVE_CACHE_SECONDS") or 60),
+    )
+
+
+def buscar_conta(nome_de_usuario):
+    # (id, nome_de_usuario) da conta, ou None se ela não existir.
+    # Erros de conexão ou de banco são propagados para o login mostrar.
+    metrics = get_metrics()
+    sincronizar_versoes()
+    versao = get_cache().versoes({"conta"})
+    negativos = _cache_negativo()
+    if negativos.contem(nome_de_usuario, versao):
+        metrics.registrar_cache("buscar_conta", "hit")
+        return None
+    metrics.registrar_cache("buscar_conta", "miss")
+
+    inicio = time.perf_counter()
+    try:
+        with raise_query_errors():
+            engine = init_connection()
+        with engine.connect() as conn:
+            linha = conn.exec_driver_sql(
+                "SELECT id, nome_de_usuario FROM Conta WHERE nome_de_usuario = %s LIMIT 1;",
+                (nome_de_usuario,)).first()
+    except Exception:
+        metrics.registrar_erro("buscar_conta")
+        raise
+    metrics.registrar_query("buscar_conta", time.perf_counter() - inicio, int(linha is not None), 0)
+
+    if linha is None:
+        negativos.adicionar(nome_de_usuario, versao)
+        return None
+    return int(linha[0]), linha[1]
@@ -0,0 +1,215 @@
+"""Benchmark de todas as funções de queries.py e dos renderers de plot_querys.py.
+
+Uso (a partir da raiz do repositório, com o .env apontando para um Postgres local):
+
+    python -m bench.benchmark --scale 1                    # compara com a baseline, se existir
+    python -m bench.benchmark --scale 1 --salvar-baseline  # grava bench/baselines/sf1.json
+    python -m bench.benchmark --scales 1 5 10 --gerar      # gera os dados de cada scale antes
+
+Cada query roda com o cache do run_query vazio, então o tempo medido é o do
+banco + pandas. Os renderers recebem os dados já buscados e medem só a
+montagem dos gráficos (o Streamlit roda em "bare mode", sem desenhar nada).
+"""
+import argparse
+import inspect
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+import streamlit.config
+import streamlit.logger
+
+# Sem os avisos de "bare mode" do Streamlit ao rodar pela linha de comando
+streamlit.config.set_option("logger.level", "error")
+streamlit.logger.set_log_level("error")
+
+import leaderboards as lb  # noqa: E402
+import plot_querys as pq  # noqa: E402
+import queries as q  # noqa: E402
+from cache import get_cache  # noqa: E402
+from db import init_connection  # noqa: E402
+
+DIR_BASELINES = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+def _amostras(engine, n):
+    # Ids reais para os parâmetros: os usuários e artistas mais ativos
+    consultas = {
+        "usuarios": "SELECT id_da_conta FROM EscutaMusica GROUP BY id_da_conta "
+                    "ORDER BY COUNT(*) DESC LIMIT %(n)s",
+        "musicos": "SELECT c.id_do_artista FROM Conteudo c JOIN Album a ON a.id_album = c.id "
+                   "GROUP BY c.id_do_artista ORDER BY COUNT(*) DESC LIMIT %(n)s",
+        "podcasters": "SELECT c.id_do_artista FROM Conteudo c JOIN Podcast p ON p.id_podcast = c.id "
+                      "GROUP BY c.id_do_artista ORDER BY COUNT(*) DESC LIMIT %(n)s",
+        # Buscas de artista: o começo de nomes reais
+        "termos": "SELECT DISTINCT left(c.nome, 4) FROM Artista a JOIN Conta c ON c.id = a.id_do_artista "
+                  "LIMIT %(n)s",
+    }
+    with engine.connect() as conn:
+        amostras = {nome: pd.read_sql(sql, conn, params={"n": n}).iloc[:, 0].tolist()
+                    for nome, sql in consultas.items()}
+    amostras["artistas"] = amostras["musicos"] + amostras["podcasters"]
+    return amostras
+
+
+# Nome do parâmetro -> grupo de ids usado para preenchê-lo
+PARAMETROS = {
+    "user_id": "usuarios",
+    "id_artista": "artistas",
+    "termo": "termos",
+}
+
+
+def _argumentos(funcao, amostras, rodada):
+    # Monta os argumentos de uma função de queries.py (None se não souber preencher)
+    args = []
+    for parametro in inspect.signature(funcao).parameters.values():
+        if parametro.default is not parametro.empty:
+            continue
+        grupo = PARAMETROS.get(parametro.name)
+        if grupo is None or not amostras[grupo]:
+            return None
+        ids = amostras[grupo]
+        args.append(ids[rodada % len(ids)])
+    return args
+
+
+def _cronometrar(funcao, args, repeticoes, antes=None):
+    tempos = []
+    for rodada in range(repeticoes + 1):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        funcao(*args(rodada))
+        if rodada:  # a primeira rodada só aquece
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def _cache_frio():
+    # Esvazia o cache, mas mantém a lista de leaderboards disponíveis (não é o que medimos)
+    get_cache().clear()
+    lb.disponiveis()
+
+
+def medir_queries(amostras, repeticoes):
+    resultados = {}
+    for nome, funcao in inspect.getmembers(q, inspect.isfunction):
+        if not nome.startswith("get_") or funcao.__module__ != q.__name__:
+            continue
+        if _argumentos(funcao, amostras, 0) is None:
+            print(f"  (pulando {nome}: parâmetros desconhecidos)", file=sys.stderr)
+            continue
+        resultados[f"queries.{nome}"] = _cronometrar(
+            funcao, lambda rodada: _argumentos(funcao, amostras, rodada), repeticoes, antes=_cache_frio)
+    return resultados
+
+
+def medir_renderers(amostras, repeticoes):
+    # Dados de entrada de cada renderer, buscados uma única vez
+    usuario = amostras["usuarios"][0] if amostras["usuarios"] else 0
+    dados = {
+        "overview": q.get_overview_snapshot(),
+        "profile": q.get_user_profile(usuario),
+        "df_mais_seguidores": q.get_art_mais_seguidores(),
+        "df_mais_music_publicada": q.get_art_mais_mus_publi(),
+        "tops_por_artista": q.get_tops_por_artista(),
+        "snapshot": q.get_artist_snapshot(amostras["musicos"][0]) if amostras["musicos"] else None,
+    }
+    resultados = {}
+    for nome, funcao in inspect.getmembers(pq, inspect.isfunction):
+        if "plot_" not in nome or funcao.__module__ != pq.__name__:
+            continue
+        parametros = list(inspect.signature(funcao).parameters)
+        if any(dados.get(p) is None for p in parametros):
+            print(f"  (pulando {nome}: sem dados de entrada)", file=sys.stderr)
+            continue
+        args = [dados[p] for p in parametros]
+        resultados[f"plot_querys.{nome}"] = _cronometrar(funcao, lambda rodada: args, repeticoes)
+    return resultados
+
+
+def resumir(tempos):
+    linhas = []
+    for nome, amostras_ms in tempos.items():
+        serie = pd.Series(amostras_ms)
+        linhas.append({"funcao": nome, "p50_ms": serie.quantile(0.5),
+                       "p95_ms": serie.quantile(0.95), "media_ms": serie.mean()})
+    return pd.DataFrame(linhas).set_index("funcao").sort_index()
+
+
+def comparar(resumo, baseline, limite):
+    # Diferença de p50/p95 contra a baseline; regressão = piorou mais que o limite (e > 1 ms)
+    base = pd.DataFrame(baseline).T
+    comparacao = resumo.join(base[["p50_ms", "p95_ms"]], rsuffix="_base", how="left")
+    for coluna in ("p50_ms", "p95_ms"):
+        comparacao[f"{coluna}_delta_%"] = (comparacao[coluna] / comparacao[f"{coluna}_base"] - 1) * 100
+    comparacao["regressao"] = (
+        (comparacao["p95_ms_delta_%"] > limite)
+        & (comparacao["p95_ms"] - comparacao["p95_ms_base"] > 1.0)
+    )
+    return comparacao
+
+
+def _caminho_baseline(scale):
+    return os.path.join(DIR_BASELINES, f"sf{scale:g}.json")
+
+
+def rodar(scale, repeticoes, n_amostras, salvar, limite):
+    engine = init_connection()
+    if engine is None:
+        sys.exit("Não foi possível conectar ao banco (verifique o .env).")
+
+    amostras = _amostras(engine, n_amostras)
+    tempos = {**medir_queries(amostras, repeticoes), **medir_renderers(amostras, repeticoes)}
+    resumo = resumir(tempos)
+
+    print(f"\n=== Scale factor {scale:g} ({repeticoes} repetições) ===")
+    caminho = _caminho_baseline(scale)
+    regressoes = 0
+    if os.path.exists(caminho) and not salvar:
+        with open(caminho) as f:
+            comparacao = comparar(resumo, json.load(f), limite)
+        print(comparacao.round(2).to_string())
+        regressoes = int(comparacao["regressao"].sum())
+        if regressoes:
+            print(f"\n{regressoes} regressão(ões) acima de {limite:g}% no p95.")
+    else:
+        print(resumo.round(2).to_string())
+
+    if salvar:
+        os.makedirs(DIR_BASELINES, exist_ok=True)
+        with open(caminho, "w") as f:
+            json.dump(resumo.round(3).to_dict(orient="index"), f, indent=2, sort_keys=True)
+        print(f"\nBaseline salva em {caminho}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, help="scale factor dos dados já carregados")
+    parser.add_argument("--scales", type=float, nargs="+", help="vários scale factors (use com --gerar)")
+    parser.add_argument("--gerar", action="store_true", help="gera (--reset) os dados de cada scale antes")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--amostras", type=int, default=5, help="ids distintos por parâmetro")
+    parser.add_argument("--salvar-baseline", action="store_true")
+    parser.add_argument("--limite", type=float, default=25.0, help="%% de piora no p95 que conta como regressão")
+    parser.add_argument("--falhar-em-regressao", action="store_true", help="sai com código 1 se houver regressão")
+    args = parser.parse_args(argv)
+
+    scales = args.scales or [args.scale if args.scale is not None else 1.0]
+    regressoes = 0
+    for scale in scales:
+        if args.gerar:
+            from bench import gerar_dados
+            gerar_dados.main(["--scale", str(scale), "--reset"])
+        regressoes += rodar(scale, args.repeticoes, args.amostras, args.salvar_baseline, args.limite)
+
+    if regressoes and args.falhar_em_regressao:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
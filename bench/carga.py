@@ -0,0 +1,140 @@
+"""Teste de carga: muitas sessões simultâneas, caminho com threads contra o assíncrono.
+
+Uso (a partir da raiz do repositório, com o .env apontando para um Postgres local):
+
+    python -m bench.carga                          # 200 sessões, 32 threads
+    python -m bench.carga --sessoes 500 --threads 64
+
+Cada sessão faz o que um visitante faz ao abrir as abas de artista e de usuário
+com um usuário, um artista e uma busca diferentes: perfil, snapshot do artista
+e uma página da busca. Parâmetros distintos entre sessões fazem todas as
+queries passarem pelo banco (o cache é limpo antes de cada caminho).
+
+- threads: as sessões rodam num ThreadPoolExecutor com --threads threads,
+  como as threads de script e de prefetch do Streamlit;
+- async: todas as sessões são corrotinas esperadas juntas (asyncio.gather) no
+  event loop do db_async, limitadas pelo semáforo (DB_ASYNC_MAX_CONCURRENCY).
+
+Mostra sessões por segundo, latência p50/p95 por sessão e o pico de threads
+do processo em cada caminho.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit.config
+import streamlit.logger
+
+# Sem os avisos de "bare mode" do Streamlit ao rodar pela linha de comando
+streamlit.config.set_option("logger.level", "error")
+streamlit.logger.set_log_level("error")
+
+import db_async  # noqa: E402
+import queries as q  # noqa: E402
+import queries_async as qa  # noqa: E402
+from cache import get_cache  # noqa: E402
+from db import init_connection, raise_query_errors  # noqa: E402
+
+
+def _parametros(engine, n):
+    # (usuário, artista, termo de busca) de cada sessão, repetindo se faltarem ids
+    with engine.connect() as conn:
+        usuarios = pd.read_sql("SELECT DISTINCT id_da_conta FROM EscutaMusica;", conn).iloc[:, 0].tolist()
+        artistas = pd.read_sql("SELECT id_do_artista FROM Artista;", conn).iloc[:, 0].tolist()
+        termos = pd.read_sql("SELECT DISTINCT left(c.nome, 5) FROM Artista a "
+                             "JOIN Conta c ON c.id = a.id_do_artista;", conn).iloc[:, 0].tolist()
+    return [(int(usuarios[i % len(usuarios)]), int(artistas[i % len(artistas)]), termos[i % len(termos)])
+            for i in range(n)]
+
+
+class _PicoThreads:
+    # Amostra threading.active_count() enquanto o caminho roda
+    def __init__(self):
+        self.pico = threading.active_count()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def _amostrar(self):
+        while not self._parar.wait(0.01):
+            self.pico = max(self.pico, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+
+# As sessões devolvem o instante em que terminaram; a latência conta desde o
+# início do caminho, incluindo a espera por uma thread ou pelo semáforo
+
+def _sessao(usuario, artista, termo):
+    with raise_query_errors():
+        q.get_user_profile(usuario)
+        q.get_artist_snapshot(artista)
+        q.get_artistas_por_nome(termo)
+    return time.perf_counter()
+
+
+async def _asessao(usuario, artista, termo):
+    escutas, _, _ = await asyncio.gather(
+        qa.get_escutas_usuario(usuario), qa.get_artist_snapshot(artista), qa.get_artistas_por_nome(termo))
+    q.build_user_profile(escutas)
+    return time.perf_counter()
+
+
+def rodar_threads(parametros, threads):
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(lambda p: _sessao(*p), parametros))
+
+
+def rodar_async(parametros):
+    return db_async.reunir(*(_asessao(*p) for p in parametros))
+
+
+def medir(caminho, rodar):
+    get_cache().clear()
+    with _PicoThreads() as threads:
+        inicio = time.perf_counter()
+        latencias = [fim - inicio for fim in rodar()]
+        total = time.perf_counter() - inicio
+    return {
+        "caminho": caminho,
+        "sessoes_por_s": len(latencias) / total,
+        "p50_s": statistics.median(latencias),
+        "p95_s": statistics.quantiles(latencias, n=20)[-1],
+        "pico_threads": threads.pico,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessoes", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32, help="threads do caminho síncrono")
+    args = parser.parse_args(argv)
+
+    engine = init_connection()
+    if engine is None:
+        sys.exit("Não foi possível conectar ao banco (verifique o .env).")
+    parametros = _parametros(engine, args.sessoes)
+
+    # Aquecimento: abre as conexões dos dois pools antes de medir
+    rodar_threads(parametros[:8], 8)
+    rodar_async(parametros[:8])
+
+    resultados = pd.DataFrame([
+        medir("threads", lambda: rodar_threads(parametros, args.threads)),
+        medir("async", lambda: rodar_async(parametros)),
+    ])
+    print(resultados.set_index("caminho").round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Gera dados sintéticos no schema do dashboard.
+
+Uso (a partir da raiz do repositório, com o .env apontando para um Postgres local):
+
+    python -m bench.gerar_dados --scale 1 --reset
+
+A popularidade de músicas, episódios, álbuns, podcasts e artistas segue uma
+distribuição tipo Zipf, então poucos itens concentram a maior parte das
+escutas, como em um serviço de streaming real.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit.config
+import streamlit.logger
+
+# Sem os avisos de "bare mode" do Streamlit ao rodar pela linha de comando
+streamlit.config.set_option("logger.level", "error")
+streamlit.logger.set_log_level("error")
+
+from db import init_connection  # noqa: E402
+
+# Tamanho de cada tabela para scale factor 1
+BASE = {
+    "contas": 2_000,
+    "artistas": 200,
+    "albuns": 400,
+    "musicas_por_album": 10,
+    "podcasts": 60,
+    "episodios_por_podcast": 20,
+    "escutas_musica_por_conta": 30,
+    "escutas_episodio_por_conta": 5,
+    "albuns_salvos_por_conta": 3,
+    "podcasts_seguidos_por_conta": 1,
+    "artistas_seguidos_por_conta": 4,
+}
+
+GENEROS = ["Pop", "Rock", "Hip-Hop", "Sertanejo", "MPB", "Funk", "Eletrônica",
+           "Jazz", "Clássica", "Forró", "Pagode", "Indie", "Metal", "Reggae"]
+
+TABELAS = ["Conta", "Artista", "Conteudo", "Album", "Musica", "Podcast", "Episodio",
+           "EscutaMusica", "EscutaEpisodio", "SalvaAlbum", "SeguePodcast", "Seguir"]
+
+
+def _zipf_p(n, s, rng):
+    # Probabilidades ∝ 1/rank^s, com os ranks embaralhados entre os ids
+    p = 1.0 / np.arange(1, n + 1) ** s
+    rng.shuffle(p)
+    return p / p.sum()
+
+
+def _pares(rng, n_contas, n_itens, media_por_conta, s):
+    # Pares (conta, item) distintos: contas com atividade Zipf, itens com popularidade Zipf
+    total = int(n_contas * media_por_conta)
+    df = pd.DataFrame({
+        "conta": rng.choice(np.arange(1, n_contas + 1), size=total, p=_zipf_p(n_contas, 0.6, rng)),
+        "item": rng.choice(np.arange(1, n_itens + 1), size=total, p=_zipf_p(n_itens, s, rng)),
+    })
+    return df.drop_duplicates(ignore_index=True)
+
+
+def gerar(scale, seed=42, zipf_s=1.1):
+    rng = np.random.default_rng(seed)
+    n_contas, n_artistas, n_albuns, n_podcasts = (
+        max(1, int(BASE[chave] * scale)) for chave in ("contas", "artistas", "albuns", "podcasts"))
+    n_musicas = n_albuns * BASE["musicas_por_album"]
+    n_episodios = n_podcasts * BASE["episodios_por_podcast"]
+
+    tabelas = {}
+    ids_contas = np.arange(1, n_contas + 1)
+    tabelas["Conta"] = pd.DataFrame({
+        "id": ids_contas,
+        "nome": [f"Conta {i}" for i in ids_contas],
+        "nome_de_usuario": [f"usuario{i}" for i in ids_contas],
+    })
+    # As primeiras contas são artistas; os últimos 20% deles são podcasters
+    ids_artistas = np.arange(1, n_artistas + 1)
+    tabelas["Artista"] = pd.DataFrame({"id_do_artista": ids_artistas})
+    n_musicos = max(1, int(n_artistas * 0.8))
+    musicos, podcasters = ids_artistas[:n_musicos], ids_artistas[n_musicos:]
+    if len(podcasters) == 0:
+        podcasters = ids_artistas[-1:]
+
+    # Conteúdo: álbuns com ids 1..n_albuns, podcasts logo em seguida
+    ids_albuns = np.arange(1, n_albuns + 1)
+    ids_podcasts = np.arange(n_albuns + 1, n_albuns + n_podcasts + 1)
+    tabelas["Conteudo"] = pd.DataFrame({
+        "id": np.concatenate([ids_albuns, ids_podcasts]),
+        "nome": [f"Álbum {i}" for i in ids_albuns] + [f"Podcast {i}" for i in ids_podcasts],
+        "genero": rng.choice(GENEROS, size=n_albuns + n_podcasts),
+        "id_do_artista": np.concatenate([
+            rng.choice(musicos, size=n_albuns, p=_zipf_p(len(musicos), 0.8, rng)),
+            rng.choice(podcasters, size=n_podcasts),
+        ]),
+    })
+    tabelas["Album"] = pd.DataFrame({"id_album": ids_albuns})
+    tabelas["Podcast"] = pd.DataFrame({"id_podcast": ids_podcasts})
+
+    ids_musicas = np.arange(1, n_musicas + 1)
+    duracoes = rng.integers(90, 420, size=n_musicas)
+    tabelas["Musica"] = pd.DataFrame({
+        "id_da_musica": ids_musicas,
+        "nome": [f"Música {i}" for i in ids_musicas],
+        "genero": rng.choice(GENEROS, size=n_musicas),
+        "tempo_de_duracao": [f"00:{d // 60:02d}:{d % 60:02d}" for d in duracoes],
+        "id_album": np.repeat(ids_albuns, BASE["musicas_por_album"]),
+    })
+    ids_episodios = np.arange(1, n_episodios + 1)
+    tabelas["Episodio"] = pd.DataFrame({
+        "id_episodio": ids_episodios,
+        "nome": [f"Episódio {i}" for i in ids_episodios],
+        "id_podcast": np.repeat(ids_podcasts, BASE["episodios_por_podcast"]),
+    })
+
+    escutas = _pares(rng, n_contas, n_musicas, BASE["escutas_musica_por_conta"], zipf_s)
+    tabelas["EscutaMusica"] = pd.DataFrame({
+        "id_da_conta": escutas["conta"], "id_da_musica": escutas["item"],
+        "numero_reproducoes": rng.zipf(1.8, size=len(escutas)).clip(max=10_000),
+    })
+    escutas = _pares(rng, n_contas, n_episodios, BASE["escutas_episodio_por_conta"], zipf_s)
+    tabelas["EscutaEpisodio"] = pd.DataFrame({
+        "id_da_conta": escutas["conta"], "id_episodio": escutas["item"],
+        "numero_reproducoes": rng.zipf(1.8, size=len(escutas)).clip(max=10_000),
+    })
+    salvos = _pares(rng, n_contas, n_albuns, BASE["albuns_salvos_por_conta"], zipf_s)
+    tabelas["SalvaAlbum"] = pd.DataFrame({"id_da_conta": salvos["conta"], "id_album": salvos["item"]})
+    seguidos = _pares(rng, n_contas, n_podcasts, BASE["podcasts_seguidos_por_conta"], zipf_s)
+    tabelas["SeguePodcast"] = pd.DataFrame({
+        "id_da_conta": seguidos["conta"], "id_podcast": ids_podcasts[seguidos["item"] - 1]})
+    seguir = _pares(rng, n_contas, n_artistas, BASE["artistas_seguidos_por_conta"], zipf_s)
+    tabelas["Seguir"] = pd.DataFrame({"id_do_usuario": seguir["conta"], "id_da_conta": seguir["item"]})
+    return tabelas
+
+
+def carregar(engine, tabelas, reset=False):
+    # Cria o schema se preciso e carrega cada tabela com COPY
+    schema = open(os.path.join(os.path.dirname(__file__), "schema.sql")).read()
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(schema)
+        if reset:
+            cursor.execute(f"TRUNCATE {', '.join(TABELAS)} CASCADE;")
+        else:
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM Conta);")
+            if cursor.fetchone()[0]:
+                raise SystemExit("As tabelas já têm dados; use --reset para apagá-las antes.")
+        for nome in TABELAS:
+            df = tabelas[nome]
+            buffer = io.StringIO()
+            df.to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {nome} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(f"ANALYZE {', '.join(TABELAS)};")
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="scale factor (1 = ~60 mil escutas)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--zipf", type=float, default=1.1, help="expoente da popularidade dos itens")
+    parser.add_argument("--reset", action="store_true", help="apaga (TRUNCATE) as tabelas antes de carregar")
+    args = parser.parse_args(argv)
+
+    engine = init_connection()
+    if engine is None:
+        sys.exit("Não foi possível conectar ao banco (verifique o .env).")
+
+    inicio = time.perf_counter()
+    tabelas = gerar(args.scale, args.seed, args.zipf)
+    carregar(engine, tabelas, reset=args.reset)
+    linhas = ", ".join(f"{nome}={len(df)}" for nome, df in tabelas.items())
+    print(f"Scale factor {args.scale}: {linhas} ({time.perf_counter() - inicio:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Confere os leaderboards incrementais (migration 005) contra o agregado ao vivo.
+
+Uso (a partir da raiz do repositório, com o .env apontando para o banco):
+
+    python -m bench.incrementais               # compara o estado atual
+    python -m bench.incrementais --cenarios    # também roda os cenários de escrita
+
+Para cada leaderboard incremental pronto, o top-K guardado lido como o app
+lê (leaderboards.fonte com n <= K, depois da junção com os nomes) e o
+ranking inteiro (leaderboard_totais) precisam bater com a SQL da view. O
+script sai com código 1 se algum divergir.
+
+Os cenários escrevem no banco, atualizam os leaderboards, conferem e no fim
+removem o que criaram (use um banco de teste, como o do bench.gerar_dados):
+
+  contas_seguidas  contas que não são artistas com mais seguidores que o
+                   artista mais seguido, e depois uma delas virando artista
+"""
+import argparse
+import sys
+
+import streamlit.config
+import streamlit.logger
+
+# Sem os avisos de "bare mode" do Streamlit ao rodar pela linha de comando
+streamlit.config.set_option("logger.level", "error")
+streamlit.logger.set_log_level("error")
+
+import leaderboards as lb  # noqa: E402
+from db import init_connection  # noqa: E402
+
+
+def _ranking(conn, fonte, definicao, n=None):
+    # [(chave, total)] em ordem de ranking, como o rankings.top_n desempata
+    limite = f" LIMIT {int(n)}" if n is not None else ""
+    return [tuple(linha) for linha in conn.exec_driver_sql(f"""
+        SELECT {definicao['chave']}, {definicao['ordem']} FROM {fonte}
+        WHERE {definicao['ordem']} > 0
+        ORDER BY {definicao['ordem']} DESC, {definicao['chave']}{limite};""")]
+
+
+def divergencias(engine, n=lb.TOPK):
+    problemas = []
+    with engine.connect() as conn:
+        prontos = {linha[0] for linha in conn.exec_driver_sql(
+            "SELECT leaderboard FROM leaderboard_incremental WHERE NOT recalcular;")}
+        for nome, definicao in lb.LEADERBOARDS.items():
+            if definicao.get("incremental", {}).get("nome") not in prontos:
+                continue
+            ao_vivo = _ranking(conn, f"({definicao['sql']}) AS ao_vivo", definicao)
+            if _ranking(conn, lb.fonte(nome, n), definicao, n) != ao_vivo[:n]:
+                problemas.append(f"{nome}: top-{n} diferente do agregado ao vivo")
+            if _ranking(conn, lb.fonte(nome), definicao) != ao_vivo:
+                problemas.append(f"{nome}: leaderboard_totais diferente do agregado ao vivo")
+    return problemas
+
+
+def cenario_contas_seguidas(engine, contas=3):
+    # Seguir também guarda contas comuns seguidas; elas não podem ocupar o
+    # top-K do ranking de artistas (mv_art_seguidores)
+    definicao = lb.LEADERBOARDS["mv_art_seguidores"]
+    problemas = []
+    seguidas = []
+    promovida = None
+    with engine.connect() as conn:
+        maior = conn.exec_driver_sql(
+            f"SELECT COALESCE(MAX(total_seguidores), 0) FROM ({definicao['sql']}) AS ao_vivo;").scalar()
+        alvos = [linha[0] for linha in conn.exec_driver_sql("""
+            SELECT id FROM Conta
+            WHERE NOT EXISTS (SELECT 1 FROM Artista WHERE id_do_artista = Conta.id)
+            ORDER BY id LIMIT %s;""", (contas,))]
+        try:
+            for i, alvo in enumerate(alvos):
+                novas = conn.exec_driver_sql("""
+                    INSERT INTO Seguir (id_do_usuario, id_da_conta)
+                    SELECT c.id, %(alvo)s FROM Conta c
+                    WHERE c.id <> %(alvo)s AND NOT EXISTS (
+                        SELECT 1 FROM Seguir s WHERE s.id_do_usuario = c.id AND s.id_da_conta = %(alvo)s)
+                    ORDER BY c.id LIMIT %(n)s
+                    RETURNING id_do_usuario;""", {"alvo": alvo, "n": maior + 1 + i}).all()
+                seguidas += [(linha[0], alvo) for linha in novas]
+                if len(novas) <= maior:
+                    print(f"  (contas_seguidas: contas insuficientes para passar de {maior} seguidores)",
+                          file=sys.stderr)
+                    return problemas
+            lb.atualizar_incrementais(engine)
+            problemas += [f"contas_seguidas: {p}" for p in divergencias(engine)]
+
+            # A conta mais seguida vira artista: o total é refeito e ela assume o topo
+            promovida = alvos[-1]
+            conn.exec_driver_sql("INSERT INTO Artista (id_do_artista) VALUES (%s);", (promovida,))
+            lb.atualizar_incrementais(engine)
+            problemas += [f"contas_seguidas (nova artista): {p}" for p in divergencias(engine)]
+            topo = _ranking(conn, lb.fonte("mv_art_seguidores", 1), definicao, 1)
+            if not topo or topo[0][0] != promovida:
+                problemas.append(f"contas_seguidas: a nova artista {promovida} não assumiu o topo ({topo})")
+        finally:
+            if seguidas:
+                usuarios, seguidos = zip(*seguidas)
+                conn.exec_driver_sql("""
+                    DELETE FROM Seguir s USING unnest(%s::integer[], %s::integer[]) AS t(usuario, conta)
+                    WHERE s.id_do_usuario = t.usuario AND s.id_da_conta = t.conta;""",
+                                     (list(usuarios), list(seguidos)))
+            if promovida is not None:
+                conn.exec_driver_sql("DELETE FROM Artista WHERE id_do_artista = %s;", (promovida,))
+            lb.atualizar_incrementais(engine)
+    return problemas
+
+
+CENARIOS = {
+    "contas_seguidas": cenario_contas_seguidas,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=lb.TOPK, help="tamanho do top-N comparado (até o K guardado)")
+    parser.add_argument("--cenarios", nargs="*", choices=list(CENARIOS),
+                        help="cenários de escrita a rodar (todos se vazio)")
+    args = parser.parse_args(argv)
+
+    engine = init_connection()
+    if engine is None:
+        sys.exit("Não foi possível conectar ao banco (verifique o .env).")
+    with engine.connect() as conn:
+        if not lb._incrementais_instalados(conn):
+            sys.exit("Leaderboards incrementais não instalados (migration 005).")
+
+    lb.ensure_leaderboards(engine)
+    lb.atualizar_incrementais(engine)
+    problemas = divergencias(engine, args.n)
+    if args.cenarios is not None:
+        for nome in args.cenarios or CENARIOS:
+            print(f"cenário {nome}...")
+            problemas += CENARIOS[nome](engine)
+
+    if problemas:
+        print(f"\n{len(problemas)} divergência(s):")
+        print("\n".join(f"  {p}" for p in problemas))
+        sys.exit(1)
+    print("\nLeaderboards incrementais iguais ao agregado ao vivo.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Compara pd.read_sql com a leitura via COPY do db.py em vários tamanhos de resultado.
+
+Uso (a partir da raiz do repositório, com o .env apontando para um Postgres local):
+
+    python -m bench.leitura                              # 1 mil, 10 mil e 100 mil linhas
+    python -m bench.leitura --linhas 1000 1000000 --repeticoes 5
+
+A query é um histórico de escutas (ids, reproduções, nome e gênero da música,
+nome do álbum), cortado com LIMIT. Tamanhos maiores que a tabela EscutaMusica
+ficam limitados a ela: gere um scale factor maior com bench.gerar_dados.
+Cada tamanho roda --repeticoes vezes em cada caminho e vale a mediana.
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import pandas as pd
+import streamlit.config
+import streamlit.logger
+
+# Sem os avisos de "bare mode" do Streamlit ao rodar pela linha de comando
+streamlit.config.set_option("logger.level", "error")
+streamlit.logger.set_log_level("error")
+
+from cache import tamanho_em_bytes  # noqa: E402
+from db import _executar_query, init_connection, raise_query_errors  # noqa: E402
+
+QUERY = """
+    SELECT em.id_da_conta, em.id_da_musica, em.numero_reproducoes,
+           m.nome, m.genero, c.nome AS nome_album
+    FROM EscutaMusica em
+    JOIN Musica m ON m.id_da_musica = em.id_da_musica
+    JOIN Conteudo c ON c.id = m.id_album
+    ORDER BY em.id_da_conta, em.id_da_musica
+    LIMIT %s;"""
+
+
+def medir(linhas, repeticoes):
+    tempos = {"read_sql": [], "copy": []}
+    df = None
+    with raise_query_errors():
+        for _ in range(repeticoes):
+            for leitura, lista in tempos.items():
+                inicio = time.perf_counter()
+                df = _executar_query(QUERY, (linhas,), leitura)
+                lista.append(time.perf_counter() - inicio)
+    read_sql, copy = (statistics.median(tempos[leitura]) for leitura in ("read_sql", "copy"))
+    return {
+        "linhas": len(df),
+        "mb": tamanho_em_bytes(df) / 1024 ** 2,
+        "read_sql_s": read_sql,
+        "copy_s": copy,
+        "ganho": read_sql / copy if copy else float("nan"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if init_connection() is None:
+        sys.exit("Não foi possível conectar ao banco (verifique o .env).")
+
+    resultados = pd.DataFrame([medir(linhas, args.repeticoes) for linhas in args.linhas])
+    print(resultados.set_index("linhas").round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
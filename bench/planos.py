@@ -0,0 +1,180 @@
+"""Verifica os planos (EXPLAIN) de todas as queries de queries.py.
+
+Uso (a partir da raiz do repositório, com o .env apontando para o banco):
+
+    python -m bench.planos                      # falha em Seq Scan de tabela de fato grande
+    python -m bench.planos --min-linhas 1000000 --permitir get_tops_por_artista
+    python -m bench.planos --forcar-indices     # para bancos pequenos (dev/CI)
+
+Cada função get_* roda uma vez com ids reais (os mesmos do benchmark), mas
+com o run_query trocado por um gravador: o SQL e os parâmetros vão para
+EXPLAIN (FORMAT JSON) em vez de serem executados. As verificações de
+disponibilidade (views, leaderboards incrementais, user_stats) também passam
+pelo run_query, então respondem com o estado lido do catálogo antes da
+captura: cada função é planejada pelo caminho que o app usaria neste banco. O script sai com código 1
+se algum plano fizer Seq Scan em uma tabela de fato com pelo menos
+--min-linhas linhas estimadas (pg_class.reltuples).
+
+Em bancos pequenos o planner prefere Seq Scan mesmo com índice; com
+--forcar-indices o EXPLAIN roda com enable_seqscan = off, então só sobra
+Seq Scan onde não existe índice que sirva, e --min-linhas passa a 0.
+"""
+import argparse
+import inspect
+import json
+import sys
+
+import pandas as pd
+import streamlit.config
+import streamlit.logger
+
+# Sem os avisos de "bare mode" do Streamlit ao rodar pela linha de comando
+streamlit.config.set_option("logger.level", "error")
+streamlit.logger.set_log_level("error")
+
+import leaderboards as lb  # noqa: E402
+import queries as q  # noqa: E402
+from bench.benchmark import _amostras, _argumentos  # noqa: E402
+from db import init_connection  # noqa: E402
+
+# Tabelas que crescem com o uso (escutas, salvamentos, seguidores)
+FATOS = ("escutamusica", "escutaepisodio", "salvaalbum", "seguepodcast", "seguir")
+
+
+def estado_do_banco(engine):
+    # O que as verificações de disponibilidade responderiam, lido direto do
+    # catálogo (as mesmas consultas de leaderboards.py e queries.py)
+    with engine.connect() as conn:
+        user_stats = conn.exec_driver_sql("SELECT to_regclass('user_artista_stats') IS NOT NULL;").scalar()
+        views = {linha[0] for linha in conn.exec_driver_sql(
+            "SELECT matviewname FROM pg_matviews WHERE ispopulated AND matviewname = ANY(%s);",
+            (list(lb.LEADERBOARDS),))}
+        prontos = set()
+        if conn.exec_driver_sql("SELECT to_regclass('leaderboard_incremental') IS NOT NULL;").scalar():
+            prontos = {linha[0] for linha in conn.exec_driver_sql(
+                "SELECT leaderboard FROM leaderboard_incremental WHERE NOT recalcular;")}
+    incrementais = {nome for nome, leaderboard in lb.LEADERBOARDS.items()
+                    if leaderboard.get("incremental", {}).get("nome") in prontos}
+    return {"user_stats": bool(user_stats), "views": views, "incrementais": incrementais}
+
+
+def capturar_queries(amostras, estado):
+    # Nome da função -> lista de (sql, params) que ela mandaria ao banco
+    capturadas = {}
+    originais = (q.run_query, q._user_stats_disponivel, lb.disponiveis, lb.incrementais)
+    # Sem isso o gravador responderia às verificações com um DataFrame vazio
+    # (o caminho do user_stats nunca seria planejado) ou elas iriam ao banco
+    q._user_stats_disponivel = lambda: estado["user_stats"]
+    lb.disponiveis = lambda: set(estado["views"])
+    lb.incrementais = lambda: set(estado["incrementais"])
+    try:
+        for nome, funcao in inspect.getmembers(q, inspect.isfunction):
+            if not nome.startswith("get_") or funcao.__module__ != q.__name__:
+                continue
+            args = _argumentos(funcao, amostras, 0)
+            if args is None:
+                print(f"  (pulando {nome}: parâmetros desconhecidos)", file=sys.stderr)
+                continue
+
+            def gravar(query, params=None, nome=None, schema=None, leitura=None, _destino=capturadas.setdefault(nome, [])):
+                _destino.append((query, params))
+                return pd.DataFrame()
+
+            q.run_query = gravar
+            try:
+                funcao(*args)
+            except Exception:
+                # O pós-processamento pode falhar com o DataFrame vazio; o SQL já foi gravado
+                pass
+    finally:
+        q.run_query, q._user_stats_disponivel, lb.disponiveis, lb.incrementais = originais
+    return capturadas
+
+
+def _seq_scans(no):
+    if no.get("Node Type") == "Seq Scan":
+        yield no["Relation Name"].lower()
+    for filho in no.get("Plans", []):
+        yield from _seq_scans(filho)
+
+
+def explicar(engine, capturadas, forcar_indices=False):
+    # Uma linha por query: custo estimado e tabelas lidas com Seq Scan
+    linhas = []
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if forcar_indices:
+            cursor.execute("SET enable_seqscan = off;")
+        for nome, queries in capturadas.items():
+            for i, (query, params) in enumerate(queries):
+                cursor.execute("EXPLAIN (FORMAT JSON) " + query, params or None)
+                plano = cursor.fetchone()[0]
+                if isinstance(plano, str):
+                    plano = json.loads(plano)
+                raiz = plano[0]["Plan"]
+                linhas.append({
+                    "funcao": nome if len(queries) == 1 else f"{nome}[{i}]",
+                    "custo": raiz["Total Cost"],
+                    "linhas_estimadas": raiz["Plan Rows"],
+                    "seq_scans": sorted(set(_seq_scans(raiz))),
+                })
+        raw.rollback()
+    finally:
+        raw.close()
+    return pd.DataFrame(linhas)
+
+
+def tamanhos(engine, tabelas):
+    with engine.connect() as conn:
+        df = pd.read_sql("SELECT relname, reltuples::bigint AS linhas FROM pg_class "
+                         "WHERE relkind = 'r' AND relname = ANY(%(tabelas)s);",
+                         conn, params={"tabelas": list(tabelas)})
+    return dict(zip(df["relname"], df["linhas"]))
+
+
+def regressoes(planos, linhas_por_tabela, min_linhas, permitidas=()):
+    # Seq Scans em tabelas de fato grandes, fora da lista de funções permitidas
+    problemas = []
+    for plano in planos.itertuples():
+        if plano.funcao.split("[")[0] in permitidas:
+            continue
+        for tabela in plano.seq_scans:
+            if tabela in linhas_por_tabela and linhas_por_tabela[tabela] >= min_linhas:
+                problemas.append(f"{plano.funcao}: Seq Scan em {tabela} "
+                                 f"(~{linhas_por_tabela[tabela]} linhas)")
+    return problemas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-linhas", type=int, default=100_000,
+                        help="tamanho a partir do qual um Seq Scan em tabela de fato é regressão")
+    parser.add_argument("--tabelas", nargs="+", default=list(FATOS), help="tabelas de fato vigiadas")
+    parser.add_argument("--permitir", nargs="+", default=[], help="funções em que Seq Scan é esperado")
+    parser.add_argument("--forcar-indices", action="store_true", help="EXPLAIN com enable_seqscan = off")
+    args = parser.parse_args(argv)
+
+    engine = init_connection()
+    if engine is None:
+        sys.exit("Não foi possível conectar ao banco (verifique o .env).")
+
+    estado = estado_do_banco(engine)
+    if not estado["user_stats"]:
+        print("  (sem user_stats: get_user_profile planejado pela agregação das escutas)", file=sys.stderr)
+    planos = explicar(engine, capturar_queries(_amostras(engine, 1), estado), args.forcar_indices)
+    min_linhas = 0 if args.forcar_indices else args.min_linhas
+    linhas_por_tabela = tamanhos(engine, [t.lower() for t in args.tabelas])
+
+    with pd.option_context("display.max_colwidth", 80):
+        print(planos.set_index("funcao").sort_index().round(1).to_string())
+    problemas = regressoes(planos, linhas_por_tabela, min_linhas, set(args.permitir))
+    if problemas:
+        print(f"\n{len(problemas)} Seq Scan(s) em tabelas de fato:")
+        print("\n".join(f"  {p}" for p in problemas))
+        sys.exit(1)
+    print("\nNenhum Seq Scan em tabela de fato.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+-- Schema mínimo usado pelo dashboard, para bancos locais de benchmark.
+-- Deduzido das queries de queries.py; o banco de produção pode ter mais colunas.
+
+CREATE TABLE IF NOT EXISTS Conta (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    nome_de_usuario TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS Artista (
+    id_do_artista INTEGER PRIMARY KEY REFERENCES Conta (id)
+);
+
+CREATE TABLE IF NOT EXISTS Conteudo (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    genero TEXT,
+    id_do_artista INTEGER NOT NULL REFERENCES Artista (id_do_artista)
+);
+
+CREATE TABLE IF NOT EXISTS Album (
+    id_album INTEGER PRIMARY KEY REFERENCES Conteudo (id)
+);
+
+CREATE TABLE IF NOT EXISTS Musica (
+    id_da_musica INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    genero TEXT,
+    tempo_de_duracao INTERVAL NOT NULL,
+    id_album INTEGER NOT NULL REFERENCES Album (id_album)
+);
+
+CREATE TABLE IF NOT EXISTS Podcast (
+    id_podcast INTEGER PRIMARY KEY REFERENCES Conteudo (id)
+);
+
+CREATE TABLE IF NOT EXISTS Episodio (
+    id_episodio INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    id_podcast INTEGER NOT NULL REFERENCES Podcast (id_podcast)
+);
+
+CREATE TABLE IF NOT EXISTS EscutaMusica (
+    id_da_conta INTEGER NOT NULL REFERENCES Conta (id),
+    id_da_musica INTEGER NOT NULL REFERENCES Musica (id_da_musica),
+    numero_reproducoes INTEGER NOT NULL,
+    PRIMARY KEY (id_da_conta, id_da_musica)
+);
+
+CREATE TABLE IF NOT EXISTS EscutaEpisodio (
+    id_da_conta INTEGER NOT NULL REFERENCES Conta (id),
+    id_episodio INTEGER NOT NULL REFERENCES Episodio (id_episodio),
+    numero_reproducoes INTEGER NOT NULL,
+    PRIMARY KEY (id_da_conta, id_episodio)
+);
+
+CREATE TABLE IF NOT EXISTS SalvaAlbum (
+    id_da_conta INTEGER NOT NULL REFERENCES Conta (id),
+    id_album INTEGER NOT NULL REFERENCES Album (id_album),
+    PRIMARY KEY (id_da_conta, id_album)
+);
+
+CREATE TABLE IF NOT EXISTS SeguePodcast (
+    id_da_conta INTEGER NOT NULL REFERENCES Conta (id),
+    id_podcast INTEGER NOT NULL REFERENCES Podcast (id_podcast),
+    PRIMARY KEY (id_da_conta, id_podcast)
+);
+
+-- id_do_usuario segue a conta (artista) id_da_conta
+CREATE TABLE IF NOT EXISTS Seguir (
+    id_do_usuario INTEGER NOT NULL REFERENCES Conta (id),
+    id_da_conta INTEGER NOT NULL REFERENCES Conta (id),
+    PRIMARY KEY (id_do_usuario, id_da_conta)
+);
@@ -0,0 +1,242 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+
+# ----------------------------------------
+# Cache de resultados do run_query
+# ----------------------------------------
+# Substitui o @st.cache_data: um único cache por processo, com orçamento em
+# bytes (medido com memory_usage(deep=True)), eviction LRU ou LFU, TTL por
+# query e contadores de hit/miss/eviction para a página de admin.
+#
+# Cada entrada também guarda as tabelas que a query lê e a versão de cada uma
+# (table_versions, mantida por triggers). Quando uma tabela muda, só as
+# entradas que a leem são invalidadas, então o TTL pode ser longo.
+#
+# Stale-while-revalidate: depois do TTL a entrada ainda é servida por até
+# stale_segundos enquanto UMA atualização roda em segundo plano. Entradas
+# invalidadas por versão de tabela nunca são servidas velhas.
+
+# Tabelas do schema (e views materializadas mv_*) que marcam as entradas
+TABELAS = (
+    "conta", "artista", "conteudo", "album", "musica", "podcast", "episodio",
+    "escutamusica", "escutaepisodio", "salvaalbum", "seguepodcast", "seguir",
+    "user_stats", "user_genero_stats", "user_artista_stats",
+    "leaderboard_totais", "leaderboard_topk", "leaderboard_incremental",
+)
+_RE_TABELAS = re.compile(r"\b(" + "|".join(TABELAS) + r"|mv_\w+)\b", re.IGNORECASE)
+
+
+def tabelas_da_query(query):
+    return frozenset(nome.lower() for nome in _RE_TABELAS.findall(query))
+
+
+@dataclass
+class _Entrada:
+    nome: str
+    valor: pd.DataFrame
+    bytes: int
+    criado_em: float
+    expira_em: float
+    tabelas: frozenset = frozenset()
+    versoes: tuple = ()
+    acessos: int = 0
+
+
+def tamanho_em_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ResultCache:
+    def __init__(self, max_bytes, politica="lru", ttl_padrao=3600, ttl_por_query=None,
+                 stale_segundos=0):
+        self.max_bytes = max_bytes
+        self.stale_segundos = stale_segundos
+        self.politica = politica
+        self.ttl_padrao = ttl_padrao
+        self.ttl_por_query = dict(ttl_por_query or {})
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._contadores = {"hits": 0, "misses": 0, "stale_hits": 0, "evictions": 0,
+                            "expirations": 0, "invalidations": 0, "rejeitados": 0}
+        self._revalidando = set()
+        self._versoes_atuais = {}
+        self._ultima_sincronizacao = 0.0
+
+    def ttl(self, nome):
+        return self.ttl_por_query.get(nome, self.ttl_padrao)
+
+    def get(self, chave):
+        # Retorna (cópia do DataFrame, revalidar). O DataFrame é None se não
+        # houver entrada válida; revalidar=True quando a entrada servida já
+        # passou do TTL e quem chamou ficou responsável por atualizá-la
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self._contadores["misses"] += 1
+                return None, False
+            if entrada.versoes != self._versoes_de(entrada.tabelas):
+                self._remover(chave)
+                self._contadores["invalidations"] += 1
+                self._contadores["misses"] += 1
+                return None, False
+            agora = time.monotonic()
+            revalidar = False
+            if entrada.expira_em <= agora:
+                if entrada.expira_em + self.stale_segundos <= agora:
+                    self._remover(chave)
+                    self._contadores["expirations"] += 1
+                    self._contadores["misses"] += 1
+                    return None, False
+                self._contadores["stale_hits"] += 1
+                if chave not in self._revalidando:
+                    self._revalidando.add(chave)
+                    revalidar = True
+            else:
+                self._contadores["hits"] += 1
+            entrada.acessos += 1
+            self._entradas.move_to_end(chave)
+            return entrada.valor.copy(), revalidar
+
+    def fim_revalidacao(self, chave):
+        with self._lock:
+            self._revalidando.discard(chave)
+
+    def put(self, chave, nome, df, tabelas=frozenset(), versoes=None, tamanho=None):
+        # versoes: snapshot tirado ANTES de executar a query; se uma tabela
+        # mudou no meio da execução a entrada já nasce invalidada
+        if tamanho is None:
+            tamanho = tamanho_em_bytes(df)
+        if versoes is None:
+            versoes = self.versoes(tabelas)
+        with self._lock:
+            if chave in self._entradas:
+                self._remover(chave)
+            if tamanho > self.max_bytes:
+                # Maior que o orçamento inteiro: não vale a pena guardar
+                self._contadores["rejeitados"] += 1
+                return
+            while self._bytes + tamanho > self.max_bytes and self._entradas:
+                self._remover(self._vitima())
+                self._contadores["evictions"] += 1
+            agora = time.monotonic()
+            self._entradas[chave] = _Entrada(nome, df, tamanho, agora, agora + self.ttl(nome),
+                                             tabelas, versoes)
+            self._bytes += tamanho
+
+    def _versoes_de(self, tabelas):
+        return tuple(self._versoes_atuais.get(tabela, 0) for tabela in sorted(tabelas))
+
+    def versoes(self, tabelas):
+        with self._lock:
+            return self._versoes_de(tabelas)
+
+    def precisa_sincronizar(self, intervalo):
+        # No máximo uma leitura de table_versions por intervalo, para todas as sessões
+        with self._lock:
+            agora = time.monotonic()
+            if agora - self._ultima_sincronizacao < intervalo:
+                return False
+            self._ultima_sincronizacao = agora
+            return True
+
+    def atualizar_versoes(self, versoes):
+        # Aplica as novas versões e já descarta as entradas das tabelas que mudaram
+        with self._lock:
+            mudaram = {tabela for tabela, versao in versoes.items()
+                       if self._versoes_atuais.get(tabela, 0) != versao}
+            if not mudaram:
+                return 0
+            self._versoes_atuais.update(versoes)
+            chaves = [chave for chave, entrada in self._entradas.items() if entrada.tabelas & mudaram]
+            for chave in chaves:
+                self._remover(chave)
+            self._contadores["invalidations"] += len(chaves)
+            return len(chaves)
+
+    def _vitima(self):
+        if self.politica == "lfu":
+            # Menos acessada; em empate, a menos recente (ordem do OrderedDict)
+            return min(self._entradas, key=lambda chave: self._entradas[chave].acessos)
+        return next(iter(self._entradas))
+
+    def _remover(self, chave):
+        entrada = self._entradas.pop(chave)
+        self._bytes -= entrada.bytes
+
+    def evict_query(self, nome):
+        # Remove todas as entradas de uma função de queries.py
+        with self._lock:
+            chaves = [chave for chave, entrada in self._entradas.items() if entrada.nome == nome]
+            for chave in chaves:
+                self._remover(chave)
+            return len(chaves)
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._contadores,
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "politica": self.politica,
+            }
+
+    def entries(self):
+        # Uma linha por nome de query, para inspecionar na página de admin
+        agora = time.monotonic()
+        with self._lock:
+            linhas = [
+                {
+                    "query": entrada.nome,
+                    "bytes": entrada.bytes,
+                    "linhas": len(entrada.valor),
+                    "acessos": entrada.acessos,
+                    "idade_s": agora - entrada.criado_em,
+                    "expira_em_s": entrada.expira_em - agora,
+                }
+                for entrada in self._entradas.values()
+            ]
+        if not linhas:
+            return pd.DataFrame(columns=["query", "entradas", "bytes", "linhas", "acessos", "idade_s", "expira_em_s"])
+        return (pd.DataFrame(linhas)
+                  .groupby("query", as_index=False)
+                  .agg(entradas=("bytes", "size"), bytes=("bytes", "sum"), linhas=("linhas", "sum"),
+                       acessos=("acessos", "sum"), idade_s=("idade_s", "max"),
+                       expira_em_s=("expira_em_s", "min"))
+                  .sort_values("bytes", ascending=False))
+
+
+def _ttl_policies(texto):
+    # "get_escutas_usuario=600,get_artist_snapshot=1800" -> dict
+    politicas = {}
+    for item in (texto or "").split(","):
+        if "=" in item:
+            nome, segundos = item.split("=", 1)
+            politicas[nome.strip()] = int(segundos)
+    return politicas
+
+
+@st.cache_resource
+def get_cache():
+    load_dotenv()
+    return ResultCache(
+        max_bytes=int(os.getenv("CACHE_MAX_BYTES") or 256 * 1024 * 1024),
+        politica=(os.getenv("CACHE_EVICTION") or "lru").strip().lower(),
+        ttl_padrao=int(os.getenv("CACHE_TTL_SECONDS") or 3600),
+        ttl_por_query=_ttl_policies(os.getenv("CACHE_TTL_POLICIES")),
+        stale_segundos=int(os.getenv("CACHE_STALE_SECONDS") or 3600),
+    )
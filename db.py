@@ -1,43 +1,591 @@
 import streamlit as st
 import pandas as pd
 from dotenv import load_dotenv
+import contextvars
+import csv
+import io
+import logging
 import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import psycopg2
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import sqlalchemy
-from sqlalchemy.pool import NullPool
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+from cache import get_cache, tabelas_da_query, tamanho_em_bytes
+from metrics import get_metrics
 
-@st.cache_resource
-def init_connection():
+logger = logging.getLogger(__name__)
+
+# Threads de prefetch não podem desenhar st.error no lugar certo: nelas os
+# erros de query sobem como exceção para serem mostrados no widget que usa o dado
+_local = threading.local()
+
+
+@contextmanager
+def raise_query_errors():
+    anterior = getattr(_local, "raise_errors", False)
+    _local.raise_errors = True
+    try:
+        yield
+    finally:
+        _local.raise_errors = anterior
+
+
+def _raise_errors():
+    return getattr(_local, "raise_errors", False)
+
+
+# Tabelas lidas por um bloco de código (ver registrar_tabelas). ContextVar e
+# não _local: na camada assíncrona várias tarefas dividem a mesma thread
+_tabelas_lidas = contextvars.ContextVar("tabelas_lidas", default=None)
+
+
+@contextmanager
+def registrar_tabelas(lidas):
+    # Preenche o dict lidas com tabela -> versão de cada tabela lida pelo
+    # run_query dentro do bloco (usado pelo prefetch para saber quando os
+    # dados de uma aba ficaram velhos)
+    token = _tabelas_lidas.set(lidas)
+    try:
+        yield lidas
+    finally:
+        _tabelas_lidas.reset(token)
+
+
+def _env_int(nome, padrao):
+    # Lê um inteiro do .env, caindo no valor padrão se estiver vazio
+    valor = os.getenv(nome)
+    return int(valor) if valor not in (None, "") else padrao
+
+
+def _env_bool(nome, padrao):
+    valor = os.getenv(nome)
+    if valor in (None, ""):
+        return padrao
+    return valor.strip().lower() in ("1", "true", "yes", "on", "sim")
+
+
+def _pool_config():
+    # Configuração do pool lida do .env, junto com DB_HOST/DB_PORT
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def _conexao(driver="psycopg2", host=None, porta=None):
+    # URI do SQLAlchemy e connect_args, iguais para o engine síncrono e o
+    # assíncrono; host/porta trocam o servidor (réplicas de leitura)
     load_dotenv()
+    db_url = (
+        f"postgresql+{driver}://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+        f"@{host or os.getenv('DB_HOST')}:{porta or os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+    )
+
+    # Banco fora do ar não pode segurar o rerun até o timeout de TCP do sistema
+    connect_args = {}
+    connect_timeout = _env_int("DB_CONNECT_TIMEOUT", 5)
+    if connect_timeout > 0:
+        connect_args["connect_timeout"] = connect_timeout
+
+    # statement_timeout (ms) aplicado em cada conexão aberta pelo pool
+    statement_timeout = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+    if statement_timeout > 0:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+    return db_url, connect_args
+
+
+# Última falha ao criar o engine: por DB_CONNECT_RETRY_SECONDS os reruns e
+# logins seguintes falham na hora, em vez de esperar o connect_timeout de novo
+_falha_conexao = {"em": 0.0, "erro": None}
+
+
+def _create_engine():
+    erro = _falha_conexao["erro"]
+    if erro is not None and time.monotonic() - _falha_conexao["em"] < _env_int("DB_CONNECT_RETRY_SECONDS", 10):
+        raise erro
+    try:
+        engine = _criar_engine()
+    except Exception as e:
+        _falha_conexao.update(em=time.monotonic(), erro=e)
+        raise
+    _falha_conexao["erro"] = None
+    return engine
+
+
+@st.cache_resource
+def _criar_engine():
+    # Só é cacheado quando retorna com sucesso: se a conexão falhar a
+    # exceção sobe e o próximo rerun tenta de novo (em vez de guardar None)
+
+    # 1. Construir a string de conexão (URI) para o SQLAlchemy
+    db_url, connect_args = _conexao()
+
+    # 2. Criar um engine do SQLAlchemy com pool de conexões
+    config = _pool_config()
+    engine = sqlalchemy.create_engine(
+        db_url,
+        isolation_level="AUTOCOMMIT",
+        connect_args=connect_args,
+        **config,
+    )
+
+    # 3. Aquece o pool: abre pool_size conexões de uma vez e devolve todas
+    # (a primeira que falhar interrompe o aquecimento)
     try:
-        # 1. Construir a string de conexão (URI) para o SQLAlchemy
-        db_url = (
-            f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
-            f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-        )
+        _warm_pool(engine, config["pool_size"])
+    except Exception:
+        engine.dispose()
+        raise
 
-        # 2. Criar um engine do SQLAlchemy
-        engine = sqlalchemy.create_engine(db_url, poolclass=NullPool, isolation_level="AUTOCOMMIT")
-        return engine  # Retorna o engine
+    return engine
 
+
+def _warm_pool(engine, n):
+    connections = []
+    try:
+        for _ in range(max(n, 1)):
+            connection = engine.connect()
+            connection.exec_driver_sql("SELECT 1")
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def init_connection():
+    if _raise_errors():
+        return _create_engine()
+    try:
+        return _create_engine()  # Retorna o engine
     except Exception as e:
         st.error(f"Erro na conexão com SQLAlchemy: {e}")
         return None
 
-@st.cache_data(ttl=3600)
-def run_query(query, params=None):
+# ----------------------------------------
+# Réplicas de leitura
+# ----------------------------------------
+# DB_READ_REPLICAS lista réplicas do banco principal (mesmo usuário, senha e
+# banco), cada uma com um peso: "host:porta=peso,host:porta=peso". As leituras
+# do run_query e do streaming são sorteadas entre as réplicas saudáveis na
+# proporção dos pesos; sem nenhuma saudável elas vão para o principal. O login,
+# o refresh dos leaderboards e as escritas continuam sempre no principal.
+#
+# Uma thread confere cada réplica a cada DB_REPLICA_CHECK_SECONDS (conexão e
+# atraso de replicação); com atraso acima de DB_REPLICA_MAX_LAG_SECONDS ela
+# sai do sorteio até alcançar. A mesma verificação guarda o table_versions da
+# réplica: uma query do run_query só vai para ela se essas versões já chegaram
+# às que o cache conhece das tabelas lidas; senão vai para o principal, e o
+# cache nunca guarda um resultado mais velho que a versão com que a entrada é
+# marcada. Sem ida extra ao banco por leitura: entre duas verificações a
+# réplica só pode parecer mais atrasada do que está, nunca mais em dia.
+
+# Atraso da réplica em segundos (0 para um servidor que não é réplica)
+_SQL_ATRASO = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        -- Sem WAL pendente está em dia, mesmo sem escritas recentes no principal
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 'Infinity')
+    END::float8;"""
+
+
+def _replicas_config():
+    # "db1:5433=2,db2:5433" -> [("db1", "5433", 2), ("db2", "5433", 1)]
+    load_dotenv()
+    replicas = []
+    for item in (os.getenv("DB_READ_REPLICAS") or "").split(","):
+        endereco, _, peso = item.strip().partition("=")
+        if not endereco:
+            continue
+        host, _, porta = endereco.partition(":")
+        replicas.append((host, porta or os.getenv("DB_PORT"), int(peso or 1)))
+    return replicas
+
+
+class _Replica:
+    def __init__(self, host, porta, peso):
+        self.nome = f"{host}:{porta}"
+        self.peso = peso
+        self.saudavel = False
+        self.atraso_s = None
+        self.erro = None
+        self.verificada_em = None
+        # table_versions da réplica na última verificação (None sem a migration)
+        self.versoes = None
+        db_url, connect_args = _conexao(host=host, porta=porta)
+        self.engine = sqlalchemy.create_engine(
+            db_url, isolation_level="AUTOCOMMIT", connect_args=connect_args, **_pool_config())
+
+
+class _Roteador:
+    def __init__(self, replicas, atraso_maximo):
+        self.replicas = replicas
+        self.atraso_maximo = atraso_maximo
+        self._lock = threading.Lock()
+
+    def verificar(self):
+        # Health check de todas as réplicas (thread db-replicas)
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    atraso, erro = connection.exec_driver_sql(_SQL_ATRASO).scalar(), None
+                    versoes = _versoes_replicadas(connection)
+            except Exception as e:
+                atraso, erro, versoes = None, str(e), None
+            with self._lock:
+                replica.versoes = versoes
+                replica.atraso_s = atraso
+                replica.erro = erro
+                replica.verificada_em = time.time()
+                replica.saudavel = erro is None and atraso <= self.atraso_maximo
+            get_metrics().registrar_replica(replica.nome, replica.saudavel, atraso)
+
+    def escolher(self):
+        # Réplica sorteada pelos pesos entre as saudáveis, ou None (principal)
+        with self._lock:
+            saudaveis = [replica for replica in self.replicas if replica.saudavel]
+        if not saudaveis:
+            return None
+        return random.choices(saudaveis, weights=[replica.peso for replica in saudaveis])[0]
+
+    def marcar_falha(self, replica, erro):
+        # Falha de conexão fora do health check: sai do sorteio até a próxima verificação
+        with self._lock:
+            replica.saudavel = False
+            replica.erro = str(erro)
+        get_metrics().registrar_replica(replica.nome, False, replica.atraso_s)
+
+    def status(self):
+        with self._lock:
+            return pd.DataFrame([{
+                "replica": replica.nome,
+                "peso": replica.peso,
+                "saudavel": replica.saudavel,
+                "atraso_s": replica.atraso_s,
+                "verificada_em": pd.to_datetime(replica.verificada_em, unit="s", utc=True),
+                "erro": replica.erro,
+            } for replica in self.replicas])
+
+
+def _loop_verificacao(roteador, intervalo):
+    while True:
+        time.sleep(intervalo)
+        roteador.verificar()
+
+
+@st.cache_resource
+def _roteador():
+    # None sem DB_READ_REPLICAS: tudo vai para o principal, como antes
+    replicas = _replicas_config()
+    if not replicas:
+        return None
+    roteador = _Roteador([_Replica(*replica) for replica in replicas],
+                        atraso_maximo=float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS") or 5))
+    roteador.verificar()
+    threading.Thread(
+        target=_loop_verificacao, args=(roteador, float(os.getenv("DB_REPLICA_CHECK_SECONDS") or 5)),
+        name="db-replicas", daemon=True).start()
+    return roteador
+
+
+def status_replicas():
+    # Estado de cada réplica para a página de admin (vazio sem réplicas)
+    roteador = _roteador()
+    return roteador.status() if roteador else pd.DataFrame()
+
+
+def _abrir_leitura(engine, abrir, tabelas=frozenset(), versoes=()):
+    # (conexão, réplica) para uma leitura: `abrir` recebe o engine escolhido
+    # (connect ou raw_connection); réplica é None quando a leitura vai para o principal.
+    # tabelas/versoes: o que o cache conhece das tabelas lidas (ver _replica_em_dia)
+    roteador = _roteador()
+    if roteador is None:
+        return abrir(engine), None
+    replica = roteador.escolher()
+    if replica is None:
+        get_metrics().registrar_rota("principal", "sem_replica_saudavel")
+        return abrir(engine), None
+    if not _replica_em_dia(replica, tabelas, versoes):
+        get_metrics().registrar_rota("principal", "replica_atrasada")
+        return abrir(engine), None
+    try:
+        return abrir(replica.engine), replica
+    except Exception as e:
+        logger.warning("Réplica %s indisponível: %s", replica.nome, e)
+        roteador.marcar_falha(replica, e)
+        get_metrics().registrar_rota("principal", "falha_replica")
+        return abrir(engine), None
+
+
+def _versoes_replicadas(connection):
+    try:
+        return dict(connection.exec_driver_sql("SELECT tabela, versao FROM table_versions;").all())
+    except sqlalchemy.exc.ProgrammingError:
+        # Sem a migration de table_versions o cache funciona só com TTL
+        return None
+
+
+def _replica_em_dia(replica, tabelas, versoes):
+    # A réplica já tinha, na última verificação, as versões que o cache conhece
+    esperadas = dict(zip(sorted(tabelas), versoes))
+    atuais = replica.versoes
+    if not esperadas or atuais is None:
+        return True
+    return all(atuais.get(tabela, 0) >= versao for tabela, versao in esperadas.items())
+
+
+def _conexao_caiu(connection, erro):
+    # Erros do SQLAlchemy dizem se a conexão foi invalidada; os do cursor
+    # psycopg2 cru da leitura COPY não passam por ele, então olha o libpq
+    if isinstance(erro, sqlalchemy.exc.DBAPIError):
+        return erro.connection_invalidated
+    return bool(connection.connection.dbapi_connection.closed)
+
+# ----------------------------------------
+# Tipos compactos (schema por query)
+# ----------------------------------------
+# Cada função de queries.py pode declarar {coluna: tipo} para o resultado:
+#   "categoria": pandas Categorical (texto muito repetido: gênero, tipo, artista)
+#   "texto":     string do Arrow (texto variado: nomes de músicas e episódios)
+#   "inteiro":   menor inteiro que cabe os valores (contagens, reproduções)
+#   qualquer outro valor é passado para astype ("float32", "int16"...)
+# Os DataFrames guardados no cache ficam menores e mais rápidos de copiar.
+# DB_TYPED_RESULTS=false desliga a conversão para todas as queries.
+
+def _tipos_compactos():
+    return _env_bool("DB_TYPED_RESULTS", True)
+
+
+def aplicar_schema(df, schema):
+    if not schema or df.empty:
+        return df
+    for coluna, tipo in schema.items():
+        if coluna not in df.columns:
+            continue
+        if tipo == "categoria":
+            df[coluna] = df[coluna].astype("category")
+        elif tipo == "texto":
+            df[coluna] = df[coluna].astype("string[pyarrow]")
+        elif tipo == "inteiro":
+            df[coluna] = pd.to_numeric(df[coluna], downcast="integer")
+        else:
+            df[coluna] = df[coluna].astype(tipo)
+    return df
+
+
+def run_query(query, params=None, nome=None, schema=None, leitura="read_sql"):
+    # nome identifica a query no cache (TTL, eviction, admin); por padrão é
+    # o nome da função de queries.py que chamou o run_query.
+    # schema: tipos compactos das colunas do resultado (ver aplicar_schema)
+    # leitura: "read_sql" ou "copy" (resultados grandes, ver _ler_copy)
+    nome = nome or sys._getframe(1).f_code.co_name
+    cache = get_cache()
+    if not _tipos_compactos():
+        schema = None
+    chave = (query, repr(params), repr(schema))
+    lidas = _tabelas_lidas.get()
+    if lidas is not None:
+        tabelas = tabelas_da_query(query)
+        for tabela, versao in zip(sorted(tabelas), cache.versoes(tabelas)):
+            lidas.setdefault(tabela, versao)
+
+    df, revalidar = cache.get(chave)
+    if df is not None:
+        get_metrics().registrar_cache(nome, "stale" if revalidar else "hit")
+    else:
+        get_metrics().registrar_cache(nome, "miss")
+    if revalidar:
+        # Stale-while-revalidate: devolve o resultado vencido agora e
+        # atualiza em segundo plano (uma única atualização por entrada)
+        _revalidador().submit(_revalidar, chave, nome, query, params, schema, leitura)
+    if df is not None:
+        return df
+
+    df = _executar_e_guardar(chave, nome, query, params, schema, leitura)
+    if df is None:
+        # Erros não são guardados no cache
+        return pd.DataFrame()
+    return df.copy()
+
+
+def _executar_e_guardar(chave, nome, query, params, schema=None, leitura="read_sql"):
+    # A entrada é marcada com as tabelas lidas e a versão delas antes da execução
+    cache = get_cache()
+    metrics = get_metrics()
+    tabelas = tabelas_da_query(query)
+    versoes = cache.versoes(tabelas)
+
+    inicio = time.perf_counter()
+    try:
+        df = _executar_query(query, params, leitura, tabelas, versoes)
+    except Exception:
+        metrics.registrar_erro(nome)
+        raise
+    duracao = time.perf_counter() - inicio
+
+    if df is None:
+        metrics.registrar_erro(nome)
+        return None
+    df = aplicar_schema(df, schema)
+    tamanho = tamanho_em_bytes(df)
+    metrics.registrar_query(nome, duracao, len(df), tamanho)
+    cache.put(chave, nome, df, tabelas, versoes, tamanho)
+    return df
+
+
+@st.cache_resource
+def _revalidador():
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="revalidar")
+
+
+def _revalidar(chave, nome, query, params, schema, leitura):
+    try:
+        with raise_query_errors():
+            _executar_e_guardar(chave, nome, query, params, schema, leitura)
+    except Exception:
+        # Se falhar, a entrada vencida continua sendo servida até sair da janela
+        pass
+    finally:
+        get_cache().fim_revalidacao(chave)
+
+
+def sincronizar_versoes():
+    # Lê os contadores de table_versions (no máximo uma vez por intervalo,
+    # para todas as sessões) e invalida as entradas das tabelas que mudaram.
+    # Sem a migration aplicada o cache funciona só com TTL.
+    cache = get_cache()
+    if not cache.precisa_sincronizar(float(os.getenv("CACHE_VERSION_POLL_SECONDS") or 1)):
+        return
+    try:
+        engine = _create_engine()
+        with engine.connect() as connection:
+            linhas = connection.exec_driver_sql("SELECT tabela, versao FROM table_versions;").all()
+    except Exception:
+        return
+    cache.atualizar_versoes({tabela: versao for tabela, versao in linhas})
+
+
+# ----------------------------------------
+# Streaming (exportações e resultados grandes)
+# ----------------------------------------
+# Sem cache: o resultado é lido em pedaços por um cursor do lado do servidor
+# (DECLARE ... CURSOR), então nem o psycopg2 nem o pandas seguram o resultado
+# inteiro. Cada chamada registra o tamanho do maior pedaço lido.
+
+def _tamanho_chunk(chunk_size):
+    return chunk_size or _env_int("DB_STREAM_CHUNK_ROWS", 10_000)
+
+
+def stream_query(query, params=None, chunk_size=None, nome=None):
+    # Gerador de DataFrames de até chunk_size linhas (DB_STREAM_CHUNK_ROWS).
+    # Erros sobem como exceção, inclusive fora das threads de prefetch.
+    nome = nome or sys._getframe(1).f_code.co_name
+    return _stream(query, params, _tamanho_chunk(chunk_size), nome)
+
+
+def reduce_query(query, reducer, inicial=None, params=None, chunk_size=None, nome=None):
+    # Aplica acumulado = reducer(acumulado, chunk) a cada pedaço do resultado
+    nome = nome or sys._getframe(1).f_code.co_name
+    acumulado = inicial
+    for chunk in _stream(query, params, _tamanho_chunk(chunk_size), nome):
+        acumulado = reducer(acumulado, chunk)
+    return acumulado
+
+
+def exportar_csv(query, destino, params=None, chunk_size=None, nome=None):
+    # Escreve o resultado em CSV (arquivo texto aberto) pedaço por pedaço; devolve o nº de linhas
+    nome = nome or sys._getframe(1).f_code.co_name
+    linhas = 0
+    for chunk in _stream(query, params, _tamanho_chunk(chunk_size), nome):
+        chunk.to_csv(destino, header=linhas == 0, index=False, quoting=csv.QUOTE_MINIMAL)
+        linhas += len(chunk)
+    return linhas
+
+
+def _stream(query, params, chunk_size, nome):
+    metrics = get_metrics()
+    inicio = time.perf_counter()
+    linhas = total_bytes = maior_pedaco = 0
+    raw, replica = _abrir_leitura(_create_engine(), lambda engine: engine.raw_connection())
+    if replica is not None:
+        metrics.registrar_rota(replica.nome, "replica")
+    dbapi = raw.driver_connection
+    autocommit = dbapi.autocommit
+    try:
+        # Cursores nomeados só existem dentro de uma transação
+        dbapi.autocommit = False
+        cursor = dbapi.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor.itersize = chunk_size
+        cursor.execute(query, params)
+        while True:
+            registros = cursor.fetchmany(chunk_size)
+            if not registros:
+                break
+            chunk = pd.DataFrame.from_records(registros, columns=[c.name for c in cursor.description])
+            del registros
+            tamanho = tamanho_em_bytes(chunk)
+            linhas += len(chunk)
+            total_bytes += tamanho
+            maior_pedaco = max(maior_pedaco, tamanho)
+            yield chunk
+    except Exception:
+        metrics.registrar_erro(nome)
+        raise
+    finally:
+        # Só leitura: o rollback fecha o cursor (também quando o consumidor para no meio)
+        try:
+            dbapi.rollback()
+            dbapi.autocommit = autocommit
+        finally:
+            raw.close()
+        duracao = time.perf_counter() - inicio
+        metrics.registrar_stream(nome, duracao, linhas, total_bytes, maior_pedaco)
+        logger.info("stream %s: %d linhas em %.2fs, maior pedaço de %.1f MB",
+                    nome, linhas, duracao, maior_pedaco / 1024 ** 2)
+
+
+def _executar_query(query, params, leitura="read_sql", tabelas=frozenset(), versoes=()):
+    # tabelas/versoes: o que o cache conhece das tabelas lidas (ver _replica_em_dia)
+    if in_greenlet():
+        # Chamado por db_async (arun_query e queries_async): a E/S roda no event loop
+        from db_async import aexecutar_query
+        return await_only(aexecutar_query(query, params, leitura))
+
     engine = init_connection()
     if engine is None:
         st.error("Não foi possível conectar ao banco de dados.")
-        return pd.DataFrame()
-    
-    # Usa uma conexão isolada para cada query
+        return None
+
+    # Pega uma conexão do pool (do principal ou de uma réplica) para cada query
     connection = None
     try:
-        # 3. pd.read_sql funciona nativamente com o engine do SQLAlchemy
-        # Isso elimina o UserWarning
-        connection = engine.connect()
-        df = pd.read_sql(query, connection, params=params)
-        return df
+        connection, replica = _abrir_leitura(engine, lambda engine: engine.connect(), tabelas, versoes)
+        if replica is not None:
+            get_metrics().registrar_rota(replica.nome, "replica")
+        try:
+            return _ler(connection, query, params, leitura)
+        except (sqlalchemy.exc.DBAPIError, psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            if replica is None or not _conexao_caiu(connection, e):
+                raise
+            # A réplica caiu no meio da query: repete no principal
+            _roteador().marcar_falha(replica, e)
+            get_metrics().registrar_rota("principal", "falha_replica")
+            # Sem devolver ao pool a conexão morta (o SQLAlchemy não a viu cair no COPY)
+            connection.invalidate()
+            connection.close()
+            connection = engine.connect()
+            return _ler(connection, query, params, leitura)
 
     except Exception as e:
         # Rollback em caso de erro
@@ -47,13 +595,96 @@ def run_query(query, params=None):
             except:
                 pass
 
+        if _raise_errors():
+            raise
         st.error(f"Erro na query: {e}")
-        return pd.DataFrame()
-    
+        return None
+
     finally:
-        # Sempre fecha a conexão
+        # Sempre devolve a conexão ao pool
         if connection:
             try:
                 connection.close()
             except:
-                pass
\ No newline at end of file
+                pass
+
+
+def _ler(connection, query, params, leitura):
+    if leitura == "copy":
+        return _ler_copy(connection, query, params)
+    # pd.read_sql funciona nativamente com a conexão do SQLAlchemy
+    return pd.read_sql(query, connection, params=params)
+
+
+# ----------------------------------------
+# Leitura via COPY
+# ----------------------------------------
+# O pd.read_sql recebe as linhas já convertidas em objetos Python pelo psycopg2,
+# valor a valor. Com leitura="copy" o Postgres manda o resultado como CSV
+# (COPY (query) TO STDOUT) e o leitor de CSV do Arrow, em C++ e multithread,
+# monta colunas tipadas de uma vez; os blocos numéricos passam para o pandas
+# sem cópia. Vale para resultados grandes de colunas simples (números, texto,
+# datas); intervalos, json, arrays e afins chegam como texto.
+
+# OID do tipo no Postgres -> tipo Arrow, com as mesmas conversões do read_sql
+# (inteiros em int64, numeric em float64)
+_TIPOS_COPY = {
+    16: pa.bool_(),     # bool
+    20: pa.int64(),     # int8
+    21: pa.int64(),     # int2
+    23: pa.int64(),     # int4
+    26: pa.int64(),     # oid
+    700: pa.float64(),  # float4
+    701: pa.float64(),  # float8
+    1700: pa.float64(), # numeric
+    18: pa.string(),    # char
+    19: pa.string(),    # name
+    25: pa.string(),    # text
+    1042: pa.string(),  # bpchar
+    1043: pa.string(),  # varchar
+    1082: pa.date32(),  # date
+    1114: pa.timestamp("us"),  # timestamp
+}
+
+
+def _ler_copy(connection, query, params):
+    cursor = connection.connection.cursor()
+    try:
+        # COPY não aceita parâmetros: o psycopg2 monta o SQL com os valores escapados
+        sql = cursor.mogrify(query.strip().rstrip(";"), params).decode()
+        # Nomes e tipos das colunas sem executar a query
+        cursor.execute(_sql_descricao(sql))
+        description = cursor.description
+
+        buffer = io.BytesIO()
+        cursor.copy_expert(_sql_copy(sql), buffer)
+    finally:
+        cursor.close()
+    return _df_do_csv(buffer, description)
+
+
+def _sql_descricao(sql):
+    return f"SELECT * FROM ({sql}) AS resultado LIMIT 0;"
+
+
+def _sql_copy(sql):
+    return f"COPY ({sql}) TO STDOUT WITH (FORMAT csv)"
+
+
+def _df_do_csv(buffer, description):
+    # description do cursor (psycopg2 ou psycopg 3): nome e OID do tipo de cada coluna
+    colunas = [c.name for c in description]
+    tipos = {c.name: _TIPOS_COPY.get(c.type_code, pa.string()) for c in description}
+    if buffer.tell() == 0:
+        return pd.DataFrame(columns=colunas)
+
+    buffer.seek(0)
+    tabela = pa_csv.read_csv(
+        buffer,
+        read_options=pa_csv.ReadOptions(column_names=colunas),
+        # No CSV do COPY, NULL é um campo vazio sem aspas e '' é a string vazia
+        convert_options=pa_csv.ConvertOptions(
+            column_types=tipos, null_values=[""], strings_can_be_null=True,
+            quoted_strings_can_be_null=False, true_values=["t"], false_values=["f"]),
+    )
+    return tabela.to_pandas(split_blocks=True, self_destruct=True, coerce_temporal_nanoseconds=True)
@@ -0,0 +1,114 @@
+import asyncio
+import functools
+import io
+import os
+import sys
+import threading
+
+import pandas as pd
+import psycopg
+import streamlit as st
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util.concurrency import greenlet_spawn
+
+import db
+
+# ----------------------------------------
+# Camada assíncrona
+# ----------------------------------------
+# arun_query e as funções de queries_async devolvem corrotinas que podem ser
+# esperadas juntas (asyncio.gather). O código síncrono (run_query, cache,
+# métricas, schema, funções de queries.py) roda inteiro, sem duplicação, dentro
+# de um greenlet (o mesmo mecanismo do SQLAlchemy async); só a ida ao banco vira
+# await, num engine psycopg 3 assíncrono. Tudo roda em um único event loop por
+# processo, numa thread própria; o semáforo limita as queries simultâneas no
+# Postgres (DB_ASYNC_MAX_CONCURRENCY, padrão DB_POOL_SIZE).
+
+
+@st.cache_resource
+def _loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="db-async", daemon=True).start()
+    return loop
+
+
+@st.cache_resource
+def _estado():
+    # Engine e semáforo são criados na primeira query, já dentro do event loop
+    url, connect_args = db._conexao("psycopg")
+    config = db._pool_config()
+    engine = create_async_engine(
+        url,
+        isolation_level="AUTOCOMMIT",
+        connect_args=connect_args,
+        **config,
+    )
+    limite = int(os.getenv("DB_ASYNC_MAX_CONCURRENCY") or config["pool_size"])
+    return engine, asyncio.Semaphore(max(limite, 1))
+
+
+def executar(corrotina):
+    # Ponte para o código síncrono (scripts do Streamlit, threads): roda a
+    # corrotina no event loop da camada e devolve um concurrent.futures.Future
+    return asyncio.run_coroutine_threadsafe(corrotina, _loop())
+
+
+def reunir(*corrotinas):
+    # Espera várias corrotinas juntas a partir de código síncrono; devolve os resultados em ordem
+    async def _todas():
+        return await asyncio.gather(*corrotinas)
+    return executar(_todas()).result()
+
+
+def _com_erros(funcao, *args, **kwargs):
+    # Como no prefetch, erros de query sobem como exceção para quem espera o resultado
+    with db.raise_query_errors():
+        return funcao(*args, **kwargs)
+
+
+def arun_query(query, params=None, nome=None, schema=None, leitura="read_sql"):
+    # Mesmo contrato do db.run_query (cache, métricas, schema, leitura), mas
+    # devolve uma corrotina. O nome padrão é lido aqui, antes de virar corrotina.
+    nome = nome or sys._getframe(1).f_code.co_name
+    return greenlet_spawn(_com_erros, db.run_query, query, params, nome, schema, leitura)
+
+
+def assincrona(funcao):
+    # Versão assíncrona de uma função síncrona que usa run_query
+    @functools.wraps(funcao)
+    def variante(*args, **kwargs):
+        return greenlet_spawn(_com_erros, funcao, *args, **kwargs)
+    return variante
+
+
+async def aexecutar_query(query, params, leitura="read_sql"):
+    # Equivalente assíncrono de db._executar_query, chamado por ele dentro do greenlet
+    if asyncio.get_running_loop() is not _loop():
+        # As conexões do pool ficam presas ao loop em que foram abertas
+        raise RuntimeError("A camada assíncrona roda no próprio event loop: use db_async.executar/reunir")
+    engine, semaforo = _estado()
+    async with semaforo:
+        async with engine.connect() as connection:
+            if leitura == "copy":
+                return await _aler_copy(connection, query, params)
+            resultado = await connection.exec_driver_sql(query, params)
+            # coerce_float como o pd.read_sql: numeric (Decimal) vira float64
+            return pd.DataFrame.from_records(resultado.fetchall(), columns=list(resultado.keys()),
+                                             coerce_float=True)
+
+
+async def _aler_copy(connection, query, params):
+    raw = await connection.get_raw_connection()
+    cursor = psycopg.AsyncClientCursor(raw.driver_connection)
+    try:
+        sql = cursor.mogrify(query.strip().rstrip(";"), params)
+        await cursor.execute(db._sql_descricao(sql))
+        description = cursor.description
+
+        buffer = io.BytesIO()
+        async with cursor.copy(db._sql_copy(sql)) as copia:
+            async for dados in copia:
+                buffer.write(dados)
+    finally:
+        await cursor.close()
+    return db._df_do_csv(buffer, description)
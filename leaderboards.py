@@ -0,0 +1,636 @@
+import heapq
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+
+import rankings as rk
+from cache import get_cache
+from db import init_connection, run_query
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------
+# Rankings globais materializados
+# ----------------------------------------
+# Cada view guarda o agregado completo por item (música, álbum, podcast,
+# artista), agrupado pela chave primária do item, com um índice na coluna do
+# ranking, então ler o top-N (rankings.top_n) é uma varredura de índice de N
+# linhas, independente do tamanho das tabelas de fato.
+
+# Os rankings globais por item também podem ser mantidos incrementalmente
+# (migration 005): a entrada "incremental" diz de qual tabela de fato vem o
+# delta de cada item (`chave` e `delta` são expressões sobre a linha dela) e
+# como juntar os nomes ao total (`colunas`/`juncao`, sobre leaderboard_*
+# com alias t). A junção só é aplicada na leitura, depois do corte do top-K:
+# itens que não devem entrar no ranking precisam ter chave NULL, e as tabelas
+# lidas pela expressão da chave vão em `recalcular_com`. Com a migration aplicada a view não é mais criada e o ranking
+# passa a ser lido de leaderboard_topk/leaderboard_totais.
+
+# Fontes dos rankings por artista (filtradas ou particionadas por id_do_artista),
+# usadas pelas funções de queries.py e por mv_tops_artista
+ESCUTAS_MUSICA_ARTISTA = '''(
+    SELECT
+        conteudo.id_do_artista,
+        musica.id_da_musica,
+        musica.nome,
+        escutamusica.numero_reproducoes
+    FROM musica
+        JOIN escutamusica ON musica.id_da_musica = escutamusica.id_da_musica
+        JOIN album ON musica.id_album = album.id_album
+        JOIN conteudo ON album.id_album = conteudo.id
+) AS escutas_musica'''
+
+ALBUNS_SALVOS_ARTISTA = '''(
+    SELECT
+        C_ALBUM.id_do_artista,
+        C_ALBUM.id AS id_album,
+        C_ALBUM.nome AS nome_do_album,
+        COUNT(SA.id_album) AS total_de_vezes_salvo
+    FROM SalvaAlbum SA
+        JOIN Album ALB ON SA.id_album = ALB.id_album
+        JOIN Conteudo C_ALBUM ON ALB.id_album = C_ALBUM.id
+    GROUP BY C_ALBUM.id_do_artista, C_ALBUM.id, C_ALBUM.nome
+) AS albuns_salvos'''
+
+ESCUTAS_EPISODIO_ARTISTA = '''(
+    SELECT
+        c.id_do_artista,
+        e.id_episodio,
+        e.nome,
+        ee.numero_reproducoes
+    FROM EscutaEpisodio ee
+        JOIN Episodio e ON ee.id_episodio = e.id_episodio
+        JOIN Podcast p ON e.id_podcast = p.id_podcast
+        JOIN Conteudo c ON p.id_podcast = c.id
+) AS escutas_episodio'''
+
+
+LEADERBOARDS = {
+    "mv_top_musicas": {
+        "sql": """
+            SELECT
+                M.id_da_musica,
+                M.nome AS nome_da_musica,
+                C.nome AS nome_do_album,
+                SUM(EM.numero_reproducoes) AS total_de_reproducoes
+            FROM EscutaMusica EM
+                JOIN Musica M ON EM.id_da_musica = M.id_da_musica
+                JOIN Album A ON M.id_album = A.id_album
+                JOIN Conteudo C ON A.id_album = C.id
+            GROUP BY M.id_da_musica, M.nome, C.nome""",
+        "chave": "id_da_musica",
+        "ordem": "total_de_reproducoes",
+        "incremental": {
+            "nome": "musica_reproducoes",
+            "tabela": "EscutaMusica",
+            "chave": "id_da_musica",
+            "delta": "numero_reproducoes",
+            "colunas": "M.nome AS nome_da_musica, C.nome AS nome_do_album",
+            "juncao": "JOIN Musica M ON M.id_da_musica = t.chave JOIN Conteudo C ON C.id = M.id_album",
+        },
+    },
+    "mv_top_albuns_salvos": {
+        "sql": """
+            SELECT Conteudo.id AS id_album, Conteudo.nome, COUNT(SalvaAlbum.id_da_conta) AS total_salvos
+            FROM SalvaAlbum
+                JOIN Album ON SalvaAlbum.id_album = Album.id_album
+                JOIN Conteudo ON Album.id_album = Conteudo.id
+            GROUP BY Conteudo.id, Conteudo.nome""",
+        "chave": "id_album",
+        "ordem": "total_salvos",
+        "incremental": {
+            "nome": "album_salvos",
+            "tabela": "SalvaAlbum",
+            "chave": "id_album",
+            "delta": "1",
+            "colunas": "C.nome",
+            "juncao": "JOIN Conteudo C ON C.id = t.chave",
+        },
+    },
+    "mv_top_podcasts_seguidos": {
+        "sql": """
+            SELECT Conteudo.id AS id_podcast, Conteudo.nome, COUNT(SeguePodcast.id_da_conta) AS total_seguidores
+            FROM SeguePodcast
+                JOIN Podcast ON SeguePodcast.id_podcast = Podcast.id_podcast
+                JOIN Conteudo ON Podcast.id_podcast = Conteudo.id
+            GROUP BY Conteudo.id, Conteudo.nome""",
+        "chave": "id_podcast",
+        "ordem": "total_seguidores",
+        "incremental": {
+            "nome": "podcast_seguidores",
+            "tabela": "SeguePodcast",
+            "chave": "id_podcast",
+            "delta": "1",
+            "colunas": "C.nome",
+            "juncao": "JOIN Conteudo C ON C.id = t.chave",
+        },
+    },
+    "mv_art_seguidores": {
+        "sql": """
+            SELECT Conta.id AS id_do_artista, Conta.nome, COUNT(Seguir.id_do_usuario) AS total_seguidores
+            FROM Seguir
+                JOIN Conta ON Seguir.id_da_conta = Conta.id
+                JOIN Artista ON Artista.id_do_artista = Conta.id
+            GROUP BY Conta.id, Conta.nome""",
+        "chave": "id_do_artista",
+        "ordem": "total_seguidores",
+        "incremental": {
+            "nome": "artista_seguidores",
+            "tabela": "Seguir",
+            # Seguir também guarda usuários seguidos: a chave é NULL (delta
+            # ignorado) para quem não é artista, senão essas contas disputariam
+            # o top-K e o artista mais seguido poderia ficar de fora dele
+            "chave": "(SELECT id_do_artista FROM Artista WHERE id_do_artista = id_da_conta)",
+            "delta": "1",
+            "colunas": "Conta.nome",
+            # Quem é artista muda o que conta: refaz o total a partir da view
+            "recalcular_com": ["Artista"],
+            "juncao": "JOIN Artista ON Artista.id_do_artista = t.chave JOIN Conta ON Conta.id = t.chave",
+        },
+    },
+    "mv_art_musicas_publicadas": {
+        "sql": """
+            SELECT
+                Artista.id_do_artista,
+                Conta.nome AS nome_artista,
+                COUNT(Musica.id_da_musica) AS numero_musicas
+            FROM Artista
+                JOIN Conta ON Artista.id_do_artista = Conta.id
+                JOIN Conteudo ON Conteudo.id_do_artista = Artista.id_do_artista
+                JOIN Album ON Album.id_album = Conteudo.id
+                JOIN Musica ON Musica.id_album = Album.id_album
+            GROUP BY Artista.id_do_artista, Conta.nome""",
+        "chave": "id_do_artista",
+        "ordem": "numero_musicas",
+        "incremental": {
+            "nome": "artista_musicas",
+            "tabela": "Musica",
+            "chave": "(SELECT id_do_artista FROM Conteudo WHERE Conteudo.id = id_album)",
+            "delta": "1",
+            "colunas": "Conta.nome AS nome_artista",
+            "juncao": "JOIN Conta ON Conta.id = t.chave",
+        },
+    },
+    "mv_albuns_faixas": {
+        "sql": """
+            SELECT ct.id AS id_album, ct.nome, COUNT(m.id_da_musica) AS total_de_musicas
+            FROM Musica AS m
+                JOIN Album AS al ON m.id_album = al.id_album
+                JOIN Conteudo AS ct ON al.id_album = ct.id
+            GROUP BY ct.id, ct.nome""",
+        "chave": "id_album",
+        "ordem": "total_de_musicas",
+        "incremental": {
+            "nome": "album_faixas",
+            "tabela": "Musica",
+            "chave": "id_album",
+            "delta": "1",
+            "colunas": "C.nome",
+            "juncao": "JOIN Conteudo C ON C.id = t.chave",
+        },
+    },
+    # Top 3 músicas, álbum mais salvo e top 3 episódios de todos os artistas,
+    # particionados por id_do_artista (lidos de uma vez pela aba de artistas)
+    "mv_tops_artista": {
+        "sql": "\nUNION ALL\n".join(f"({sql})" for sql in (
+            rk.top_n(ESCUTAS_MUSICA_ARTISTA,
+                     ["'musica'::text AS ranking", "id_do_artista", "posicao", "nome",
+                      "numero_reproducoes::bigint AS valor"],
+                     "numero_reproducoes", 3, particao="id_do_artista", desempate="id_da_musica"),
+            rk.top_n(ALBUNS_SALVOS_ARTISTA,
+                     ["'album_salvo'::text", "id_do_artista", "posicao", "nome_do_album", "total_de_vezes_salvo"],
+                     "total_de_vezes_salvo", 1, particao="id_do_artista", desempate="id_album"),
+            rk.top_n(ESCUTAS_EPISODIO_ARTISTA,
+                     ["'episodio'::text", "id_do_artista", "posicao", "nome", "numero_reproducoes::bigint"],
+                     "numero_reproducoes", 3, particao="id_do_artista", desempate="id_episodio"),
+        )),
+        "chave": "id_do_artista, ranking, posicao",
+    },
+    # Artistas com o tipo já calculado, para a busca por nome da aba 2
+    "mv_artistas": {
+        "sql": """
+            SELECT
+                Artista.id_do_artista,
+                Conta.nome,
+                CASE
+                    WHEN EXISTS (SELECT 1 FROM Podcast JOIN Conteudo ON Podcast.id_podcast = Conteudo.id
+                                 WHERE Conteudo.id_do_artista = Artista.id_do_artista) THEN 'podcaster'
+                    WHEN EXISTS (SELECT 1 FROM Album JOIN Conteudo ON Album.id_album = Conteudo.id
+                                 WHERE Conteudo.id_do_artista = Artista.id_do_artista) THEN 'musico'
+                    ELSE 'desconhecido'
+                END AS tipo
+            FROM Artista
+                JOIN Conta ON Artista.id_do_artista = Conta.id""",
+        "chave": "id_do_artista",
+        # Sufixo do índice -> definição; o de trigramas depende do pg_trgm (migration 003)
+        "indices": {
+            "nome": "(nome, id_do_artista)",
+            "nome_trgm": "USING gin (nome gin_trgm_ops)",
+        },
+    },
+}
+
+# Chave do advisory lock que impede dois processos de atualizarem ao mesmo tempo
+_LOCK_ID = 0x4C42_5246
+# Idem para a aplicação dos deltas dos leaderboards incrementais
+_LOCK_INCREMENTAL = 0x4C42_494E
+
+# Itens guardados em leaderboard_topk por leaderboard: os top-N de até K itens
+# leem só essa tabela; rankings maiores (ou com RANK) leem leaderboard_totais
+TOPK = 100
+
+
+def _intervalo_segundos():
+    load_dotenv()
+    return int(os.getenv("LEADERBOARD_REFRESH_SECONDS") or 300)
+
+
+def _modo_scheduler():
+    # "app" (thread dentro do Streamlit), "worker" (processo separado) ou "off"
+    load_dotenv()
+    return (os.getenv("LEADERBOARD_SCHEDULER") or "app").strip().lower()
+
+
+def _incrementais_instalados(conn):
+    # A migration 005 (leaderboard_*) foi aplicada neste banco
+    return conn.exec_driver_sql("SELECT to_regclass('leaderboard_incremental') IS NOT NULL;").scalar()
+
+
+def ensure_leaderboards(engine):
+    # Cria as views materializadas (e seus índices) que ainda não existem e,
+    # com a migration 005, os triggers dos leaderboards incrementais
+    with engine.connect() as conn:
+        conn.exec_driver_sql("""
+            CREATE TABLE IF NOT EXISTS leaderboard_refresh (
+                nome TEXT PRIMARY KEY,
+                atualizado_em TIMESTAMPTZ NOT NULL,
+                duracao_ms DOUBLE PRECISION NOT NULL,
+                erro TEXT
+            );""")
+        incrementais = _incrementais_instalados(conn)
+        for nome, lb in LEADERBOARDS.items():
+            existia = conn.exec_driver_sql("SELECT to_regclass(%s) IS NOT NULL;", (nome,)).scalar()
+            if incrementais and "incremental" in lb:
+                _instalar_incremental(conn, lb["incremental"])
+                # A view deixou de ser lida: libera o espaço dela
+                conn.exec_driver_sql(f"DROP MATERIALIZED VIEW IF EXISTS {nome};")
+                if existia:
+                    _incrementar_versao(conn, nome)
+                continue
+            if _desatualizada(conn, nome, lb["chave"]):
+                # Criada por uma versão anterior (agrupada por nome): recria com a chave atual
+                conn.exec_driver_sql(f"DROP MATERIALIZED VIEW {nome};")
+            conn.exec_driver_sql(
+                f"CREATE MATERIALIZED VIEW IF NOT EXISTS {nome} AS {lb['sql']} WITH DATA;")
+            # O índice único é obrigatório para o REFRESH ... CONCURRENTLY
+            conn.exec_driver_sql(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {nome}_pk ON {nome} ({lb['chave']});")
+            if "ordem" in lb:
+                conn.exec_driver_sql(
+                    f"CREATE INDEX IF NOT EXISTS {nome}_rank ON {nome} ({lb['ordem']} DESC, {lb['chave']});")
+            for sufixo, definicao in lb.get("indices", {}).items():
+                try:
+                    conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {nome}_{sufixo} ON {nome} {definicao};")
+                except Exception as e:
+                    logger.warning("Índice %s_%s não criado: %s", nome, sufixo, e)
+            if not existia:
+                # Invalida em todos os processos o disponiveis() guardado antes da view existir
+                _incrementar_versao(conn, nome)
+    # Neste processo, sem esperar a próxima leitura de table_versions
+    get_cache().evict_query("disponiveis")
+    get_cache().evict_query("incrementais")
+    if incrementais:
+        # Calcula os totais dos leaderboards novos antes do primeiro refresh
+        atualizar_incrementais(engine)
+
+
+def _instalar_incremental(conn, inc):
+    # Triggers (um por evento, por causa das transition tables) que registram
+    # os deltas do leaderboard em leaderboard_log; um leaderboard novo começa
+    # marcado para recálculo
+    argumentos = ", ".join("'" + arg.replace("'", "''") + "'" for arg in (inc["nome"], inc["chave"], inc["delta"]))
+    tabela = inc["tabela"].lower()
+    for evento, transicao in (("insert", "NEW TABLE AS novas"), ("update", "NEW TABLE AS novas OLD TABLE AS antigas"),
+                              ("delete", "OLD TABLE AS antigas")):
+        conn.exec_driver_sql(f"""
+            CREATE OR REPLACE TRIGGER {tabela}_lb_{inc['nome']}_{evento}
+            AFTER {evento.upper()} ON {tabela} REFERENCING {transicao}
+            FOR EACH STATEMENT EXECUTE FUNCTION leaderboard_registrar({argumentos});""")
+    conn.exec_driver_sql(f"""
+        CREATE OR REPLACE TRIGGER {tabela}_lb_{inc['nome']}_truncate
+        AFTER TRUNCATE ON {tabela}
+        FOR EACH STATEMENT EXECUTE FUNCTION leaderboard_truncate('{inc['nome']}');""")
+    for dependencia in inc.get("recalcular_com", []):
+        # Tabela usada na expressão da chave: qualquer mudança nela marca o
+        # leaderboard para recálculo, como o TRUNCATE na origem
+        conn.exec_driver_sql(f"""
+            CREATE OR REPLACE TRIGGER {dependencia.lower()}_lb_{inc['nome']}_recalcular
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {dependencia.lower()}
+            FOR EACH STATEMENT EXECUTE FUNCTION leaderboard_truncate('{inc['nome']}');""")
+    conn.exec_driver_sql(
+        "INSERT INTO leaderboard_incremental (leaderboard) VALUES (%s) ON CONFLICT DO NOTHING;", (inc["nome"],))
+
+
+def _desatualizada(conn, nome, chave):
+    # A view existe mas não tem as colunas-chave da definição atual
+    colunas = [coluna.strip() for coluna in chave.split(",")]
+    return conn.exec_driver_sql("""
+        SELECT to_regclass(%s) IS NOT NULL AND (
+            SELECT COUNT(*) FROM pg_attribute
+            WHERE attrelid = to_regclass(%s) AND attname = ANY(%s) AND NOT attisdropped
+        ) < %s;""", (nome, nome, colunas, len(colunas))).scalar()
+
+
+def _incrementar_versao(conn, nome):
+    # Invalida no cache do run_query as entradas que leem esta view
+    # (sem a migration de table_versions o cache fica só com TTL)
+    try:
+        conn.exec_driver_sql("""
+            INSERT INTO table_versions (tabela, versao) VALUES (%s, 1)
+            ON CONFLICT (tabela) DO UPDATE
+                SET versao = table_versions.versao + 1;""", (nome,))
+    except Exception as e:
+        logger.debug("table_versions indisponível: %s", e)
+
+
+def _ordem_topk(item):
+    # (chave, total) na ordem do ranking: total decrescente, desempate pela chave
+    chave, total = item
+    return -total, chave
+
+
+def _novo_topk(atual, alterados, k=TOPK):
+    # Top-K depois de aplicar os totais alterados ({chave: total}) ao top-K
+    # atual ([(chave, total)] em ordem). Se um item do top-K cheio diminuiu,
+    # quem entra no lugar dele pode não estar entre os alterados: devolve None
+    # e o chamador relê os K primeiros do índice de leaderboard_totais.
+    if len(atual) >= k and any(alterados.get(chave, total) < total for chave, total in atual):
+        return None
+    candidatos = dict(atual)
+    candidatos.update(alterados)
+    return heapq.nsmallest(k, ((chave, total) for chave, total in candidatos.items() if total > 0),
+                           key=_ordem_topk)
+
+
+def _recalcular(conn, nome, lb):
+    # Refaz o total do leaderboard a partir da tabela de fato (leaderboard novo
+    # ou TRUNCATE na origem). O LOCK segura escritas na origem até o commit,
+    # então nenhum delta fica contado duas vezes ou de fora.
+    inc = lb["incremental"]
+    conn.exec_driver_sql(f"LOCK TABLE {inc['tabela']} IN SHARE MODE;")
+    conn.exec_driver_sql("DELETE FROM leaderboard_log WHERE leaderboard = %s;", (inc["nome"],))
+    conn.exec_driver_sql("DELETE FROM leaderboard_totais WHERE leaderboard = %s;", (inc["nome"],))
+    conn.exec_driver_sql(f"""
+        INSERT INTO leaderboard_totais (leaderboard, chave, total)
+        SELECT %s, {lb['chave']}, {lb['ordem']} FROM ({lb['sql']}) AS origem
+        WHERE {lb['ordem']} <> 0;""", (inc["nome"],))
+    topk = conn.exec_driver_sql("""
+        SELECT chave, total FROM leaderboard_totais
+        WHERE leaderboard = %s AND total > 0
+        ORDER BY total DESC, chave LIMIT %s;""", (inc["nome"], TOPK)).all()
+    _gravar_topk(conn, inc["nome"], [tuple(linha) for linha in topk])
+    conn.exec_driver_sql("""
+        UPDATE leaderboard_incremental
+        SET recalcular = false, horizonte = NULL, aplicado_em = now(), itens_atualizados = 0
+        WHERE leaderboard = %s;""", (inc["nome"],))
+
+
+def _gravar_topk(conn, leaderboard, topk):
+    conn.exec_driver_sql("DELETE FROM leaderboard_topk WHERE leaderboard = %s;", (leaderboard,))
+    if topk:
+        chaves, totais = zip(*topk)
+        conn.exec_driver_sql("""
+            INSERT INTO leaderboard_topk (leaderboard, posicao, chave, total)
+            SELECT %s, posicao, chave, total
+            FROM unnest(%s::integer[], %s::bigint[]) WITH ORDINALITY AS t(chave, total, posicao);""",
+            (leaderboard, list(chaves), list(totais)))
+
+
+def atualizar_incrementais(engine):
+    # Aplica em leaderboard_totais os deltas registrados até o horizonte e
+    # atualiza o top-K de cada leaderboard incremental. Devolve a duração em
+    # ms por nome de leaderboard (a chave de LEADERBOARDS).
+    tempos = {}
+    incrementais = {lb["incremental"]["nome"]: (nome, lb) for nome, lb in LEADERBOARDS.items() if "incremental" in lb}
+    # Numa conexão própria em READ COMMITTED: o horizonte e o DELETE do log
+    # precisam ver o estado atual, e tudo é gravado numa única transação
+    with engine.connect().execution_options(isolation_level="READ COMMITTED") as conn:
+        if not _incrementais_instalados(conn):
+            return tempos
+        if not conn.exec_driver_sql("SELECT pg_try_advisory_lock(%s);", (_LOCK_INCREMENTAL,)).scalar():
+            logger.info("Leaderboards incrementais já sendo atualizados em outro processo.")
+            return tempos
+        try:
+            pendentes = conn.exec_driver_sql(
+                "SELECT leaderboard FROM leaderboard_incremental WHERE recalcular AND leaderboard = ANY(%s);",
+                (list(incrementais),)).scalars().all()
+            conn.commit()
+            for leaderboard in pendentes:
+                nome, lb = incrementais[leaderboard]
+                inicio = time.perf_counter()
+                with conn.begin():
+                    _recalcular(conn, nome, lb)
+                tempos[nome] = (time.perf_counter() - inicio) * 1000
+                logger.info("Leaderboard %s recalculado (%.0f ms)", nome, tempos[nome])
+
+            inicio = time.perf_counter()
+            ativos = [leaderboard for leaderboard in incrementais if leaderboard not in pendentes]
+            with conn.begin():
+                # xmin do snapshot: as transações com xid menor já terminaram
+                horizonte = conn.exec_driver_sql("SELECT pg_snapshot_xmin(pg_current_snapshot())::text;").scalar()
+                linhas = conn.exec_driver_sql("""
+                    WITH lote AS (
+                        DELETE FROM leaderboard_log
+                        WHERE xid < %s::xid8 AND leaderboard = ANY(%s)
+                        RETURNING leaderboard, chave, delta
+                    )
+                    INSERT INTO leaderboard_totais AS t (leaderboard, chave, total)
+                    SELECT leaderboard, chave, SUM(delta) FROM lote GROUP BY leaderboard, chave
+                    ON CONFLICT (leaderboard, chave) DO UPDATE SET total = t.total + EXCLUDED.total
+                    RETURNING t.leaderboard, t.chave, t.total;""", (horizonte, ativos)).all()
+                alterados = {}
+                for leaderboard, chave, total in linhas:
+                    alterados.setdefault(leaderboard, {})[chave] = total
+                if any(total == 0 for _, _, total in linhas):
+                    conn.exec_driver_sql(
+                        "DELETE FROM leaderboard_totais WHERE leaderboard = ANY(%s) AND total = 0;",
+                        (list(alterados),))
+                for leaderboard, totais in alterados.items():
+                    _aplicar_topk(conn, leaderboard, totais)
+                    conn.exec_driver_sql("""
+                        UPDATE leaderboard_incremental
+                        SET horizonte = %s::xid8, aplicado_em = now(), itens_atualizados = %s
+                        WHERE leaderboard = %s;""", (horizonte, len(totais), leaderboard))
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            for leaderboard in ativos:
+                tempos[incrementais[leaderboard][0]] = duracao_ms
+        finally:
+            # Depois de uma falha a transação fica abortada e o unlock falharia
+            # junto, deixando o lock de sessão preso nesta conexão do pool
+            conn.rollback()
+            conn.exec_driver_sql("SELECT pg_advisory_unlock(%s);", (_LOCK_INCREMENTAL,))
+            conn.commit()
+    return tempos
+
+
+def _aplicar_topk(conn, leaderboard, alterados):
+    # Atualiza leaderboard_topk com os totais alterados; só regrava se mudou
+    atual = [tuple(linha) for linha in conn.exec_driver_sql(
+        "SELECT chave, total FROM leaderboard_topk WHERE leaderboard = %s ORDER BY posicao;", (leaderboard,))]
+    novo = _novo_topk(atual, alterados)
+    if novo is None:
+        novo = [tuple(linha) for linha in conn.exec_driver_sql("""
+            SELECT chave, total FROM leaderboard_totais
+            WHERE leaderboard = %s AND total > 0
+            ORDER BY total DESC, chave LIMIT %s;""", (leaderboard, TOPK))]
+    if novo != atual:
+        _gravar_topk(conn, leaderboard, novo)
+
+
+def refresh_leaderboards(engine):
+    # Atualiza todas as views sem bloquear leituras e registra o tempo de cada uma
+    tempos = {}
+    with engine.connect() as conn:
+        if not conn.exec_driver_sql("SELECT pg_try_advisory_lock(%s);", (_LOCK_ID,)).scalar():
+            logger.info("Refresh de leaderboards já em andamento em outro processo.")
+            return tempos
+        try:
+            incrementais = _incrementais_instalados(conn)
+            for nome, lb in LEADERBOARDS.items():
+                if incrementais and "incremental" in lb:
+                    continue
+                inicio = time.perf_counter()
+                erro = None
+                try:
+                    conn.exec_driver_sql(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {nome};")
+                except Exception as e:
+                    erro = str(e)
+                    logger.warning("Falha ao atualizar %s: %s", nome, e)
+                duracao_ms = (time.perf_counter() - inicio) * 1000
+                if erro is None:
+                    _incrementar_versao(conn, nome)
+                tempos[nome] = duracao_ms
+                conn.exec_driver_sql("""
+                    INSERT INTO leaderboard_refresh (nome, atualizado_em, duracao_ms, erro)
+                    VALUES (%s, now(), %s, %s)
+                    ON CONFLICT (nome) DO UPDATE
+                        SET atualizado_em = EXCLUDED.atualizado_em,
+                            duracao_ms = EXCLUDED.duracao_ms,
+                            erro = EXCLUDED.erro;""", (nome, duracao_ms, erro))
+            if incrementais:
+                erro = None
+                try:
+                    parciais = atualizar_incrementais(engine)
+                except Exception as e:
+                    erro = str(e)
+                    logger.warning("Falha ao atualizar os leaderboards incrementais: %s", e)
+                    parciais = {nome: 0.0 for nome, lb in LEADERBOARDS.items() if "incremental" in lb}
+                tempos.update(parciais)
+                for nome, duracao_ms in parciais.items():
+                    conn.exec_driver_sql("""
+                        INSERT INTO leaderboard_refresh (nome, atualizado_em, duracao_ms, erro)
+                        VALUES (%s, now(), %s, %s)
+                        ON CONFLICT (nome) DO UPDATE
+                            SET atualizado_em = EXCLUDED.atualizado_em,
+                                duracao_ms = EXCLUDED.duracao_ms,
+                                erro = EXCLUDED.erro;""", (nome, duracao_ms, erro))
+        finally:
+            conn.exec_driver_sql("SELECT pg_advisory_unlock(%s);", (_LOCK_ID,))
+    return tempos
+
+
+def _loop_refresh(engine, intervalo):
+    # Cria o que falta antes do primeiro ciclo, já na thread: o rerun que subiu
+    # o scheduler não espera os CREATE MATERIALIZED VIEW
+    try:
+        ensure_leaderboards(engine)
+    except Exception as e:
+        logger.warning("Não foi possível criar os leaderboards: %s", e)
+        return
+    while True:
+        time.sleep(intervalo)
+        try:
+            refresh_leaderboards(engine)
+        except Exception as e:
+            logger.warning("Erro no refresh dos leaderboards: %s", e)
+
+
+@st.cache_resource
+def start_scheduler():
+    # Sobe uma única thread de refresh por processo do Streamlit
+    if _modo_scheduler() != "app":
+        return None
+    engine = init_connection()
+    if engine is None:
+        return None
+    thread = threading.Thread(
+        target=_loop_refresh, args=(engine, _intervalo_segundos()),
+        name="leaderboard-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+def disponiveis():
+    # Views materializadas já criadas no banco (consulta cacheada pelo run_query).
+    # Os nomes vão no texto do SQL para o cache marcar a entrada com as views e
+    # descartá-la quando ensure_leaderboards/refresh incrementam as versões delas
+    nomes = ", ".join(f"'{nome}'" for nome in LEADERBOARDS)
+    df = run_query(f"SELECT matviewname FROM pg_matviews WHERE ispopulated AND matviewname IN ({nomes});")
+    return set(df["matviewname"]) if not df.empty else set()
+
+
+def incrementais():
+    # Leaderboards incrementais com o total já calculado (consultas cacheadas pelo run_query)
+    existe = run_query("SELECT to_regclass('leaderboard_incremental') IS NOT NULL AS existe;")
+    if existe.empty or not existe.iloc[0]["existe"]:
+        return set()
+    df = run_query("SELECT leaderboard FROM leaderboard_incremental WHERE NOT recalcular;")
+    prontos = set(df["leaderboard"]) if not df.empty else set()
+    return {nome for nome, lb in LEADERBOARDS.items() if lb.get("incremental", {}).get("nome") in prontos}
+
+
+def fonte(nome, n=None):
+    # Item de FROM para um ranking: o leaderboard incremental se estiver pronto
+    # (só o top-K guardado quando bastam as n primeiras linhas), a view se ela
+    # existir, senão o agregado ao vivo. As colunas são sempre as da view.
+    lb = LEADERBOARDS[nome]
+    if nome in incrementais():
+        inc = lb["incremental"]
+        tabela = "leaderboard_topk" if n is not None and n <= TOPK else "leaderboard_totais"
+        return f"""(
+            SELECT t.chave AS {lb['chave']}, {inc['colunas']}, t.total AS {lb['ordem']}
+            FROM {tabela} t {inc['juncao']}
+            WHERE t.leaderboard = '{inc['nome']}'
+        ) AS {nome}"""
+    if nome in disponiveis():
+        return nome
+    return f"({lb['sql']}) AS {nome}"
+
+
+def get_refresh_status():
+    # Último refresh de cada leaderboard (página de admin). Lido direto do
+    # principal: leaderboard_refresh não tem versão em table_versions, então
+    # pelo run_query o status ficaria parado até o TTL do cache
+    engine = init_connection()
+    if engine is None:
+        return pd.DataFrame()
+    with engine.connect() as conn:
+        if not conn.exec_driver_sql("SELECT to_regclass('leaderboard_refresh') IS NOT NULL;").scalar():
+            return pd.DataFrame()
+        return pd.read_sql("SELECT * FROM leaderboard_refresh ORDER BY nome;", conn)
+
+
+if __name__ == "__main__":
+    # Worker separado: python leaderboards.py (use LEADERBOARD_SCHEDULER=worker no app)
+    logging.basicConfig(level=logging.INFO)
+    engine = init_connection()
+    ensure_leaderboards(engine)
+    intervalo = _intervalo_segundos()
+    while True:
+        logger.info("Leaderboards atualizados: %s", refresh_leaderboards(engine))
+        time.sleep(intervalo)
@@ -0,0 +1,242 @@
+import functools
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+
+# ----------------------------------------
+# Métricas de queries e gráficos
+# ----------------------------------------
+# Registradas por nome da função de queries.py (o mesmo nome usado no cache)
+# e por nome da função de plot_querys.py. Mostradas na página de admin e
+# exportadas em texto no formato do Prometheus. Também guardam para onde o
+# db.py mandou cada leitura (principal ou réplica) e o estado das réplicas.
+
+# Limites dos buckets dos histogramas, em segundos
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histograma:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.soma = 0.0
+        # Amostras recentes para percentis exatos na página de admin
+        self.recentes = deque(maxlen=512)
+
+    def observar(self, segundos):
+        self.count += 1
+        self.soma += segundos
+        self.recentes.append(segundos)
+        for i, limite in enumerate(BUCKETS):
+            if segundos <= limite:
+                self.buckets[i] += 1
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencia_query = defaultdict(_Histograma)
+        self._tempo_grafico = defaultdict(_Histograma)
+        self._cache = defaultdict(lambda: {"hit": 0, "stale": 0, "miss": 0})
+        self._linhas = defaultdict(int)
+        self._bytes = defaultdict(int)
+        self._erros = defaultdict(int)
+        # Maior pedaço (DataFrame de um chunk) de stream_query, em bytes; não
+        # é o pico de memória do processo, que inclui o que o consumidor guarda
+        self._maior_pedaco = defaultdict(int)
+        # (destino, motivo) -> leituras; réplica -> (saudável, atraso em s)
+        self._rotas = defaultdict(int)
+        self._replicas = {}
+
+    def registrar_cache(self, nome, resultado):
+        # resultado: "hit", "stale" ou "miss"
+        with self._lock:
+            self._cache[nome][resultado] += 1
+
+    def registrar_query(self, nome, segundos, linhas, tamanho_bytes):
+        with self._lock:
+            self._latencia_query[nome].observar(segundos)
+            self._linhas[nome] += linhas
+            self._bytes[nome] += tamanho_bytes
+
+    def registrar_stream(self, nome, segundos, linhas, tamanho_bytes, maior_pedaco_bytes):
+        with self._lock:
+            self._latencia_query[nome].observar(segundos)
+            self._linhas[nome] += linhas
+            self._bytes[nome] += tamanho_bytes
+            self._maior_pedaco[nome] = max(self._maior_pedaco[nome], maior_pedaco_bytes)
+
+    def registrar_erro(self, nome):
+        with self._lock:
+            self._erros[nome] += 1
+
+    def registrar_rota(self, destino, motivo):
+        # destino: "principal" ou host:porta da réplica; motivo: "replica",
+        # "sem_replica_saudavel", "falha_replica" ou "replica_atrasada"
+        with self._lock:
+            self._rotas[(destino, motivo)] += 1
+
+    def registrar_replica(self, nome, saudavel, atraso_s):
+        with self._lock:
+            self._replicas[nome] = (saudavel, atraso_s)
+
+    def registrar_grafico(self, nome, segundos):
+        with self._lock:
+            self._tempo_grafico[nome].observar(segundos)
+
+    def resumo_queries(self):
+        # Uma linha por query: execuções no banco, percentis, cache, linhas e bytes
+        with self._lock:
+            nomes = set(self._latencia_query) | set(self._cache) | set(self._erros)
+            linhas = []
+            for nome in sorted(nomes):
+                hist = self._latencia_query.get(nome) or _Histograma()
+                cache = self._cache.get(nome, {"hit": 0, "stale": 0, "miss": 0})
+                leituras = sum(cache.values())
+                linhas.append({
+                    "query": nome,
+                    "execucoes": hist.count,
+                    **_percentis_ms(hist),
+                    "total_ms": hist.soma * 1000,
+                    "hit_rate": (cache["hit"] + cache["stale"]) / leituras if leituras else None,
+                    "linhas_media": self._linhas[nome] / hist.count if hist.count else None,
+                    "bytes_media": self._bytes[nome] / hist.count if hist.count else None,
+                    "erros": self._erros.get(nome, 0),
+                    "maior_pedaco_bytes": self._maior_pedaco.get(nome),
+                })
+        return pd.DataFrame(linhas)
+
+    def resumo_graficos(self):
+        with self._lock:
+            linhas = [{"grafico": nome, "execucoes": hist.count, **_percentis_ms(hist),
+                       "total_ms": hist.soma * 1000}
+                      for nome, hist in sorted(self._tempo_grafico.items())]
+        return pd.DataFrame(linhas)
+
+    def resumo_rotas(self):
+        with self._lock:
+            linhas = [{"destino": destino, "motivo": motivo, "leituras": valor}
+                      for (destino, motivo), valor in sorted(self._rotas.items())]
+        return pd.DataFrame(linhas)
+
+    def prometheus(self):
+        # Exportação no formato texto do Prometheus (exposition format 0.0.4)
+        saida = []
+        with self._lock:
+            _histograma_prom(saida, "dashboard_query_duration_seconds",
+                             "Tempo de execução das queries no banco.", "query", self._latencia_query)
+            _histograma_prom(saida, "dashboard_chart_build_seconds",
+                             "Tempo de montagem dos gráficos.", "chart", self._tempo_grafico)
+
+            saida.append("# HELP dashboard_query_cache_total Leituras do cache do run_query por resultado.")
+            saida.append("# TYPE dashboard_query_cache_total counter")
+            for nome, contagem in sorted(self._cache.items()):
+                for resultado, valor in contagem.items():
+                    saida.append(f'dashboard_query_cache_total{{query="{_label(nome)}",result="{_label(resultado)}"}} {valor}')
+
+            for metrica, ajuda, valores in (
+                ("dashboard_query_rows_total", "Linhas retornadas pelo banco.", self._linhas),
+                ("dashboard_query_bytes_total", "Bytes dos DataFrames retornados.", self._bytes),
+                ("dashboard_query_errors_total", "Queries que falharam.", self._erros),
+            ):
+                saida.append(f"# HELP {metrica} {ajuda}")
+                saida.append(f"# TYPE {metrica} counter")
+                for nome, valor in sorted(valores.items()):
+                    saida.append(f'{metrica}{{query="{_label(nome)}"}} {valor}')
+
+            saida.append("# HELP dashboard_stream_max_chunk_bytes Maior pedaço (chunk) lido em streaming.")
+            saida.append("# TYPE dashboard_stream_max_chunk_bytes gauge")
+            for nome, valor in sorted(self._maior_pedaco.items()):
+                saida.append(f'dashboard_stream_max_chunk_bytes{{query="{_label(nome)}"}} {valor}')
+
+            saida.append("# HELP dashboard_db_reads_total Leituras por destino (principal ou réplica) e motivo.")
+            saida.append("# TYPE dashboard_db_reads_total counter")
+            for (destino, motivo), valor in sorted(self._rotas.items()):
+                saida.append(f'dashboard_db_reads_total{{target="{_label(destino)}",reason="{_label(motivo)}"}} {valor}')
+
+            saida.append("# HELP dashboard_db_replica_up Réplica saudável no último health check (1) ou não (0).")
+            saida.append("# TYPE dashboard_db_replica_up gauge")
+            for nome, (saudavel, _) in sorted(self._replicas.items()):
+                saida.append(f'dashboard_db_replica_up{{replica="{_label(nome)}"}} {int(saudavel)}')
+            saida.append("# HELP dashboard_db_replica_lag_seconds Atraso de replicação medido no health check.")
+            saida.append("# TYPE dashboard_db_replica_lag_seconds gauge")
+            for nome, (_, atraso) in sorted(self._replicas.items()):
+                if atraso is not None:
+                    saida.append(f'dashboard_db_replica_lag_seconds{{replica="{_label(nome)}"}} {atraso}')
+        return "\n".join(saida) + "\n"
+
+
+def _label(valor):
+    # Valor de label no exposition format: \, " e quebra de linha escapados
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _percentis_ms(hist):
+    if not hist.recentes:
+        return {"p50_ms": None, "p95_ms": None, "max_ms": None}
+    amostras = pd.Series(hist.recentes) * 1000
+    return {"p50_ms": amostras.quantile(0.5), "p95_ms": amostras.quantile(0.95), "max_ms": amostras.max()}
+
+
+def _histograma_prom(saida, metrica, ajuda, label, histogramas):
+    saida.append(f"# HELP {metrica} {ajuda}")
+    saida.append(f"# TYPE {metrica} histogram")
+    for nome, hist in sorted(histogramas.items()):
+        for limite, valor in zip(BUCKETS, hist.buckets):
+            saida.append(f'{metrica}_bucket{{{label}="{_label(nome)}",le="{limite}"}} {valor}')
+        saida.append(f'{metrica}_bucket{{{label}="{_label(nome)}",le="+Inf"}} {hist.count}')
+        saida.append(f'{metrica}_sum{{{label}="{_label(nome)}"}} {hist.soma}')
+        saida.append(f'{metrica}_count{{{label}="{_label(nome)}"}} {hist.count}')
+
+
+@st.cache_resource
+def get_metrics():
+    return Metrics()
+
+
+def medir_grafico(funcao):
+    # Decorator para as funções de plot_querys: registra o tempo de montagem
+    @functools.wraps(funcao)
+    def wrapper(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            get_metrics().registrar_grafico(funcao.__name__, time.perf_counter() - inicio)
+    return wrapper
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        corpo = get_metrics().prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@st.cache_resource
+def start_exporter():
+    # Endpoint /metrics para o Prometheus em METRICS_PORT (desligado se vazio).
+    # Sem autenticação: só escuta em localhost, a menos que METRICS_HOST diga outra interface
+    load_dotenv()
+    porta = os.getenv("METRICS_PORT")
+    if not porta:
+        return None
+    host = os.getenv("METRICS_HOST") or "127.0.0.1"
+    servidor = ThreadingHTTPServer((host, int(porta)), _Handler)
+    threading.Thread(target=servidor.serve_forever, name="metrics-exporter", daemon=True).start()
+    return servidor
@@ -0,0 +1,111 @@
+"""Aplica as migrations de migrations/*.sql que ainda não rodaram no banco.
+
+Uso (a partir da raiz do repositório, com o .env configurado):
+
+    python migrate.py            # aplica as pendentes
+    python migrate.py --status   # só lista aplicadas/pendentes
+
+As versões aplicadas ficam em schema_migrations. Cada statement roda
+separado em autocommit, o que permite CREATE INDEX CONCURRENTLY.
+"""
+import argparse
+import os
+import re
+import sys
+
+import streamlit.config
+import streamlit.logger
+
+# Sem os avisos de "bare mode" do Streamlit ao rodar pela linha de comando
+streamlit.config.set_option("logger.level", "error")
+streamlit.logger.set_log_level("error")
+
+from db import init_connection  # noqa: E402
+
+DIR_MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_RE_DOLLAR = re.compile(r"\$[A-Za-z_]*\$")
+
+
+def separar_statements(sql):
+    # Divide o arquivo em statements no ';', respeitando strings, comentários
+    # e corpos $tag$ ... $tag$ (funções e blocos DO)
+    statements, atual, i = [], [], 0
+    while i < len(sql):
+        c = sql[i]
+        if sql.startswith("--", i):
+            fim = sql.find("\n", i)
+            fim = len(sql) if fim == -1 else fim
+            atual.append(sql[i:fim])
+            i = fim
+        elif c == "'":
+            fim = i + 1
+            while fim < len(sql):
+                if sql[fim] == "'" and not sql.startswith("''", fim):
+                    break
+                fim += 2 if sql.startswith("''", fim) else 1
+            atual.append(sql[i:fim + 1])
+            i = fim + 1
+        elif c == "$" and _RE_DOLLAR.match(sql, i):
+            tag = _RE_DOLLAR.match(sql, i).group()
+            fim = sql.find(tag, i + len(tag))
+            fim = len(sql) if fim == -1 else fim + len(tag)
+            atual.append(sql[i:fim])
+            i = fim
+        elif c == ";":
+            statements.append("".join(atual).strip())
+            atual, i = [], i + 1
+        else:
+            atual.append(c)
+            i += 1
+    statements.append("".join(atual).strip())
+    # Descarta pedaços vazios ou só com comentários
+    return [s for s in statements
+            if any(linha.strip() and not linha.strip().startswith("--") for linha in s.splitlines())]
+
+
+def migrations_disponiveis():
+    return sorted(nome for nome in os.listdir(DIR_MIGRATIONS) if nome.endswith(".sql"))
+
+
+def aplicadas(conn):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            versao TEXT PRIMARY KEY,
+            aplicado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+        );""")
+    return {versao for (versao,) in conn.exec_driver_sql("SELECT versao FROM schema_migrations;")}
+
+
+def migrar(engine, apenas_status=False):
+    with engine.connect() as conn:
+        feitas = aplicadas(conn)
+        pendentes = [nome for nome in migrations_disponiveis() if nome not in feitas]
+        for nome in migrations_disponiveis():
+            print(f"{'aplicada ' if nome in feitas else 'pendente '} {nome}")
+        if apenas_status:
+            return pendentes
+
+        for nome in pendentes:
+            with open(os.path.join(DIR_MIGRATIONS, nome)) as f:
+                statements = separar_statements(f.read())
+            print(f"Aplicando {nome} ({len(statements)} statements)...")
+            for statement in statements:
+                # % literal no SQL não é placeholder: sem parâmetros, escapa para o driver
+                conn.exec_driver_sql(statement.replace("%", "%%"))
+            conn.exec_driver_sql("INSERT INTO schema_migrations (versao) VALUES (%s);", (nome,))
+    return pendentes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="só mostra o estado das migrations")
+    args = parser.parse_args(argv)
+
+    engine = init_connection()
+    if engine is None:
+        sys.exit("Não foi possível conectar ao banco (verifique o .env).")
+    migrar(engine, apenas_status=args.status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+-- Contadores de versão por tabela, usados pelo cache do run_query para
+-- invalidar só as entradas que leem uma tabela alterada.
+-- Triggers por statement: um INSERT de N linhas incrementa a versão uma vez.
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    tabela TEXT PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_versions (tabela, versao)
+    VALUES (lower(TG_TABLE_NAME), 1)
+    ON CONFLICT (tabela) DO UPDATE SET versao = table_versions.versao + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'conta', 'artista', 'conteudo', 'album', 'musica', 'podcast', 'episodio',
+        'escutamusica', 'escutaepisodio', 'salvaalbum', 'seguepodcast', 'seguir'
+    ] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I;', t || '_version', t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();',
+            t || '_version', t);
+        INSERT INTO table_versions (tabela) VALUES (t) ON CONFLICT DO NOTHING;
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,40 @@
+-- Índices de cobertura para os caminhos de acesso das queries do dashboard.
+-- CONCURRENTLY para não bloquear escritas nas tabelas de fato; por isso cada
+-- statement roda fora de transação (o migrate.py executa um por vez).
+
+-- Escutas de um usuário (aba 3): filtro por conta, música e reproduções no índice
+CREATE INDEX CONCURRENTLY IF NOT EXISTS escutamusica_conta_idx
+    ON EscutaMusica (id_da_conta) INCLUDE (id_da_musica, numero_reproducoes);
+
+-- Agregados por música (rankings, reproduções por álbum, top 3 do artista)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS escutamusica_musica_idx
+    ON EscutaMusica (id_da_musica) INCLUDE (numero_reproducoes, id_da_conta);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS escutaepisodio_conta_idx
+    ON EscutaEpisodio (id_da_conta) INCLUDE (id_episodio, numero_reproducoes);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS escutaepisodio_episodio_idx
+    ON EscutaEpisodio (id_episodio) INCLUDE (numero_reproducoes);
+
+-- Músicas de um álbum (discografia, reproduções por álbum)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS musica_album_idx
+    ON Musica (id_album) INCLUDE (id_da_musica, nome);
+
+-- Conteúdo (álbuns e podcasts) de um artista
+CREATE INDEX CONCURRENTLY IF NOT EXISTS conteudo_artista_idx
+    ON Conteudo (id_do_artista) INCLUDE (id, nome);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS episodio_podcast_idx
+    ON Episodio (id_podcast) INCLUDE (id_episodio, nome);
+
+-- Seguidores de um artista, salvamentos de um álbum, seguidores de um podcast
+CREATE INDEX CONCURRENTLY IF NOT EXISTS seguir_conta_idx
+    ON Seguir (id_da_conta) INCLUDE (id_do_usuario);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS salvaalbum_album_idx
+    ON SalvaAlbum (id_album) INCLUDE (id_da_conta);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS seguepodcast_podcast_idx
+    ON SeguePodcast (id_podcast) INCLUDE (id_da_conta);
+
+ANALYZE EscutaMusica, EscutaEpisodio, Musica, Conteudo, Episodio, Seguir, SalvaAlbum, SeguePodcast;
@@ -0,0 +1,12 @@
+-- Extensão de trigramas para a busca de artistas por nome (ILIKE '%termo%').
+-- O índice GIN em mv_artistas.nome é criado pelo ensure_leaderboards; sem a
+-- extensão a busca continua funcionando, só que sem índice. Por isso a falta
+-- do pacote contrib no servidor não bloqueia as migrations seguintes.
+
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN feature_not_supported OR undefined_file OR insufficient_privilege THEN
+    RAISE NOTICE 'pg_trgm indisponível (%): busca de artistas sem índice de trigramas', SQLERRM;
+END;
+$$;
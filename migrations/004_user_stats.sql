@@ -0,0 +1,223 @@
+-- Resumo por usuário para a aba "Análise do Usuário", mantido por triggers nas
+-- tabelas de escutas: a aba lê só as linhas do usuário, sem juntar e agregar
+-- EscutaMusica/EscutaEpisodio a cada cache miss.
+--
+--   user_stats          músicas ouvidas e tempo total (segundos) por conta
+--   user_genero_stats   escutas e reproduções por (conta, gênero) das músicas
+--   user_artista_stats  escutas e reproduções por (conta, artista), músicas e episódios
+--
+-- As views *_ao_vivo calculam o mesmo a partir das tabelas de escutas; são a
+-- fonte do recálculo (recalcular_user_stats, user_stats.py --backfill) e da
+-- verificação (user_stats.py --verificar). Mudanças no catálogo (gênero ou
+-- duração de uma música, álbum de outro artista) não passam pelos triggers:
+-- a verificação aponta as contas afetadas e --corrigir recalcula só elas.
+
+CREATE TABLE IF NOT EXISTS user_stats (
+    id_da_conta INTEGER PRIMARY KEY,
+    total_musicas BIGINT NOT NULL,
+    tempo_total_segundos NUMERIC NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS user_genero_stats (
+    id_da_conta INTEGER NOT NULL,
+    genero TEXT NOT NULL,
+    escutas BIGINT NOT NULL,
+    reproducoes BIGINT NOT NULL,
+    PRIMARY KEY (id_da_conta, genero)
+);
+
+CREATE TABLE IF NOT EXISTS user_artista_stats (
+    id_da_conta INTEGER NOT NULL,
+    id_do_artista INTEGER NOT NULL,
+    escutas BIGINT NOT NULL,
+    reproducoes BIGINT NOT NULL,
+    PRIMARY KEY (id_da_conta, id_do_artista)
+);
+
+CREATE OR REPLACE VIEW user_stats_ao_vivo AS
+SELECT em.id_da_conta,
+       COUNT(*) AS total_musicas,
+       SUM(EXTRACT(EPOCH FROM m.tempo_de_duracao) * em.numero_reproducoes) AS tempo_total_segundos
+FROM EscutaMusica em
+JOIN Musica m ON m.id_da_musica = em.id_da_musica
+GROUP BY em.id_da_conta;
+
+CREATE OR REPLACE VIEW user_genero_stats_ao_vivo AS
+SELECT em.id_da_conta, m.genero, COUNT(*) AS escutas, SUM(em.numero_reproducoes) AS reproducoes
+FROM EscutaMusica em
+JOIN Musica m ON m.id_da_musica = em.id_da_musica
+WHERE m.genero IS NOT NULL
+GROUP BY em.id_da_conta, m.genero;
+
+CREATE OR REPLACE VIEW user_artista_stats_ao_vivo AS
+SELECT id_da_conta, id_do_artista, COUNT(*) AS escutas, SUM(numero_reproducoes) AS reproducoes
+FROM (
+    SELECT em.id_da_conta, c.id_do_artista, em.numero_reproducoes
+    FROM EscutaMusica em
+    JOIN Musica m ON m.id_da_musica = em.id_da_musica
+    JOIN Conteudo c ON c.id = m.id_album
+    UNION ALL
+    SELECT ee.id_da_conta, c.id_do_artista, ee.numero_reproducoes
+    FROM EscutaEpisodio ee
+    JOIN Episodio e ON e.id_episodio = ee.id_episodio
+    JOIN Conteudo c ON c.id = e.id_podcast
+) AS escutas
+GROUP BY id_da_conta, id_do_artista;
+
+-- Recalcula o resumo das contas indicadas (todas, se NULL) a partir das views.
+-- O lock SHARE segura as escritas nas escutas durante o recálculo, para nenhum
+-- delta dos triggers se perder entre o DELETE e o INSERT.
+CREATE OR REPLACE FUNCTION recalcular_user_stats(contas INTEGER[] DEFAULT NULL) RETURNS void AS $$
+BEGIN
+    LOCK TABLE EscutaMusica, EscutaEpisodio IN SHARE MODE;
+    DELETE FROM user_stats WHERE contas IS NULL OR id_da_conta = ANY(contas);
+    DELETE FROM user_genero_stats WHERE contas IS NULL OR id_da_conta = ANY(contas);
+    DELETE FROM user_artista_stats WHERE contas IS NULL OR id_da_conta = ANY(contas);
+    INSERT INTO user_stats
+        SELECT * FROM user_stats_ao_vivo WHERE contas IS NULL OR id_da_conta = ANY(contas);
+    INSERT INTO user_genero_stats
+        SELECT * FROM user_genero_stats_ao_vivo WHERE contas IS NULL OR id_da_conta = ANY(contas);
+    INSERT INTO user_artista_stats
+        SELECT * FROM user_artista_stats_ao_vivo WHERE contas IS NULL OR id_da_conta = ANY(contas);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Linhas que entraram (+1) e saíram (-1) no statement, lidas das transition
+-- tables "novas" e "antigas" do trigger; item é a música ou o episódio
+CREATE OR REPLACE FUNCTION user_stats_delta(op TEXT, item TEXT) RETURNS TEXT AS $$
+    SELECT CASE op
+        WHEN 'INSERT' THEN format(
+            'SELECT id_da_conta, %I AS item, numero_reproducoes, 1 AS sinal FROM novas', item)
+        WHEN 'DELETE' THEN format(
+            'SELECT id_da_conta, %I AS item, numero_reproducoes, -1 AS sinal FROM antigas', item)
+        ELSE format(
+            'SELECT id_da_conta, %1$I AS item, numero_reproducoes, 1 AS sinal FROM novas '
+            'UNION ALL SELECT id_da_conta, %1$I, numero_reproducoes, -1 FROM antigas', item)
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Os trechos abaixo devolvem SQL em vez de executá-lo: as transition tables só
+-- são visíveis no próprio trigger, então é ele quem faz o EXECUTE.
+
+-- Soma o delta em user_artista_stats; juncao leva de delta.item ao Conteudo (c) do artista
+CREATE OR REPLACE FUNCTION user_stats_sql_artistas(juncao TEXT) RETURNS TEXT AS $$
+    SELECT format($sql$
+        INSERT INTO user_artista_stats AS s (id_da_conta, id_do_artista, escutas, reproducoes)
+        SELECT delta.id_da_conta, c.id_do_artista, SUM(delta.sinal), SUM(delta.sinal * delta.numero_reproducoes)
+        FROM delta %s
+        GROUP BY delta.id_da_conta, c.id_do_artista
+        ON CONFLICT (id_da_conta, id_do_artista) DO UPDATE
+            SET escutas = s.escutas + EXCLUDED.escutas,
+                reproducoes = s.reproducoes + EXCLUDED.reproducoes
+    $sql$, juncao);
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Remove as linhas das contas do delta que ficaram sem escutas (UPDATE/DELETE)
+CREATE OR REPLACE FUNCTION user_stats_sql_limpar() RETURNS TEXT AS $$
+    SELECT $sql$
+        , contas AS (SELECT DISTINCT id_da_conta FROM delta)
+        , sem_musicas AS (
+            DELETE FROM user_stats s USING contas
+            WHERE s.id_da_conta = contas.id_da_conta AND s.total_musicas = 0)
+        , sem_generos AS (
+            DELETE FROM user_genero_stats s USING contas
+            WHERE s.id_da_conta = contas.id_da_conta AND s.escutas = 0)
+        DELETE FROM user_artista_stats s USING contas
+        WHERE s.id_da_conta = contas.id_da_conta AND s.escutas = 0
+    $sql$;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION user_stats_escutamusica() RETURNS trigger AS $$
+DECLARE
+    delta TEXT := user_stats_delta(TG_OP, 'id_da_musica');
+BEGIN
+    -- Um único statement: cada CTE soma o delta em uma das tabelas de resumo
+    EXECUTE format($sql$
+        WITH delta AS (%s),
+        musicas AS (
+            INSERT INTO user_stats AS s (id_da_conta, total_musicas, tempo_total_segundos)
+            SELECT delta.id_da_conta, SUM(delta.sinal),
+                   SUM(delta.sinal * EXTRACT(EPOCH FROM m.tempo_de_duracao) * delta.numero_reproducoes)
+            FROM delta JOIN Musica m ON m.id_da_musica = delta.item
+            GROUP BY delta.id_da_conta
+            ON CONFLICT (id_da_conta) DO UPDATE
+                SET total_musicas = s.total_musicas + EXCLUDED.total_musicas,
+                    tempo_total_segundos = s.tempo_total_segundos + EXCLUDED.tempo_total_segundos),
+        generos AS (
+            INSERT INTO user_genero_stats AS s (id_da_conta, genero, escutas, reproducoes)
+            SELECT delta.id_da_conta, m.genero, SUM(delta.sinal), SUM(delta.sinal * delta.numero_reproducoes)
+            FROM delta JOIN Musica m ON m.id_da_musica = delta.item
+            WHERE m.genero IS NOT NULL
+            GROUP BY delta.id_da_conta, m.genero
+            ON CONFLICT (id_da_conta, genero) DO UPDATE
+                SET escutas = s.escutas + EXCLUDED.escutas,
+                    reproducoes = s.reproducoes + EXCLUDED.reproducoes)
+        %s;
+    $sql$, delta, user_stats_sql_artistas(
+        'JOIN Musica m ON m.id_da_musica = delta.item JOIN Conteudo c ON c.id = m.id_album'));
+    IF TG_OP <> 'INSERT' THEN
+        EXECUTE format('WITH delta AS (%s) %s;', delta, user_stats_sql_limpar());
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION user_stats_escutaepisodio() RETURNS trigger AS $$
+DECLARE
+    delta TEXT := user_stats_delta(TG_OP, 'id_episodio');
+BEGIN
+    EXECUTE format('WITH delta AS (%s) %s;', delta, user_stats_sql_artistas(
+        'JOIN Episodio e ON e.id_episodio = delta.item JOIN Conteudo c ON c.id = e.id_podcast'));
+    IF TG_OP <> 'INSERT' THEN
+        EXECUTE format('WITH delta AS (%s) %s;', delta, user_stats_sql_limpar());
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TRUNCATE não tem transition tables: recalcula tudo a partir do que sobrou
+CREATE OR REPLACE FUNCTION user_stats_truncate() RETURNS trigger AS $$
+BEGIN
+    PERFORM recalcular_user_stats();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Um trigger por evento (transition tables não aceitam vários eventos no mesmo
+-- trigger), todos por statement: um COPY de N linhas aplica um único delta
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['escutamusica', 'escutaepisodio'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I;', t || '_stats_insert', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I;', t || '_stats_update', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I;', t || '_stats_delete', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I;', t || '_stats_truncate', t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS novas '
+            'FOR EACH STATEMENT EXECUTE FUNCTION %I();', t || '_stats_insert', t, 'user_stats_' || t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER UPDATE ON %I REFERENCING OLD TABLE AS antigas NEW TABLE AS novas '
+            'FOR EACH STATEMENT EXECUTE FUNCTION %I();', t || '_stats_update', t, 'user_stats_' || t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS antigas '
+            'FOR EACH STATEMENT EXECUTE FUNCTION %I();', t || '_stats_delete', t, 'user_stats_' || t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION user_stats_truncate();', t || '_stats_truncate', t);
+    END LOOP;
+
+    -- Versões para o cache do run_query, como nas demais tabelas (001)
+    FOREACH t IN ARRAY ARRAY['user_stats', 'user_genero_stats', 'user_artista_stats'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I;', t || '_version', t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();',
+            t || '_version', t);
+        INSERT INTO table_versions (tabela) VALUES (t) ON CONFLICT DO NOTHING;
+    END LOOP;
+END;
+$$;
+
+SELECT recalcular_user_stats();
@@ -0,0 +1,103 @@
+-- Rankings globais incrementais (leaderboards.py, entradas com "incremental").
+-- Triggers nas tabelas de origem registram em leaderboard_log o delta de cada
+-- statement por item; o refresh soma no total corrente de cada item só o que
+-- chegou desde o último horizonte e atualiza o top-K guardado, então o custo
+-- acompanha a atividade nova, não o histórico.
+--
+--   leaderboard_log          deltas (item, +/-) com o xid da transação que os gerou
+--   leaderboard_totais       total corrente por (leaderboard, item)
+--   leaderboard_topk         os K primeiros de cada leaderboard, em ordem
+--   leaderboard_incremental  horizonte (watermark) e estado de cada leaderboard
+--
+-- O horizonte é o xmin do snapshot no momento do refresh: toda transação com
+-- xid menor já terminou, então os deltas abaixo dele estão completos e nenhum
+-- commit atrasado fica para trás. Os triggers de cada tabela são criados pelo
+-- ensure_leaderboards a partir das definições em leaderboards.py.
+
+CREATE TABLE IF NOT EXISTS leaderboard_log (
+    leaderboard TEXT NOT NULL,
+    chave INTEGER NOT NULL,
+    delta BIGINT NOT NULL,
+    xid xid8 NOT NULL DEFAULT pg_current_xact_id()
+);
+
+CREATE INDEX IF NOT EXISTS leaderboard_log_xid ON leaderboard_log (xid);
+
+CREATE TABLE IF NOT EXISTS leaderboard_totais (
+    leaderboard TEXT NOT NULL,
+    chave INTEGER NOT NULL,
+    total BIGINT NOT NULL,
+    PRIMARY KEY (leaderboard, chave)
+);
+
+-- Ranking completo por índice (exportação e top-N maiores que K)
+CREATE INDEX IF NOT EXISTS leaderboard_totais_rank ON leaderboard_totais (leaderboard, total DESC, chave);
+
+CREATE TABLE IF NOT EXISTS leaderboard_topk (
+    leaderboard TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    chave INTEGER NOT NULL,
+    total BIGINT NOT NULL,
+    PRIMARY KEY (leaderboard, posicao)
+);
+
+-- recalcular: o total precisa ser refeito a partir das tabelas de origem
+-- (leaderboard novo, TRUNCATE na origem ou pedido manual)
+CREATE TABLE IF NOT EXISTS leaderboard_incremental (
+    leaderboard TEXT PRIMARY KEY,
+    horizonte xid8,
+    aplicado_em TIMESTAMPTZ,
+    itens_atualizados BIGINT NOT NULL DEFAULT 0,
+    recalcular BOOLEAN NOT NULL DEFAULT true
+);
+
+-- Trigger por statement com transition tables. Argumentos: nome do leaderboard,
+-- expressão da chave e expressão do delta sobre a linha (ex.: 'id_album', '1')
+CREATE OR REPLACE FUNCTION leaderboard_registrar() RETURNS trigger AS $$
+DECLARE
+    chave TEXT := TG_ARGV[1];
+    delta TEXT := TG_ARGV[2];
+    linhas TEXT;
+BEGIN
+    linhas := CASE TG_OP
+        WHEN 'INSERT' THEN format('SELECT %s AS chave, %s AS delta FROM novas', chave, delta)
+        WHEN 'DELETE' THEN format('SELECT %s AS chave, -(%s) AS delta FROM antigas', chave, delta)
+        ELSE format('SELECT %1$s AS chave, %2$s AS delta FROM novas '
+                    'UNION ALL SELECT %1$s, -(%2$s) FROM antigas', chave, delta)
+    END;
+    EXECUTE format($sql$
+        INSERT INTO leaderboard_log (leaderboard, chave, delta)
+        SELECT %L, chave, SUM(delta)
+        FROM (%s) AS linhas
+        WHERE chave IS NOT NULL
+        GROUP BY chave
+        HAVING SUM(delta) <> 0;
+    $sql$, TG_ARGV[0], linhas);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TRUNCATE não tem transition tables: marca o leaderboard para recálculo
+CREATE OR REPLACE FUNCTION leaderboard_truncate() RETURNS trigger AS $$
+BEGIN
+    UPDATE leaderboard_incremental SET recalcular = true WHERE leaderboard = TG_ARGV[0];
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Versões para o cache do run_query, como nas demais tabelas (001). O top-K só
+-- é regravado quando muda, então as leituras de top-N só são invalidadas aí.
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['leaderboard_totais', 'leaderboard_topk', 'leaderboard_incremental'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I;', t || '_version', t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();',
+            t || '_version', t);
+        INSERT INTO table_versions (tabela) VALUES (t) ON CONFLICT DO NOTHING;
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,8 @@
+-- Busca da conta pelo nome de usuário no login (auth.buscar_conta): o id vem
+-- no próprio índice, então a busca é um index-only scan. CONCURRENTLY para não
+-- bloquear cadastros, como em 002.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS conta_usuario_idx
+    ON Conta (nome_de_usuario) INCLUDE (id);
+
+ANALYZE Conta;
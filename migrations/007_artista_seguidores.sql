@@ -0,0 +1,6 @@
+-- O leaderboard de artistas mais seguidos passou a ignorar, já no trigger de
+-- Seguir, as contas que não são artistas (chave NULL em leaderboards.py).
+-- Os totais gravados antes podem ter essas contas ocupando o top-K: o
+-- próximo refresh refaz o leaderboard a partir da view.
+
+UPDATE leaderboard_incremental SET recalcular = true WHERE leaderboard = 'artista_seguidores';
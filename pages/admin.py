@@ -0,0 +1,140 @@
+import streamlit as st
+import os
+import tempfile
+from dotenv import load_dotenv
+import leaderboards as lb
+from cache import get_cache
+from db import exportar_csv, status_replicas
+from metrics import get_metrics, start_exporter
+
+st.set_page_config(
+    page_title="Admin - Spotify Dashboard",
+    page_icon="🛠️",
+    layout="wide",
+)
+
+# ----------------------------------------
+# Acesso: só usuários logados listados em ADMIN_USERS (.env)
+# ----------------------------------------
+load_dotenv()
+admins = {nome.strip() for nome in (os.getenv("ADMIN_USERS") or "").split(",") if nome.strip()}
+
+if not st.session_state.get("logged_in"):
+    st.switch_page("pages/login.py")
+
+if st.session_state.get("username") not in admins:
+    st.error("Acesso restrito a administradores.")
+    st.stop()
+
+st.title("🛠️ Administração")
+
+# ----------------------------------------
+# Cache de resultados do run_query
+# ----------------------------------------
+cache = get_cache()
+st.header("Cache de queries")
+
+stats = cache.stats()
+total_leituras = stats["hits"] + stats["stale_hits"] + stats["misses"]
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Uso", f"{stats['bytes'] / 1024 ** 2:.1f} MB",
+            delta=f"de {stats['max_bytes'] / 1024 ** 2:.0f} MB", delta_color="off")
+col2.metric("Entradas", stats["entradas"])
+col3.metric("Hit rate", f"{(stats['hits'] + stats['stale_hits']) / total_leituras:.0%}" if total_leituras else "—")
+col4.metric("Evictions", stats["evictions"],
+            delta=f"{stats['expirations']} expiradas", delta_color="off")
+st.caption(f"Política de eviction: {stats['politica'].upper()} · "
+           f"hits {stats['hits']} · stale hits {stats['stale_hits']} · misses {stats['misses']} · "
+           f"invalidações {stats['invalidations']} · "
+           f"rejeitados (maiores que o orçamento) {stats['rejeitados']}")
+
+df_entradas = cache.entries()
+st.dataframe(df_entradas, use_container_width=True, hide_index=True)
+
+col1, col2 = st.columns([3, 1])
+with col1:
+    query_escolhida = st.selectbox("Query", df_entradas["query"].tolist(), key="admin_cache_query")
+    if st.button("Remover entradas desta query", disabled=query_escolhida is None):
+        removidas = cache.evict_query(query_escolhida)
+        st.toast(f"{removidas} entrada(s) de {query_escolhida} removida(s).")
+        st.rerun()
+with col2:
+    if st.button("Limpar todo o cache", type="secondary"):
+        cache.clear()
+        st.rerun()
+
+# ----------------------------------------
+# Desempenho por query e por gráfico
+# ----------------------------------------
+metrics = get_metrics()
+start_exporter()
+st.header("Desempenho")
+
+st.subheader("Queries")
+st.caption("Execuções no banco (misses e revalidações); percentis sobre as últimas 512 execuções.")
+df_queries = metrics.resumo_queries()
+if df_queries.empty:
+    st.info("Nenhuma query registrada ainda.")
+else:
+    st.dataframe(df_queries.sort_values("total_ms", ascending=False),
+                 use_container_width=True, hide_index=True)
+
+st.subheader("Gráficos")
+df_graficos = metrics.resumo_graficos()
+if df_graficos.empty:
+    st.info("Nenhum gráfico registrado ainda.")
+else:
+    st.dataframe(df_graficos.sort_values("total_ms", ascending=False),
+                 use_container_width=True, hide_index=True)
+
+st.subheader("Réplicas de leitura")
+df_replicas = status_replicas()
+if df_replicas.empty:
+    st.info("Sem réplicas configuradas (DB_READ_REPLICAS): todas as leituras vão para o principal.")
+else:
+    st.dataframe(df_replicas, use_container_width=True, hide_index=True)
+    st.caption("Leituras do run_query e do streaming por destino e motivo do roteamento.")
+    st.dataframe(metrics.resumo_rotas(), use_container_width=True, hide_index=True)
+
+texto_prometheus = metrics.prometheus()
+with st.expander("Exportação Prometheus"):
+    st.code(texto_prometheus, language="text")
+st.download_button("Baixar métricas (Prometheus)", texto_prometheus,
+                   file_name="metrics.txt", mime="text/plain")
+
+# ----------------------------------------
+# Refresh dos leaderboards
+# ----------------------------------------
+st.header("Leaderboards")
+df_refresh = lb.get_refresh_status()
+if df_refresh.empty:
+    st.info("Nenhum refresh registrado ainda.")
+else:
+    st.caption("Último refresh de cada ranking; erro preenchido quando a última tentativa falhou.")
+    st.dataframe(df_refresh, use_container_width=True, hide_index=True)
+
+# ----------------------------------------
+# Exportação dos rankings (lidos em streaming, sem passar pelo cache)
+# ----------------------------------------
+st.header("Exportar rankings")
+ranking_escolhido = st.selectbox("Ranking", list(lb.LEADERBOARDS), key="admin_export_ranking")
+# O download_button guarda o arquivo inteiro na memória do Streamlit: o CSV
+# é escrito em disco pedaço por pedaço, mas limitado a ADMIN_EXPORT_MAX_ROWS
+max_linhas = int(os.getenv("ADMIN_EXPORT_MAX_ROWS") or 100_000)
+st.caption(f"Até {max_linhas} linhas por exportação. Para o ranking inteiro use "
+           "db.exportar_csv fora do app, direto para um arquivo.")
+if st.button("Gerar CSV"):
+    definicao = lb.LEADERBOARDS[ranking_escolhido]
+    ordem = f" ORDER BY {definicao['ordem']} DESC" if "ordem" in definicao else ""
+    arquivo = tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8", newline="", delete=False)
+    try:
+        with arquivo, st.spinner("Exportando..."):
+            linhas = exportar_csv(f"SELECT * FROM {lb.fonte(ranking_escolhido)}{ordem} LIMIT {max_linhas};",
+                                  arquivo, nome=f"export_{ranking_escolhido}")
+        if linhas >= max_linhas:
+            st.warning(f"Exportação cortada nas primeiras {linhas} linhas (ADMIN_EXPORT_MAX_ROWS).")
+        with open(arquivo.name, "rb") as csv_gerado:
+            st.download_button(f"Baixar {ranking_escolhido}.csv ({linhas} linhas)", csv_gerado,
+                               file_name=f"{ranking_escolhido}.csv", mime="text/csv")
+    finally:
+        os.remove(arquivo.name)
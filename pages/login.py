@@ -1,6 +1,9 @@
 import streamlit as st
 import os
-from db import init_connection, run_query
+import leaderboards as lb
+from auth import buscar_conta
+from db import init_connection
+from prefetch import aquecer_cache, aquecer_usuario, limpar_abas
 
 # 1. Função para carregar o CSS
 def load_css(file_name):
@@ -28,6 +31,13 @@ st.set_page_config(
     initial_sidebar_state="collapsed" # ESSENCIAL: Garante que o sidebar não apareça
 )
 
+# Aquece o pool de conexões e o cache das consultas globais enquanto o
+# usuário digita o login. O scheduler sobe antes: é ele que cria as views
+# materializadas que as consultas globais leem
+init_connection()
+lb.start_scheduler()
+aquecer_cache()
+
 # --- Configuração Inicial de Session State (Importante para evitar KeyErrors) ---
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
@@ -48,32 +58,28 @@ def do_login():
         st.error("Por favor, digite seu nome de usuário.")
         return
 
-    # 1. PREPARA A QUERY PARA VALIDAR O USUÁRIO
-    query = """
-        SELECT id, nome_de_usuario 
-        FROM Conta 
-        WHERE nome_de_usuario = %s;
-    """
-
-    # 2. EXECUTA A QUERY
-    # Passamos o nome de usuário como uma tupla (parâmetro)
+    # 1. BUSCA A CONTA PELO NOME DE USUÁRIO
+    # Caminho próprio do login (auth.py): índice em Conta e cache só dos nomes inexistentes
     try:
-        df_user = run_query(query, (username_input,))
+        conta = buscar_conta(username_input)
     except Exception as e:
         st.error(f"Erro ao verificar usuário")
         return
 
-    # 3. VERIFICA O RESULTADO
-    if df_user.empty:
+    # 2. VERIFICA O RESULTADO
+    if conta is None:
         # Usuário NÃO encontrado
         st.error("Usuário não encontrado. Verifique o nome de usuário.")
         st.session_state.logged_in = False
     else:
         # Usuário ENCONTRADO
         # Armazena as informações do usuário na sessão
-        st.session_state.username = df_user.iloc[0]['nome_de_usuario']
-        st.session_state.user_id = int(df_user.iloc[0]['id'])
+        st.session_state.user_id, st.session_state.username = conta
         st.session_state.logged_in = True
+        limpar_abas()  # Nada da sessão anterior é reaproveitado para o novo usuário
+
+        # 3. Já dispara as consultas da aba do usuário, que rodam enquanto o app.py carrega
+        aquecer_usuario(st.session_state.user_id)
 
         # 4. Redireciona para a página principal
         st.switch_page("app.py")
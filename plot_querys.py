@@ -1,40 +1,33 @@
 import streamlit as st
 import altair as alt
-import pandas as pd
 import plotly.express as px
 import queries as q
 from db import run_query
+from metrics import medir_grafico
 
 #--------------------------------------------
 #--------------------GERAL-------------------
 #--------------------------------------------
 
-def plot_total_musicas():
-    df_total_musicas = q.get_total_musicas_geral_count()
-    total_musicas = df_total_musicas.iloc[0]['total'] if not df_total_musicas.empty else 0
-    st.metric("🎵 Total de músicas", total_musicas)
-
-def plot_total_artistas():
-    df_total_artistas = q.get_total_artistas_geral_count()
-    total_musicas = df_total_artistas.iloc[0]['total'] if not df_total_artistas.empty else 0
-    st.metric("👥 Total de artistas", total_musicas)
-
-def plot_total_album():
-    df_total_album = q.get_total_album_geral_count()
-    total_album = df_total_album.iloc[0]['total'] if not df_total_album.empty else 0
-    st.metric("📀 Total de álbuns", total_album)
-
-def plot_total_podcast():
-    df_total_podcast = q.get_total_podcasts_geral_count()
-    total_podcast = df_total_podcast.iloc[0]['total'] if not df_total_podcast.empty else 0
-    st.metric("🎙️ Total de podcasts", total_podcast)
-
-def plot_top5_musicas_geral():
-    try:
-        df_top_musicas = q.get_top5_musicas_geral()
-    except Exception as e:
-        st.error(f"Erro ao buscar os dados do banco de dados: {e}")
-        df_top_musicas = pd.DataFrame()
+@medir_grafico
+def plot_total_musicas(overview):
+    st.metric("🎵 Total de músicas", overview.total_musicas)
+
+@medir_grafico
+def plot_total_artistas(overview):
+    st.metric("👥 Total de artistas", overview.total_artistas)
+
+@medir_grafico
+def plot_total_album(overview):
+    st.metric("📀 Total de álbuns", overview.total_albuns)
+
+@medir_grafico
+def plot_total_podcast(overview):
+    st.metric("🎙️ Total de podcasts", overview.total_podcasts)
+
+@medir_grafico
+def plot_top5_musicas_geral(overview):
+    df_top_musicas = overview.top5_musicas
 
     if not df_top_musicas.empty:
 
@@ -88,12 +81,9 @@ def plot_top5_musicas_geral():
         st.info("Nenhum dado encontrado para as Top 5 músicas.")
    
 
-def plot_top_10_albuns():
-    try:
-        df_top_albuns = q.get_top_10_albuns_com_mais_faixas()
-    except Exception as e:
-        st.error(f"Erro ao carregar os dados dos álbuns: {e}")
-        df_top_albuns = pd.DataFrame()
+@medir_grafico
+def plot_top_10_albuns(overview):
+    df_top_albuns = overview.top10_albuns_faixas
 
     if not df_top_albuns.empty:
         df_top_albuns = df_top_albuns.sort_values(by='total_de_musicas', ascending=False)
@@ -146,12 +136,9 @@ def plot_top_10_albuns():
     else:
         st.info("Nenhum álbum encontrado para o ranking Top 10.")
 
-def plot_top_5_albuns_salvos():
-    try:
-        df_top_albuns_salvos = q.get_top5_albuns_salvos()
-    except Exception as e:
-        st.error(f"Erro ao carregar os dados dos álbuns salvos: {e}")
-        df_top_albuns_salvos = pd.DataFrame()
+@medir_grafico
+def plot_top_5_albuns_salvos(overview):
+    df_top_albuns_salvos = overview.top5_albuns_salvos
 
     if not df_top_albuns_salvos.empty:
         # 2. Ordenar o DataFrame
@@ -206,12 +193,9 @@ def plot_top_5_albuns_salvos():
     else:
         st.info("Nenhum dado de álbum salvo encontrado.")
 
-def plot_top_5_podcasts_seguidos():
-    try:
-        df_top_podcasts = q.get_top5_podcast_seguidos()
-    except Exception as e:
-        st.error(f"Erro ao carregar os dados dos podcasts: {e}")
-        df_top_podcasts = pd.DataFrame()
+@medir_grafico
+def plot_top_5_podcasts_seguidos(overview):
+    df_top_podcasts = overview.top5_podcasts_seguidos
 
     if not df_top_podcasts.empty:
         # 2. Ordenar o DataFrame (opcional, pois o SQL já ordena, mas garante a consistência)
@@ -270,8 +254,8 @@ def plot_top_5_podcasts_seguidos():
 #--------------------------------------------
 #-------------------ARTISTA------------------
 #--------------------------------------------
-def plot_artista_mais_seguido():
-    df_mais_seguidores = q.get_art_mais_seguidores()
+@medir_grafico
+def plot_artista_mais_seguido(df_mais_seguidores):
     if not df_mais_seguidores.empty:
         artista_nome = df_mais_seguidores.iloc[0]['nome']
         seguidores = df_mais_seguidores.iloc[0]['total_seguidores']
@@ -281,8 +265,11 @@ def plot_artista_mais_seguido():
     else:
         st.info("Não foi possível carregar o artista com mais seguidores.")
 
-def plot_artista_mais_mus_publi():
-    df_mais_music_publicada = q.get_art_mais_mus_publi()
+@medir_grafico
+def plot_artista_mais_mus_publi(df_mais_music_publicada):
+    if df_mais_music_publicada.empty:
+        st.info("Não foi possível carregar o artista com mais músicas publicadas.")
+        return
     artista_music_publicada = df_mais_music_publicada.iloc[0]['nome_artista']
     num_musicas = df_mais_music_publicada.iloc[0]['numero_musicas']
     st.metric(label="Artista com mais músicas publicadas",
@@ -290,19 +277,87 @@ def plot_artista_mais_mus_publi():
               delta=f"{num_musicas} músicas")
 
 
-def plot_info_artista():
-    # --------- Dropdown de artista ---------
-    st.subheader("Selecione um artista para análise")
-    df_artistas = q.get_all_artists()
-    artista_escolhido = st.selectbox(
-        "Digite para filtrar artistas:",
-        df_artistas["nome"].tolist()
+@st.fragment
+@medir_grafico
+def _plot_musicas_do_album(snapshot):
+    # Fragmento: trocar o álbum reroda só este trecho, respondido do snapshot
+    df_albuns = snapshot.albuns
+    nomes_albuns = dict(zip(df_albuns["id_album"].astype(int), df_albuns["nome_album"]))
+    id_album = st.selectbox(
+        "Selecione um álbum do artista:",
+        list(nomes_albuns),
+        format_func=nomes_albuns.get,
+        key="select_album_musico"  # Key única
     )
+    album_escolhido = nomes_albuns[id_album]
+
+    st.subheader(f'Músicas escutadas do álbum "{album_escolhido}" ')
+    df_musicas = snapshot.plays_do_album(id_album)
+    if df_musicas['reproducoes'].sum() == 0:
+        st.info("Este álbum ainda não tem nenhuma reprodução registrada.")
+    else:
+        fig = px.pie(
+            df_musicas,
+            names="musica",
+            values="reproducoes",
+            title=f"Músicas mais escutadas — {album_escolhido}"
+        )
+        fig.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+            font_color='#FFFFFF', legend_font_color='#FFFFFF',
+            title_font_color='#FFFFFF'
+        )
+        st.plotly_chart(fig)
+
+
+TIPOS_ARTISTA = {"musico": "músico", "podcaster": "podcaster", "desconhecido": "sem conteúdo"}
 
-    id_artista = int(df_artistas[df_artistas["nome"] == artista_escolhido]["id_do_artista"].iloc[0])
+
+def _mudar_pagina_artistas(delta):
+    st.session_state.pagina_artistas = max(0, st.session_state.get("pagina_artistas", 0) + delta)
+
+
+@st.fragment
+@medir_grafico
+def plot_info_artista(tops_por_artista):
+    # --------- Busca de artista (no banco, uma página por vez) ---------
+    st.subheader("Selecione um artista para análise")
+    termo = st.text_input(
+        "Digite para buscar artistas:",
+        key="busca_artista",
+        on_change=lambda: st.session_state.update(pagina_artistas=0)
+    )
+    pagina = st.session_state.setdefault("pagina_artistas", 0)
+    df_artistas = q.get_artistas_por_nome(termo, pagina)
+    tem_proxima = len(df_artistas) > q.ARTISTAS_POR_PAGINA
+    df_artistas = df_artistas.head(q.ARTISTAS_POR_PAGINA)
+    if df_artistas.empty:
+        st.info("Nenhum artista encontrado." if termo or pagina else "Nenhum artista cadastrado.")
+        return
+
+    # Opções são os ids: nomes repetidos não se confundem
+    nomes = dict(zip(df_artistas["id_do_artista"].astype(int), df_artistas["nome"]))
+    tipos = dict(zip(df_artistas["id_do_artista"].astype(int), df_artistas["tipo"]))
+    id_artista = st.selectbox(
+        "Artistas encontrados:",
+        list(nomes),
+        format_func=lambda id_: f"{nomes[id_]} ({TIPOS_ARTISTA.get(tipos[id_], tipos[id_])})"
+    )
+    col_anterior, col_pagina, col_proxima = st.columns([1, 2, 1])
+    col_anterior.button("◀ Anteriores", on_click=_mudar_pagina_artistas, args=(-1,),
+                        disabled=pagina == 0, key="artistas_anteriores")
+    col_pagina.caption(f"Página {pagina + 1}")
+    col_proxima.button("Próximos ▶", on_click=_mudar_pagina_artistas, args=(1,),
+                       disabled=not tem_proxima, key="artistas_proximos")
+
+    artista_escolhido = nomes[id_artista]
     st.success(f"Artista selecionado: {artista_escolhido}")
 
-    artist_type = q.check_artist_type(id_artista)
+    # Top-N já calculados para todos os artistas; o resto vem em uma única query
+    # e trocar o álbum não consulta o banco
+    tops = tops_por_artista.do_artista(id_artista)
+    snapshot = q.get_artist_snapshot(id_artista)
+    artist_type = snapshot.tipo
 
     # ----- O ARTISTA É UM MÚSICO -----
     if artist_type == 'musico':
@@ -314,7 +369,7 @@ def plot_info_artista():
         # Top 3 Músicas
         with col_metric_1:
             st.markdown("<h5>Top 3 Músicas Mais Ouvidas</h5>", unsafe_allow_html=True)
-            df_top3_musicas = q.get_top3_musicas_art(id_artista)
+            df_top3_musicas = tops.top3_musicas
             if not df_top3_musicas.empty:
                 lista_musicas_formatada = ""
                 for index, row in df_top3_musicas.reset_index().iterrows():
@@ -327,7 +382,7 @@ def plot_info_artista():
         # Álbum Mais Salvo
         with col_metric_2:
             st.markdown("<h5>Álbum Mais Salvo</h5>", unsafe_allow_html=True)
-            df_album_salvo = q.get_album_mais_salvo_do_artista(id_artista)
+            df_album_salvo = tops.album_mais_salvo
             if not df_album_salvo.empty:
                 album_nome = df_album_salvo.iloc[0]['nome_do_album']
                 salvos = df_album_salvo.iloc[0]['total_de_vezes_salvo']
@@ -341,7 +396,7 @@ def plot_info_artista():
 
         # --- Discografia (Gráfico de Barras) ---
         st.subheader(f"Discografia de {artista_escolhido}")
-        df_contagem = q.get_song_count_per_album(id_artista)
+        df_contagem = snapshot.musicas_por_album
         if not df_contagem.empty:
             fig_bar = px.bar(
                 df_contagem,
@@ -364,35 +419,12 @@ def plot_info_artista():
 
         # --- Análise por Álbum (Dropdown Interativo) ---
         st.subheader("Análise por Álbum")
-        df_albuns = q.get_albums_by_artist(id_artista)
+        df_albuns = snapshot.albuns
 
         if df_albuns.empty:
             st.warning("Este artista não possui álbuns cadastrados.")
         else:
-            album_escolhido = st.selectbox(
-                "Selecione um álbum do artista:",
-                df_albuns["nome_album"].tolist(),
-                key="select_album_musico"  # Key única
-            )
-            id_album = int(df_albuns[df_albuns["nome_album"] == album_escolhido]["id_album"].iloc[0])
-
-            st.subheader(f'Músicas escutadas do álbum "{album_escolhido}" ')
-            df_musicas = q.get_song_plays_by_album(id_album)
-            if df_musicas['reproducoes'].sum() == 0:
-                st.info("Este álbum ainda não tem nenhuma reprodução registrada.")
-            else:
-                fig = px.pie(
-                    df_musicas,
-                    names="musica",
-                    values="reproducoes",
-                    title=f"Músicas mais escutadas — {album_escolhido}"
-                )
-                fig.update_layout(
-                    paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
-                    font_color='#FFFFFF', legend_font_color='#FFFFFF',
-                    title_font_color='#FFFFFF'
-                )
-                st.plotly_chart(fig)
+            _plot_musicas_do_album(snapshot)
 
     # -----  O ARTISTA É UM PODCASTER -----
     elif artist_type == 'podcaster':
@@ -404,7 +436,7 @@ def plot_info_artista():
         # Métrica: Top 3 Episódios
         with col_metric_1:
             st.markdown("<h5>Top 3 Episódios Mais Ouvidos</h5>", unsafe_allow_html=True)
-            df_top3_episodios = q.get_top3_episodios_podcaster(id_artista)
+            df_top3_episodios = tops.top3_episodios
 
             if not df_top3_episodios.empty:
                 lista_episodios_formatada = ""
@@ -418,20 +450,15 @@ def plot_info_artista():
         # Métrica: Total de Seguidores do Podcast
         with col_metric_2:
             st.markdown("<h5>Total de Seguidores</h5>", unsafe_allow_html=True)
-            df_seguidores = q.get_seguidores_podcast_artista(id_artista)
-
-            if not df_seguidores.empty:
-                total_seguidores = df_seguidores.iloc[0]['total_seguidores']
-                st.metric(label="Seguidores",
-                          value=f"{total_seguidores}")
-            else:
-                st.info("Nenhuma contagem de seguidores encontrada.")
+            total_seguidores = snapshot.total_seguidores_podcast
+            st.metric(label="Seguidores",
+                      value=f"{total_seguidores}")
 
         st.markdown("---")
         st.subheader("Distribuição de Reproduções por Episódio")
 
-        # 1. Chamar a nova query
-        df_all_eps = q.get_all_episode_plays_by_artist(id_artista)
+        # 1. Reproduções de todos os episódios (já no snapshot)
+        df_all_eps = snapshot.plays_episodios
 
         # 2. Verificar e plotar
         if df_all_eps.empty:
@@ -466,16 +493,13 @@ def plot_info_artista():
 #-------------------USUARIO------------------
 #--------------------------------------------
 
-def plot_total_musicas_user(user_id_logado):
-    df_total_musicas_user = q.get_total_musicas_usuario(user_id_logado)
-    total_musicas_user = df_total_musicas_user.iloc[0]['total_musicas'] if not df_total_musicas_user.empty else 0
-    
-    st.metric("Total de Músicas Ouvidas", total_musicas_user)
+@medir_grafico
+def plot_total_musicas_user(profile):
+    st.metric("Total de Músicas Ouvidas", profile.total_musicas)
 
-def plot_tempo_total_escutado(user_id_logado):
-    total_segundos = q.get_tempo_total_escutado_segundos(user_id_logado)
-    if total_segundos is None:
-        total_segundos = 0
+@medir_grafico
+def plot_tempo_total_escutado(profile):
+    total_segundos = profile.tempo_total_segundos
 
     total_minutos = total_segundos // 60
     horas = total_minutos // 60
@@ -483,9 +507,9 @@ def plot_tempo_total_escutado(user_id_logado):
 
     st.metric("Horas ouvindo", f"{horas}h {minutos}m")
 
-def plot_artista_favorito(user_id_logado):
-    df_art_fav = q.get_top1_art_ouvido(user_id_logado)
-    artista_fav = df_art_fav.iloc[0]['nome'] if not df_art_fav.empty else "N/A"
+@medir_grafico
+def plot_artista_favorito(profile):
+    artista_fav = profile.artista_favorito
 
     st.markdown("**Artista favorito**")
 
@@ -496,14 +520,13 @@ def plot_artista_favorito(user_id_logado):
         </p>
         """, unsafe_allow_html=True)
 
-def plot_genero_musica_preferido(user_id_logado): ###### ALTERAR
-    df_gen_album = q.get_genero_musica_ouvida(user_id_logado)
-    genero_album_pref = df_gen_album.iloc[0]['genero'] if not df_gen_album.empty else "N/A"
-    st.metric("Gênero de Música Preferido", genero_album_pref)
+@medir_grafico
+def plot_genero_musica_preferido(profile):
+    st.metric("Gênero de Música Preferido", profile.genero_preferido)
 
-def plot_musica_favorita(user_id_logado):
-    df_mus_fav = q.get_top1_musica_ouvida(user_id_logado)
-    musica_fav = df_mus_fav.iloc[0]['nome'] if not df_mus_fav.empty else "N/A"
+@medir_grafico
+def plot_musica_favorita(profile):
+    musica_fav = profile.musica_favorita
     # Rótulo em negrito
     st.markdown("**Música favorita**")
 
@@ -514,8 +537,9 @@ def plot_musica_favorita(user_id_logado):
         </p>
         """, unsafe_allow_html=True)
 
-def plot_top5_genero_musicas_ouvidas(user_id):
-    df_top5_generos = q.get_top5_genero_musicas_ouvidas(user_id)
+@medir_grafico
+def plot_top5_genero_musicas_ouvidas(profile):
+    df_top5_generos = profile.top5_generos
     if df_top5_generos.empty:
         st.info(f"O usuário não possui dados suficientes de reprodução de música para gerar o gráfico.")
     else:
@@ -553,8 +577,9 @@ def plot_top5_genero_musicas_ouvidas(user_id):
 
         st.plotly_chart(fig_pie_genero, use_container_width=True)
 
-def plot_top5_artistas_ouvidos(user_id_logado):
-    df_top5 = q.get_top5_artistas_ouvidos(user_id_logado)
+@medir_grafico
+def plot_top5_artistas_ouvidos(profile):
+    df_top5 = profile.top5_artistas
 
     if not df_top5.empty:
         df_top5 = df_top5.reset_index()
@@ -598,8 +623,9 @@ def plot_top5_artistas_ouvidos(user_id_logado):
     else:
         st.info("Você ainda não possui um ranking de artistas.")
 
-def plot_top5_musicas_usuario(user_id_logado):
-    df_top5 = q.get_top5_musicas_ouvidas(user_id_logado)
+@medir_grafico
+def plot_top5_musicas_usuario(profile):
+    df_top5 = profile.top5_musicas
 
     if not df_top5.empty:
         df_top5 = df_top5.reset_index()
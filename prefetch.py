@@ -0,0 +1,141 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from cache import get_cache
+from db import raise_query_errors, registrar_tabelas
+
+
+@st.cache_resource
+def _executor():
+    # Pool limitado e compartilhado por todas as sessões, para não estourar o
+    # pool de conexões do banco
+    load_dotenv()
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("PREFETCH_WORKERS") or 8),
+        thread_name_prefix="prefetch",
+    )
+
+
+def _assincrono():
+    # DB_ASYNC=true: as abas usam a camada assíncrona (db_async) em vez das threads
+    load_dotenv()
+    return (os.getenv("DB_ASYNC") or "false").strip().lower() in ("1", "true", "yes", "on", "sim")
+
+
+def _executar(ctx, funcao, lidas):
+    # Anexa o contexto da sessão à thread: sem ele as chamadas st.* feitas
+    # pelas tarefas numa thread do pool não sabem a que sessão pertencem
+    add_script_run_ctx(threading.current_thread(), ctx)
+    with raise_query_errors(), registrar_tabelas(lidas):
+        return funcao()
+
+
+async def _executar_async(corrotina, lidas):
+    with registrar_tabelas(lidas):
+        return await corrotina
+
+
+class Prefetch:
+    """Dispara as queries de uma aba em paralelo antes de desenhar os widgets."""
+
+    def __init__(self, tarefas, aba=None):
+        self._aba = aba
+        # tabela -> versão de tudo que as tarefas leram (ver em_dia)
+        self._lidas = {}
+        if _assincrono():
+            # As tarefas viram corrotinas no event loop de db_async, limitadas
+            # pelo semáforo dele, em vez de ocupar threads do pool de prefetch
+            from db_async import assincrona, executar
+            self._futures = {nome: executar(_executar_async(assincrona(funcao)(), self._lidas))
+                             for nome, funcao in tarefas.items()}
+            return
+        ctx = get_script_run_ctx()
+        executor = _executor()
+        self._futures = {
+            nome: executor.submit(_executar, ctx, funcao, self._lidas)
+            for nome, funcao in tarefas.items()
+        }
+
+    def em_dia(self):
+        # Enquanto alguma tarefa roda as tabelas lidas ainda não são todas
+        # conhecidas; depois, os dados valem até uma delas mudar de versão
+        if not all(future.done() for future in self._futures.values()):
+            return True
+        lidas = dict(self._lidas)
+        tabelas = sorted(lidas)
+        return get_cache().versoes(tabelas) == tuple(lidas[tabela] for tabela in tabelas)
+
+    def get(self, nome, padrao=None, mensagem="Erro ao carregar os dados"):
+        # Espera o resultado; se a query falhou, mostra o erro no widget atual
+        try:
+            return self._futures[nome].result()
+        except Exception as e:
+            st.error(f"{mensagem}: {e}")
+            # Não guarda na sessão uma aba que falhou: tenta de novo no próximo rerun
+            if self._aba is not None:
+                st.session_state.get("dados_abas", {}).pop(self._aba, None)
+            return padrao
+
+
+def _aquecer(funcao):
+    with raise_query_errors():
+        funcao()
+
+
+@st.cache_resource
+def aquecer_cache():
+    # Uma vez por processo: popula o cache com todas as consultas globais em
+    # segundo plano, para o primeiro visitante depois de um deploy não pagar
+    # pelos agregados
+    executor = _executor()
+    tarefas = {**tarefas_geral(), **tarefas_artistas()}
+    return [executor.submit(_aquecer, funcao) for funcao in tarefas.values()]
+
+
+def carregar_aba(aba, tarefas):
+    # Dados de uma aba: só disparados quando ela é aberta e mantidos na sessão
+    # até mudar alguma das tabelas que as consultas dela leram
+    abas = st.session_state.setdefault("dados_abas", {})
+    if aba not in abas or not abas[aba].em_dia():
+        abas[aba] = Prefetch(tarefas, aba=aba)
+    return abas[aba]
+
+
+def tarefas_geral():
+    # Consultas da aba Visão Geral (app.py); as mesmas aquecidas no startup
+    import queries as q
+    return {"overview": q.get_overview_snapshot}
+
+
+def tarefas_artistas():
+    # Consultas da aba de artistas (app.py), incluindo a primeira página da
+    # busca que o plot_info_artista mostra com o campo vazio
+    import queries as q
+    return {
+        "art_mais_seguidores": q.get_art_mais_seguidores,
+        "art_mais_mus_publi": q.get_art_mais_mus_publi,
+        "tops": q.get_tops_por_artista,
+        "busca_artistas": lambda: q.get_artistas_por_nome("", 0),
+    }
+
+
+def tarefas_usuario(user_id):
+    # Consultas da aba do usuário (app.py); as mesmas disparadas já no login
+    import queries as q
+    return {"profile": lambda: q.get_user_profile(user_id)}
+
+
+def aquecer_usuario(user_id):
+    # Chamado pelo login assim que o id da conta é conhecido: as consultas da
+    # aba do usuário rodam em segundo plano enquanto o app.py carrega, e a aba
+    # reaproveita o mesmo Prefetch guardado na sessão
+    carregar_aba("usuario", tarefas_usuario(user_id))
+
+
+def limpar_abas():
+    st.session_state.pop("dados_abas", None)
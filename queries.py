@@ -1,446 +1,472 @@
-import streamlit as st
-import altair as alt
+import os
 import pandas as pd
+from dataclasses import dataclass
+from dotenv import load_dotenv
 from db import run_query
+import leaderboards as lb
+import rankings as rk
 
 # ------ TAB ARTISTA ------
-def get_top3_musicas_art(id_do_artista):
-    # Top 3 músicas mais ouvidas de um artista
-    query = '''
-    SELECT 
-        musica.nome,
-        escutamusica.numero_reproducoes    
-    FROM musica
-        JOIN escutamusica ON musica.id_da_musica = escutamusica.id_da_musica
-        JOIN album ON musica.id_album = album.id_album
-        JOIN conteudo ON album.id_album = conteudo.id
-        WHERE conteudo.id_do_artista = %s
-            ORDER BY escutamusica.numero_reproducoes DESC
-            LIMIT 3; '''
-    return run_query(query, (id_do_artista,))
+
+def fatias_pizza():
+    # Fatias dos gráficos de pizza antes do "Outros" (PIE_TOP_K no .env)
+    load_dotenv()
+    return int(os.getenv("PIE_TOP_K") or 10)
 
 
 def get_art_mais_seguidores():
-    query = '''
-    SELECT Conta.nome, COUNT(Seguir.id_do_usuario) AS total_seguidores
-    FROM Seguir 
-        JOIN Conta ON Seguir.id_da_conta = Conta.id
-        JOIN Artista ON Artista.id_do_artista = Conta.id
-        GROUP BY Conta.nome
-        ORDER BY total_seguidores DESC
-        LIMIT 1;'''
-    return run_query(query)
-
-
-def get_album_mais_salvo_do_artista(id_do_artista):
-    # Query para o album mais salvo de um artista específico
-    query = """
-    SELECT
-        C_ALBUM.nome AS Nome_do_Album,
-        COUNT(SA.id_album) AS Total_de_Vezes_Salvo
-    FROM
-        SalvaAlbum SA 
-    JOIN
-        Album ALB ON SA.id_album = ALB.id_album
-    JOIN
-        Conteudo C_ALBUM ON ALB.id_album = C_ALBUM.id 
-    WHERE
-        C_ALBUM.id_do_artista = %s  -- Parâmetro para o ID do artista
-    GROUP BY
-        C_ALBUM.nome
-    ORDER BY
-        Total_de_Vezes_Salvo DESC
-    LIMIT 1;"""
-
-    return run_query(query, (id_do_artista,))
-
-
-def check_artist_type(id_artista):
-    # Verifica se um artista tem conteúdo de podcast ou de álbum.
-    query_podcast = """
-        SELECT EXISTS (
-            SELECT 1
-            FROM Podcast p
-            JOIN Conteudo c ON p.id_podcast = c.id
-            WHERE c.id_do_artista = %s
-        );
-    """
-    df_podcast = run_query(query_podcast, (id_artista,))
-    if not df_podcast.empty and df_podcast.iloc[0]['exists']:
-        return 'podcaster'
-
-    # Verifica se existe algum álbum associado a este artista
-    query_album = """
-        SELECT EXISTS (
-            SELECT 1
-            FROM Album a
-            JOIN Conteudo c ON a.id_album = c.id
-            WHERE c.id_do_artista = %s
-        );
-    """
-    df_album = run_query(query_album, (id_artista,))
-    if not df_album.empty and df_album.iloc[0]['exists']:
-        return 'musico'
-    return 'desconhecido'
-
-def get_top3_episodios_podcaster(id_artista):
-    # Retorna os top 3 episódios mais ouvidos de um podcaster
-    query = """
-    SELECT
-        e.nome,
-        ee.numero_reproducoes
-    FROM EscutaEpisodio ee
-    JOIN Episodio e ON ee.id_episodio = e.id_episodio
-    JOIN Podcast p ON e.id_podcast = p.id_podcast
-    JOIN Conteudo c ON p.id_podcast = c.id
-    WHERE c.id_do_artista = %s
-    ORDER BY ee.numero_reproducoes DESC
-    LIMIT 3;
-    """
-    return run_query(query, (id_artista,))
+    query = rk.top_n(lb.fonte("mv_art_seguidores", 1), ["nome", "total_seguidores"], "total_seguidores", 1,
+                     desempate="id_do_artista")
+    return run_query(query + ";")
 
 
-def get_seguidores_podcast_artista(id_artista):
-    # Retorna o total de seguidores dos podcasts de um artista
-    query = """
-    SELECT
-        COUNT(sp.id_da_conta) AS total_seguidores
-    FROM SeguePodcast sp
-    JOIN Podcast p ON sp.id_podcast = p.id_podcast
-    JOIN Conteudo c ON p.id_podcast = c.id
-    WHERE c.id_do_artista = %s;
-    """
-    return run_query(query, (id_artista,))
+# Tamanho da página da busca de artistas da aba 2
+ARTISTAS_POR_PAGINA = 20
 
 
-def get_all_episode_plays_by_artist(id_artista):
-    # Retorna as reproduções dos episódios de um podcaster
-    query = """
-    SELECT
-        e.nome,
-        ee.numero_reproducoes
-    FROM EscutaEpisodio ee
-    JOIN Episodio e ON ee.id_episodio = e.id_episodio
-    JOIN Podcast p ON e.id_podcast = p.id_podcast
-    JOIN Conteudo c ON p.id_podcast = c.id
-    WHERE c.id_do_artista = %s AND ee.numero_reproducoes > 0
-    ORDER BY ee.numero_reproducoes DESC;
-    """
-    return run_query(query, (id_artista,))
-
-def get_all_artists():
-    query = """
-        SELECT a.id_do_artista, c.nome
-        FROM Artista a
-        JOIN Conta c ON a.id_do_artista = c.id
-        ORDER BY c.nome;
-    """
-    return run_query(query)
+# Tipos compactos dos resultados (ver db.aplicar_schema)
+_SCHEMA_ARTISTAS = {"id_do_artista": "inteiro", "nome": "texto", "tipo": "categoria"}
 
-def get_song_count_per_album(id_artista):
-    query = """
-        SELECT ct.nome AS nome_album, COUNT(m.id_da_musica) AS total_musicas
-        FROM Musica m
-        JOIN Album al ON m.id_album = al.id_album
-        JOIN Conteudo ct ON al.id_album = ct.id
-        WHERE ct.id_do_artista = %s
-        GROUP BY ct.nome
-        ORDER BY total_musicas DESC;
-    """
-    return run_query(query, (id_artista,))
 
-def get_albums_by_artist(id_artista):
-    query = """
-        SELECT al.id_album, ct.nome AS nome_album
-        FROM Album al
-        JOIN Conteudo ct ON al.id_album = ct.id
-        WHERE ct.id_do_artista = %s
-        ORDER BY nome_album;
-    """
-    return run_query(query, (id_artista,))
+def _escapar_like(termo):
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def get_artistas_por_nome(termo, pagina=0, por_pagina=ARTISTAS_POR_PAGINA):
+    # Uma página de artistas cujo nome contém o termo (índice de trigramas em
+    # mv_artistas.nome), começando pelos que começam com ele. Traz uma linha a
+    # mais que a página para indicar se existe a próxima.
+    termo = (termo or "").strip()
+    fonte = lb.fonte("mv_artistas")
+    paginacao = (por_pagina + 1, pagina * por_pagina)
+    if not termo:
+        query = f"""
+        SELECT id_do_artista, nome, tipo
+        FROM {fonte}
+        ORDER BY nome, id_do_artista
+        LIMIT %s OFFSET %s;"""
+        return run_query(query, paginacao, schema=_SCHEMA_ARTISTAS)
+
+    escapado = _escapar_like(termo)
+    query = f"""
+    SELECT id_do_artista, nome, tipo
+    FROM {fonte}
+    WHERE nome ILIKE %s
+    ORDER BY nome ILIKE %s DESC, nome, id_do_artista
+    LIMIT %s OFFSET %s;"""
+    return run_query(query, (f"%{escapado}%", f"{escapado}%") + paginacao, schema=_SCHEMA_ARTISTAS)
 
-def get_song_plays_by_album(id_album):
-    query = """
-        SELECT m.nome AS musica,
-               COUNT(em.id_da_conta) AS reproducoes
-        FROM Musica m
-        LEFT JOIN EscutaMusica em
-               ON m.id_da_musica = em.id_da_musica
-        WHERE m.id_album = %s
-        GROUP BY m.nome
-        ORDER BY reproducoes DESC;
-    """
-    return run_query(query, (id_album,))
 
 # ------ TAB GERAL ------
 
-def get_total_musicas_geral_count():
-    query = "SELECT COUNT(*) AS total FROM Musica;"
-    return run_query(query)
+def _top5_musicas():
+    return rk.top_n(lb.fonte("mv_top_musicas", 5), ["nome_da_musica", "nome_do_album", "total_de_reproducoes"],
+                    "total_de_reproducoes", 5, desempate="id_da_musica")
 
 
-def get_total_artistas_geral_count():
-    query = "SELECT COUNT(*) AS total FROM Artista;"
-    return run_query(query)
+def _top10_albuns_faixas():
+    return rk.top_n(lb.fonte("mv_albuns_faixas", 10), ["nome", "total_de_musicas"], "total_de_musicas", 10,
+                    desempate="id_album")
 
-def get_total_album_geral_count():
-    query = "SELECT COUNT(*) AS total FROM Album;"
-    return run_query(query)
 
-def get_total_podcasts_geral_count():
-    query = "SELECT COUNT(*) AS total FROM Podcast;"
-    return run_query(query)
+def _top5_albuns_salvos():
+    return rk.top_n(lb.fonte("mv_top_albuns_salvos", 5), ["nome", "total_salvos"], "total_salvos", 5,
+                    desempate="id_album")
 
-def get_top5_musicas_geral():
-    # 5 musicas mais ouvidas no spotify
-    query = """
-    SELECT
-        M.nome AS Nome_da_Musica,
-        C.nome AS Nome_do_Album,
-        SUM(EM.numero_reproducoes) AS Total_de_Reproducoes
-    FROM EscutaMusica EM
-        JOIN Musica M ON EM.id_da_musica = M.id_da_musica
-        JOIN Album A ON M.id_album = A.id_album
-        JOIN Conteudo C ON A.id_album = C.id
-    GROUP BY M.id_da_musica, M.nome, C.nome
-    ORDER BY Total_de_Reproducoes DESC
-    LIMIT 5;"""
-
-    return run_query(query)
-
-
-def get_top_10_albuns_com_mais_faixas():
-    # Busca o ranking de top 10 álbuns com mais músicas
-    query = """
-        SELECT ct.nome,
-        COUNT(m.id_da_musica) AS total_de_musicas
-        FROM Musica AS m
-        JOIN Album AS al ON m.id_album = al.id_album
-        JOIN Conteudo AS ct ON al.id_album = ct.id
-        GROUP BY ct.nome
-        ORDER BY total_de_musicas DESC
-        LIMIT 10;"""
-
-    return run_query(query)
-
-def get_top5_albuns_salvos():
-    # Top 5 albuns mais seguidos
-    query = '''
-    SELECT Conteudo.nome, COUNT(SalvaAlbum.id_da_conta) AS total_salvos
-    FROM SalvaAlbum 
-        JOIN Album ON SalvaAlbum.id_album = Album.id_album
-        JOIN Conteudo ON Album.id_album = Conteudo.id
-        GROUP BY Conteudo.nome
-            ORDER BY total_salvos DESC
-            LIMIT 5;'''
-    return run_query(query)
-
-
-def get_top5_podcast_seguidos():
-    # Top 5 podcasts mais seguidos
-    query = '''
-    SELECT Conteudo.nome, COUNT(SeguePodcast.id_da_conta) AS total_seguidores
-    FROM SeguePodcast
-        JOIN Podcast ON SeguePodcast.id_podcast = Podcast.id_podcast
-        JOIN Conteudo ON Podcast.id_podcast = Conteudo.id
-        GROUP BY Conteudo.nome
-            ORDER BY total_seguidores DESC
-            LIMIT 5;'''
 
-    return run_query(query)
+def _top5_podcasts_seguidos():
+    return rk.top_n(lb.fonte("mv_top_podcasts_seguidos", 5), ["nome", "total_seguidores"], "total_seguidores", 5,
+                    desempate="id_podcast")
+
 
 def get_art_mais_mus_publi():
-    # Artista com o maior número de músicas publicadas
-    query = '''
-    SELECT Conta.nome AS nome_artista,
-    COUNT(Musica.id_da_musica) AS numero_musicas
-    FROM Artista, Conta, Conteudo, Album, Musica
-    WHERE Artista.id_do_artista = Conta.id
-        AND Conteudo.id_do_artista = Artista.id_do_artista
-        AND Album.id_album = Conteudo.id
-        AND Musica.id_album = Album.id_album
-        GROUP BY Conta.nome
-            HAVING COUNT(Musica.id_da_musica) = (
-            SELECT MAX(total) FROM (
-                SELECT COUNT(Musica.id_da_musica) AS total
-                    FROM Artista, Conta, Conteudo, Album, Musica
-                        WHERE Artista.id_do_artista = Conta.id
-                            AND Conteudo.id_do_artista = Artista.id_do_artista
-                            AND Album.id_album = Conteudo.id
-                            AND Musica.id_album = Album.id_album
-                            GROUP BY Conta.nome
+    # Artista(s) com o maior número de músicas publicadas: RANK mantém os empatados em 1º
+    query = rk.top_n(lb.fonte("mv_art_musicas_publicadas"), ["nome_artista", "numero_musicas"], "numero_musicas", 1,
+                     empates="rank", desempate="id_do_artista")
+    return run_query(query + ";")
+
+
+# ------ SNAPSHOT DA VISÃO GERAL ------
+
+@dataclass(frozen=True)
+class OverviewSnapshot:
+    # Todos os dados da aba "Visão Geral", buscados em uma única ida ao banco
+    total_musicas: int
+    total_artistas: int
+    total_albuns: int
+    total_podcasts: int
+    top5_musicas: pd.DataFrame
+    top10_albuns_faixas: pd.DataFrame
+    top5_albuns_salvos: pd.DataFrame
+    top5_podcasts_seguidos: pd.DataFrame
+
+
+def _primeira_linha(df):
+    # Primeira linha de um resultado como dict (vazio se não houver linhas)
+    return df.iloc[0].to_dict() if not df.empty else {}
+
+
+def _int(valor):
+    return int(valor) if valor is not None and not pd.isna(valor) else 0
+
+
+def _json_df(valor, colunas):
+    # Converte um json_agg (lista de dicts ou NULL) em DataFrame com colunas fixas
+    if not isinstance(valor, list):
+        return pd.DataFrame(columns=colunas)
+    return pd.DataFrame(valor, columns=colunas)
+
+
+def _rotulo_outros(df, rotulo, particao=None):
+    # Fatia do restante (coluna outros do rk.top_n_com_outros) com um rótulo que
+    # nenhum item real da mesma pizza tem: o plotly soma fatias de mesmo nome
+    if df.empty:
+        return df
+    df = df.copy()
+    outros = df["outros"].astype(bool)
+    for _, grupo in (df.groupby(particao) if particao else [(None, df)]):
+        restante = grupo.index[outros[grupo.index]]
+        if restante.empty:
+            continue
+        reais = set(grupo.loc[~outros[grupo.index], rotulo])
+        base = novo = df.at[restante[0], rotulo]
+        i = 1
+        while novo in reais:
+            novo = f"{base} (demais)" if i == 1 else f"{base} (demais {i})"
+            i += 1
+        df.loc[restante, rotulo] = novo
+    return df
+
+
+def get_overview_snapshot():
+    # Os 4 totais e os 4 rankings da aba 1 em um único statement
+    query = f"""
+    WITH top_musicas AS ({_top5_musicas()}),
+    top_albuns_faixas AS ({_top10_albuns_faixas()}),
+    top_albuns_salvos AS ({_top5_albuns_salvos()}),
+    top_podcasts AS ({_top5_podcasts_seguidos()})
+    SELECT
+        (SELECT COUNT(*) FROM Musica) AS total_musicas,
+        (SELECT COUNT(*) FROM Artista) AS total_artistas,
+        (SELECT COUNT(*) FROM Album) AS total_albuns,
+        (SELECT COUNT(*) FROM Podcast) AS total_podcasts,
+        (SELECT json_agg(t ORDER BY t.total_de_reproducoes DESC) FROM top_musicas t) AS top5_musicas,
+        (SELECT json_agg(t ORDER BY t.total_de_musicas DESC) FROM top_albuns_faixas t) AS top10_albuns_faixas,
+        (SELECT json_agg(t ORDER BY t.total_salvos DESC) FROM top_albuns_salvos t) AS top5_albuns_salvos,
+        (SELECT json_agg(t ORDER BY t.total_seguidores DESC) FROM top_podcasts t) AS top5_podcasts_seguidos;
+    """
+    return build_overview_snapshot(_primeira_linha(run_query(query)))
+
+
+def build_overview_snapshot(linha):
+    # Monta o snapshot a partir da linha retornada (dict vazio = snapshot vazio)
+    return OverviewSnapshot(
+        total_musicas=_int(linha.get("total_musicas")),
+        total_artistas=_int(linha.get("total_artistas")),
+        total_albuns=_int(linha.get("total_albuns")),
+        total_podcasts=_int(linha.get("total_podcasts")),
+        top5_musicas=_json_df(linha.get("top5_musicas"), ["nome_da_musica", "nome_do_album", "total_de_reproducoes"]),
+        top10_albuns_faixas=_json_df(linha.get("top10_albuns_faixas"), ["nome", "total_de_musicas"]),
+        top5_albuns_salvos=_json_df(linha.get("top5_albuns_salvos"), ["nome", "total_salvos"]),
+        top5_podcasts_seguidos=_json_df(linha.get("top5_podcasts_seguidos"), ["nome", "total_seguidores"]),
     )
-    );'''
-    return run_query(query)
 
 
-# ------ TAB USUÁRIO -------
-def get_top1_musica_ouvida(user_id):
-    # A música mais ouvida do usuário
-    query = '''
-    SELECT Musica.nome, EscutaMusica.numero_reproducoes 
-    FROM EscutaMusica
-        JOIN Musica ON EscutaMusica.id_da_musica = Musica.id_da_musica
-        WHERE EscutaMusica.id_da_conta = %s
-        ORDER BY EscutaMusica.numero_reproducoes DESC
-        LIMIT 1;'''
-    return run_query(query, (user_id,))
+# ------ SNAPSHOT DO ARTISTA ------
 
+@dataclass(frozen=True)
+class ArtistSnapshot:
+    # Tudo o que plot_info_artista mostra de um artista, em uma única ida ao banco
+    # (os top-N vêm de get_tops_por_artista, já calculados para todos)
+    tipo: str
+    musicas_por_album: pd.DataFrame
+    albuns: pd.DataFrame
+    plays_por_album: pd.DataFrame
+    total_seguidores_podcast: int
+    plays_episodios: pd.DataFrame
 
-def get_top1_art_ouvido(user_id):
-    # Artista mais ouvido pelo usuário
-    query = '''
-    WITH ReproducoesMusica AS ( 
-    -- Calcula o total de reproduções de músicas por Artista para o usuário
-    SELECT Conteudo.id_do_artista, 
-    SUM(EscutaMusica.numero_reproducoes) AS total_reproducoes 
-        FROM EscutaMusica 
-        JOIN Musica ON EscutaMusica.id_da_musica = Musica.id_da_musica
-        JOIN Album ON Musica.id_album = Album.id_album 
-        JOIN Conteudo ON Album.id_album = Conteudo.id 
-        WHERE EscutaMusica.id_da_conta = %s
-        GROUP BY Conteudo.id_do_artista 
+    def plays_do_album(self, id_album):
+        # Reproduções das músicas de um álbum, respondido da memória
+        df = self.plays_por_album
+        return df[df["id_album"] == id_album][["musica", "reproducoes"]].reset_index(drop=True)
+
+
+def get_artist_snapshot(id_artista, fatias=None):
+    # Tipo do artista, discografia e reproduções por álbum/episódio (pizzas com "Outros")
+    fatias = fatias or fatias_pizza()
+    query = f"""
+    WITH conteudo_artista AS (
+        SELECT id, nome FROM Conteudo WHERE id_do_artista = %s
+    ),
+    albuns AS (
+        SELECT al.id_album, ca.nome AS nome_album
+        FROM Album al
+            JOIN conteudo_artista ca ON al.id_album = ca.id
+    ),
+    podcasts AS (
+        SELECT p.id_podcast
+        FROM Podcast p
+            JOIN conteudo_artista ca ON p.id_podcast = ca.id
+    ),
+    musicas_por_album AS (
+        SELECT a.nome_album, COUNT(m.id_da_musica) AS total_musicas
+        FROM Musica m
+            JOIN albuns a ON m.id_album = a.id_album
+        GROUP BY a.nome_album
+    ),
+    plays_musica AS (
+        SELECT m.id_album, m.id_da_musica, m.nome AS musica, COUNT(em.id_da_conta) AS reproducoes
+        FROM Musica m
+            JOIN albuns a ON m.id_album = a.id_album
+            LEFT JOIN EscutaMusica em ON m.id_da_musica = em.id_da_musica
+        GROUP BY m.id_album, m.id_da_musica, m.nome
+    ),
+    plays_album AS ({rk.top_n_com_outros("plays_musica", "musica", "reproducoes", fatias,
+                                         particao="id_album", desempate="id_da_musica")}),
+    plays_episodio AS (
+        SELECT e.id_episodio, e.nome, SUM(ee.numero_reproducoes) AS numero_reproducoes
+        FROM EscutaEpisodio ee
+            JOIN Episodio e ON ee.id_episodio = e.id_episodio
+            JOIN podcasts p ON e.id_podcast = p.id_podcast
+        WHERE ee.numero_reproducoes > 0
+        GROUP BY e.id_episodio, e.nome
     ),
-    ReproducoesEpisodio AS ( 
-    -- Calcula o total de reproduções de episódios por Artista para o usuário
-    SELECT Conteudo.id_do_artista, 
-    SUM(EscutaEpisodio.numero_reproducoes) AS total_reproducoes
-        FROM EscutaEpisodio 
-        JOIN Episodio ON EscutaEpisodio.id_episodio = Episodio.id_episodio 
-        JOIN Podcast ON Episodio.id_podcast = Podcast.id_podcast 
-        JOIN Conteudo ON Podcast.id_podcast = Conteudo.id 
-        WHERE EscutaEpisodio.id_da_conta = %s 
-            GROUP BY Conteudo.id_do_artista 
+    episodios AS ({rk.top_n_com_outros("plays_episodio", "nome", "numero_reproducoes", fatias,
+                                       desempate="id_episodio")})
+    SELECT
+        CASE
+            WHEN EXISTS (SELECT 1 FROM podcasts) THEN 'podcaster'
+            WHEN EXISTS (SELECT 1 FROM albuns) THEN 'musico'
+            ELSE 'desconhecido'
+        END AS tipo,
+        (SELECT json_agg(t ORDER BY t.total_musicas DESC) FROM musicas_por_album t) AS musicas_por_album,
+        (SELECT json_agg(t ORDER BY t.nome_album) FROM albuns t) AS albuns,
+        (SELECT json_agg(t ORDER BY t.id_album, t.posicao) FROM plays_album t) AS plays_por_album,
+        (SELECT COUNT(sp.id_da_conta)
+            FROM SeguePodcast sp
+            JOIN podcasts p ON sp.id_podcast = p.id_podcast) AS total_seguidores_podcast,
+        (SELECT json_agg(t ORDER BY t.posicao) FROM episodios t) AS plays_episodios;
+    """
+    linha = _primeira_linha(run_query(query, (id_artista,)))
+
+    return ArtistSnapshot(
+        tipo=linha.get("tipo") or "desconhecido",
+        musicas_por_album=_json_df(linha.get("musicas_por_album"), ["nome_album", "total_musicas"]),
+        albuns=_json_df(linha.get("albuns"), ["id_album", "nome_album"]),
+        plays_por_album=_rotulo_outros(
+            _json_df(linha.get("plays_por_album"), ["id_album", "musica", "reproducoes", "outros"]),
+            "musica", particao="id_album"),
+        total_seguidores_podcast=_int(linha.get("total_seguidores_podcast")),
+        plays_episodios=_rotulo_outros(
+            _json_df(linha.get("plays_episodios"), ["nome", "numero_reproducoes", "outros"]), "nome"),
     )
-    -- Une os resultados e busca o artista com a maior contagem
-    SELECT Conta.nome, 
-    SUM(TabelaTemp.total_reproducoes) AS reproducoes_totais
-        FROM ( 
-            SELECT id_do_artista, total_reproducoes FROM ReproducoesMusica
-            UNION ALL 
-            SELECT id_do_artista, total_reproducoes FROM ReproducoesEpisodio 
-        ) AS TabelaTemp
-            JOIN Artista ON TabelaTemp.id_do_artista = Artista.id_do_artista 
-            JOIN Conta ON Artista.id_do_artista = Conta.id
-            GROUP BY Conta.nome
-            ORDER BY reproducoes_totais DESC 
-            LIMIT 1;'''
-    return run_query(query, (user_id, user_id))
-
-
-def get_genero_musica_ouvida(user_id):
-    # Gênero de album mais ouvido pelo usuário
-    query = '''
-    SELECT Musica.genero, 
-    SUM(EscutaMusica.numero_reproducoes) AS reproducoes_totais
-        FROM EscutaMusica 
-        JOIN Musica ON EscutaMusica.id_da_musica = Musica.id_da_musica
-        WHERE EscutaMusica.id_da_conta = %s
-        GROUP BY Musica.genero
-        ORDER BY reproducoes_totais DESC
-        LIMIT 1;'''
-    return run_query(query, (user_id,))
 
-def get_top5_genero_musicas_ouvidas(user_id):
-    # Gênero de album mais ouvido pelo usuário
+
+# ------ TOP-N DE TODOS OS ARTISTAS ------
+
+@dataclass(frozen=True)
+class ArtistTops:
+    top3_musicas: pd.DataFrame
+    album_mais_salvo: pd.DataFrame
+    top3_episodios: pd.DataFrame
+
+
+# Ranking em mv_tops_artista -> (campo de ArtistTops, colunas do DataFrame)
+_RANKINGS_ARTISTA = {
+    "musica": ("top3_musicas", ["nome", "numero_reproducoes"]),
+    "album_salvo": ("album_mais_salvo", ["nome_do_album", "total_de_vezes_salvo"]),
+    "episodio": ("top3_episodios", ["nome", "numero_reproducoes"]),
+}
+
+
+class TopsPorArtista:
+    # Dict id_do_artista -> {ranking: [(nome, valor), ...]}; trocar de artista
+    # na aba 2 é uma consulta a este dict, sem ir ao banco
+    def __init__(self, df=None):
+        self._por_artista = {}
+        if df is None or df.empty:
+            return
+        for id_artista, ranking, nome, valor in df[["id_do_artista", "ranking", "nome", "valor"]].itertuples(index=False):
+            self._por_artista.setdefault(int(id_artista), {}).setdefault(ranking, []).append((nome, int(valor)))
+
+    def __len__(self):
+        return len(self._por_artista)
+
+    def do_artista(self, id_artista):
+        rankings = self._por_artista.get(int(id_artista), {})
+        return ArtistTops(**{
+            campo: pd.DataFrame(rankings.get(ranking, []), columns=colunas)
+            for ranking, (campo, colunas) in _RANKINGS_ARTISTA.items()
+        })
+
+
+def get_tops_por_artista():
+    # Top 3 músicas, álbum mais salvo e top 3 episódios de todos os artistas
+    query = f"""
+    SELECT id_do_artista, ranking, nome, valor
+    FROM {lb.fonte("mv_tops_artista")}
+    ORDER BY id_do_artista, ranking, posicao;"""
+    schema = {"id_do_artista": "inteiro", "ranking": "categoria", "nome": "texto", "valor": "inteiro"}
+    # Até 7 linhas por artista do catálogo inteiro: lido via COPY
+    return TopsPorArtista(run_query(query, schema=schema, leitura="copy"))
+
+
+# ------ PERFIL DO USUÁRIO ------
+
+@dataclass(frozen=True)
+class UserProfile:
+    # Todas as métricas da aba "Análise do Usuário", derivadas de uma única leitura
+    total_musicas: int
+    tempo_total_segundos: int
+    genero_preferido: str
+    musica_favorita: str
+    artista_favorito: str
+    top5_musicas: pd.DataFrame
+    top5_generos: pd.DataFrame
+    top5_artistas: pd.DataFrame
+
+
+_COLUNAS_ESCUTAS = ["tipo", "nome", "genero", "duracao_segundos", "numero_reproducoes", "nome_artista"]
+# Gêneros e artistas se repetem muito entre as escutas de um usuário; nomes de
+# músicas e episódios quase nunca
+_SCHEMA_ESCUTAS = {
+    "tipo": "categoria",
+    "nome": "texto",
+    "genero": "categoria",
+    "duracao_segundos": "float32",
+    "numero_reproducoes": "inteiro",
+    "nome_artista": "categoria",
+}
+
+
+def get_escutas_usuario(user_id):
+    # Lê uma única vez as escutas de músicas e episódios do usuário,
+    # já com gênero, duração e artista de cada item
     query = '''
-    SELECT Musica.genero, 
-    SUM(EscutaMusica.numero_reproducoes) AS reproducoes_totais
-        FROM EscutaMusica 
+    SELECT 'musica' AS tipo,
+        Musica.nome,
+        Musica.genero,
+        EXTRACT(EPOCH FROM Musica.tempo_de_duracao)::float8 AS duracao_segundos,
+        EscutaMusica.numero_reproducoes,
+        Conta.nome AS nome_artista
+    FROM EscutaMusica
         JOIN Musica ON EscutaMusica.id_da_musica = Musica.id_da_musica
+        LEFT JOIN Album ON Musica.id_album = Album.id_album
+        LEFT JOIN Conteudo ON Album.id_album = Conteudo.id
+        LEFT JOIN Artista ON Conteudo.id_do_artista = Artista.id_do_artista
+        LEFT JOIN Conta ON Artista.id_do_artista = Conta.id
         WHERE EscutaMusica.id_da_conta = %s
-        GROUP BY Musica.genero
-        ORDER BY reproducoes_totais DESC
-        LIMIT 5;'''
-    return run_query(query, (user_id,))
-
-
-def get_genero_podcast_ouvido(user_id):
-    # Gênero de podcast mais ouvido pelo usuário
-    query = '''
-    SELECT Conteudo.genero, 
-    SUM(EscutaEpisodio.numero_reproducoes) AS reproducoes_totais
-        FROM EscutaEpisodio
-            JOIN Episodio ON EscutaEpisodio.id_episodio = Episodio.id_episodio
+    UNION ALL
+    SELECT 'episodio' AS tipo,
+        Episodio.nome,
+        NULL,
+        NULL,
+        EscutaEpisodio.numero_reproducoes,
+        Conta.nome AS nome_artista
+    FROM EscutaEpisodio
+        JOIN Episodio ON EscutaEpisodio.id_episodio = Episodio.id_episodio
         JOIN Podcast ON Episodio.id_podcast = Podcast.id_podcast
         JOIN Conteudo ON Podcast.id_podcast = Conteudo.id
-            WHERE EscutaEpisodio.id_da_conta = %s
-            GROUP BY Conteudo.genero
-            ORDER BY reproducoes_totais DESC
-            LIMIT 1;'''
-    return run_query(query, (user_id,))
+        JOIN Artista ON Conteudo.id_do_artista = Artista.id_do_artista
+        JOIN Conta ON Artista.id_do_artista = Conta.id
+        WHERE EscutaEpisodio.id_da_conta = %s;'''
+    return run_query(query, (user_id, user_id), schema=_SCHEMA_ESCUTAS)
+
+
+def _ranking_soma(df, chave, n):
+    # Soma as reproduções por chave e devolve as n maiores. A chave pode ser
+    # categórica (schema compacto): observed=True ignora categorias sem escutas
+    # e o resultado volta a ser texto comum para os gráficos
+    return (df.dropna(subset=[chave])
+              .groupby(chave, as_index=False, observed=True)["numero_reproducoes"].sum()
+              .rename(columns={"numero_reproducoes": "reproducoes_totais"})
+              .nlargest(n, "reproducoes_totais")
+              .astype({chave: object})
+              .reset_index(drop=True))
+
+
+def build_user_profile(df_escutas):
+    # Deriva as métricas da aba 3 a partir das escutas (vetorizado no pandas)
+    if df_escutas.empty:
+        df_escutas = pd.DataFrame(columns=_COLUNAS_ESCUTAS)
+    df_escutas = df_escutas.astype({"numero_reproducoes": "int64", "duracao_segundos": "float64"})
+
+    musicas = df_escutas[df_escutas["tipo"] == "musica"]
+
+    tempo_total = (musicas["duracao_segundos"] * musicas["numero_reproducoes"]).sum()
+    top5_musicas = (musicas.nlargest(5, "numero_reproducoes")[["nome", "numero_reproducoes"]]
+                           .reset_index(drop=True))
+    top5_generos = _ranking_soma(musicas, "genero", 5)
+    top5_artistas = (_ranking_soma(df_escutas, "nome_artista", 5)
+                     .rename(columns={"nome_artista": "nome"}))
+
+    return UserProfile(
+        total_musicas=len(musicas),
+        tempo_total_segundos=int(tempo_total) if not pd.isna(tempo_total) else 0,
+        genero_preferido=top5_generos.iloc[0]["genero"] if not top5_generos.empty else "N/A",
+        musica_favorita=top5_musicas.iloc[0]["nome"] if not top5_musicas.empty else "N/A",
+        artista_favorito=top5_artistas.iloc[0]["nome"] if not top5_artistas.empty else "N/A",
+        top5_musicas=top5_musicas,
+        top5_generos=top5_generos,
+        top5_artistas=top5_artistas,
+    )
+
 
+def _user_stats_disponivel():
+    # Tabelas de resumo da migrations/004_user_stats.sql (consulta cacheada pelo run_query)
+    df = run_query("SELECT to_regclass('user_artista_stats') IS NOT NULL AS existe;")
+    return not df.empty and bool(df.iloc[0]["existe"])
 
-def get_total_musicas_usuario(user_id):
-    query = """
-        SELECT COUNT(*) as total_musicas
-        FROM escutamusica
-            WHERE id_da_conta = %s;"""
-    return run_query(query, (user_id,))
 
-def get_top5_artistas_ouvidos(user_id):
+def get_user_profile(user_id):
+    if not _user_stats_disponivel():
+        # Sem o resumo mantido por triggers: agrega as escutas do usuário
+        return build_user_profile(get_escutas_usuario(user_id))
+
+    # Resumo por usuário: busca pela chave primária em user_stats e pelo
+    # prefixo (id_da_conta) das chaves de gênero e artista; as 5 músicas
+    # mais ouvidas vêm direto do índice de EscutaMusica por conta
     query = '''
-        WITH ReproducoesMusica AS ( 
-            -- Calcula o total de reproduções de músicas por Artista para o usuário
-            SELECT Conteudo.id_do_artista, 
-            SUM(EscutaMusica.numero_reproducoes) AS total_reproducoes 
-                FROM EscutaMusica 
+    SELECT
+        s.total_musicas,
+        s.tempo_total_segundos,
+        (SELECT json_agg(t ORDER BY t.numero_reproducoes DESC, t.nome) FROM (
+            SELECT Musica.nome, EscutaMusica.numero_reproducoes
+            FROM EscutaMusica
                 JOIN Musica ON EscutaMusica.id_da_musica = Musica.id_da_musica
-                JOIN Album ON Musica.id_album = Album.id_album 
-                JOIN Conteudo ON Album.id_album = Conteudo.id 
-                WHERE EscutaMusica.id_da_conta = %s
-                GROUP BY Conteudo.id_do_artista 
-            ),
-            ReproducoesEpisodio AS ( 
-            -- Calcula o total de reproduções de episódios por Artista para o usuário
-            SELECT Conteudo.id_do_artista, 
-            SUM(EscutaEpisodio.numero_reproducoes) AS total_reproducoes
-                FROM EscutaEpisodio 
-                JOIN Episodio ON EscutaEpisodio.id_episodio = Episodio.id_episodio 
-                JOIN Podcast ON Episodio.id_podcast = Podcast.id_podcast 
-                JOIN Conteudo ON Podcast.id_podcast = Conteudo.id 
-                WHERE EscutaEpisodio.id_da_conta = %s 
-                    GROUP BY Conteudo.id_do_artista 
-            )
-            -- Une os resultados e busca o artista com a maior contagem
-            SELECT Conta.nome, 
-            SUM(TabelaTemp.total_reproducoes) AS reproducoes_totais
-                FROM ( 
-                    SELECT id_do_artista, total_reproducoes FROM ReproducoesMusica
-                    UNION ALL 
-                    SELECT id_do_artista, total_reproducoes FROM ReproducoesEpisodio 
-                ) AS TabelaTemp
-                    JOIN Artista ON TabelaTemp.id_do_artista = Artista.id_do_artista 
-                    JOIN Conta ON Artista.id_do_artista = Conta.id
-                    GROUP BY Conta.nome
-                    ORDER BY reproducoes_totais DESC 
-                    LIMIT 5;'''
-    return run_query(query, (user_id, user_id))
-
-def get_top5_musicas_ouvidas(user_id):
-    query = '''
-    SELECT musica.nome,
-        escutamusica.numero_reproducoes
-    FROM musica
-        JOIN escutamusica ON musica.id_da_musica = escutamusica.id_da_musica
-        WHERE escutamusica.id_da_conta = %s
-        GROUP BY musica.id_da_musica, musica.nome, escutamusica.numero_reproducoes
-        ORDER BY escutamusica.numero_reproducoes DESC
-        LIMIT 5;'''
-    return run_query(query, (user_id,))
-
-def get_tempo_total_escutado_segundos(user_id):
-    query = """
-    SELECT SUM(EXTRACT(EPOCH FROM M.tempo_de_duracao) * EM.numero_reproducoes) AS total_segundos
-        FROM EscutaMusica EM
-        JOIN Musica M ON EM.id_da_musica = M.id_da_musica
-        WHERE EM.id_da_conta = %s;"""
-
-    df = run_query(query, (user_id,))
-
-    # Se o usuário não ouviu nada, o SUM retornará Nulo (None)
-    if df.empty or pd.isna(df.iloc[0]['total_segundos']):
-        return 0  # Retorna 0 segundos
-
-    # Retorna o total de segundos como um inteiro
-    return int(df.iloc[0]['total_segundos'])
\ No newline at end of file
+            WHERE EscutaMusica.id_da_conta = %(id)s
+            ORDER BY EscutaMusica.numero_reproducoes DESC, Musica.nome
+            LIMIT 5) t) AS top5_musicas,
+        (SELECT json_agg(t ORDER BY t.reproducoes_totais DESC, t.genero) FROM (
+            SELECT genero, reproducoes AS reproducoes_totais
+            FROM user_genero_stats
+            WHERE id_da_conta = %(id)s
+            ORDER BY reproducoes DESC, genero
+            LIMIT 5) t) AS top5_generos,
+        (SELECT json_agg(t ORDER BY t.reproducoes_totais DESC, t.nome) FROM (
+            SELECT Conta.nome, a.reproducoes AS reproducoes_totais
+            FROM user_artista_stats a
+                JOIN Conta ON a.id_do_artista = Conta.id
+            WHERE a.id_da_conta = %(id)s
+            ORDER BY a.reproducoes DESC, Conta.nome
+            LIMIT 5) t) AS top5_artistas
+    FROM (SELECT %(id)s AS id_da_conta) AS conta
+        LEFT JOIN user_stats s ON s.id_da_conta = conta.id_da_conta;'''
+    return build_user_profile_resumo(_primeira_linha(run_query(query, {"id": user_id})))
+
+
+def build_user_profile_resumo(linha):
+    # UserProfile a partir da linha de get_user_profile (contas sem escutas não têm resumo)
+    top5_musicas = _json_df(linha.get("top5_musicas"), ["nome", "numero_reproducoes"])
+    top5_generos = _json_df(linha.get("top5_generos"), ["genero", "reproducoes_totais"])
+    top5_artistas = _json_df(linha.get("top5_artistas"), ["nome", "reproducoes_totais"])
+    return UserProfile(
+        total_musicas=_int(linha.get("total_musicas")),
+        tempo_total_segundos=_int(linha.get("tempo_total_segundos")),
+        genero_preferido=top5_generos.iloc[0]["genero"] if not top5_generos.empty else "N/A",
+        musica_favorita=top5_musicas.iloc[0]["nome"] if not top5_musicas.empty else "N/A",
+        artista_favorito=top5_artistas.iloc[0]["nome"] if not top5_artistas.empty else "N/A",
+        top5_musicas=top5_musicas,
+        top5_generos=top5_generos,
+        top5_artistas=top5_artistas,
+    )
\ No newline at end of file
@@ -0,0 +1,15 @@
+import inspect
+
+import queries as q
+from db_async import assincrona
+
+# Versões assíncronas de todas as funções get_* de queries.py, com o mesmo nome
+# e os mesmos parâmetros. Ex.:
+#     import queries_async as qa
+#     from db_async import reunir
+#     overview, tops = reunir(qa.get_overview_snapshot(), qa.get_tops_por_artista())
+__all__ = []
+for _nome, _funcao in inspect.getmembers(q, inspect.isfunction):
+    if _nome.startswith("get_") and _funcao.__module__ == q.__name__:
+        globals()[_nome] = assincrona(_funcao)
+        __all__.append(_nome)
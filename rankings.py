@@ -0,0 +1,67 @@
+# ----------------------------------------
+# Rankings com funções de janela
+# ----------------------------------------
+# Todos os top-N do dashboard são montados aqui: a fonte é lida uma única vez,
+# a posição vem de ROW_NUMBER/RANK/DENSE_RANK e o corte é WHERE posicao <= n,
+# com ou sem PARTITION BY (top-N por artista, por álbum...). No Postgres 15+
+# o corte vira "run condition" da janela e a leitura para no n-ésimo item.
+
+# Como tratar empates na última posição:
+#   "linha": exatamente n linhas por partição (ROW_NUMBER; use desempate = chave)
+#   "rank":  n posições, incluindo todos os empatados na última (RANK)
+#   "denso": os n maiores valores distintos, com todos os empatados (DENSE_RANK)
+EMPATES = {"linha": "ROW_NUMBER()", "rank": "RANK()", "denso": "DENSE_RANK()"}
+
+
+def top_n(fonte, colunas, ordem, n, particao=None, empates="linha", desempate=None, filtro=None):
+    # SQL (sem ';') com as n primeiras linhas de `fonte` em ordem decrescente de `ordem`.
+    # `fonte` é um único item de FROM (tabela, view, CTE ou "(subquery) AS nome");
+    # `colunas`, `particao` e `desempate` são colunas dela. A coluna `posicao`
+    # também pode ser pedida em `colunas`.
+    if empates not in EMPATES:
+        raise ValueError(f"empates deve ser um de {sorted(EMPATES)}, não {empates!r}")
+    janela = f"{ordem} DESC"
+    if empates == "linha" and desempate:
+        # Em RANK/DENSE_RANK o desempate não entra na janela, senão quebraria os empates
+        janela += f", {desempate}"
+    if particao:
+        janela = f"PARTITION BY {particao} ORDER BY {janela}"
+    else:
+        janela = f"ORDER BY {janela}"
+    ordenacao = ", ".join(coluna for coluna in (particao, "posicao", desempate) if coluna)
+    return f"""
+        SELECT {", ".join(colunas)}
+        FROM (
+            SELECT *, {EMPATES[empates]} OVER ({janela}) AS posicao
+            FROM {fonte}
+            {f"WHERE {filtro}" if filtro else ""}
+        ) AS ranking
+        WHERE posicao <= {int(n)}
+        ORDER BY {ordenacao}"""
+
+
+def top_n_com_outros(fonte, rotulo, valor, n, particao=None, desempate=None, filtro=None, outros="Outros"):
+    # SQL (sem ';') com os n maiores itens de `fonte` por `valor` e mais uma linha
+    # somando o restante, com rótulo `outros` (por partição, se houver). Para os
+    # gráficos de pizza: no máximo n + 1 fatias, qualquer que seja o catálogo.
+    # Colunas: [particao,] posicao, <rotulo>, <valor>, outros. A coluna booleana
+    # outros marca a linha do restante: um item real pode ter o mesmo rótulo.
+    n = int(n)
+    janela = f"ORDER BY {valor} DESC" + (f", {desempate}" if desempate else "")
+    if particao:
+        janela = f"PARTITION BY {particao} {janela}"
+    agrupamento = ", ".join(coluna for coluna in (particao, f"LEAST(posicao, {n + 1})") if coluna)
+    outros = outros.replace("'", "''")
+    return f"""
+        SELECT
+            {f"{particao}, " if particao else ""}LEAST(posicao, {n + 1}) AS posicao,
+            CASE WHEN MIN(posicao) <= {n} THEN MIN({rotulo}) ELSE '{outros}' END AS {rotulo},
+            SUM({valor})::bigint AS {valor},
+            MIN(posicao) > {n} AS outros
+        FROM (
+            SELECT *, ROW_NUMBER() OVER ({janela}) AS posicao
+            FROM {fonte}
+            {f"WHERE {filtro}" if filtro else ""}
+        ) AS ranking
+        GROUP BY {agrupamento}
+        ORDER BY {", ".join(coluna for coluna in (particao, "posicao") if coluna)}"""
@@ -0,0 +1,90 @@
+"""Recalcula e verifica o resumo por usuário (user_stats, migrations/004).
+
+Uso (a partir da raiz do repositório, com o .env configurado):
+
+    python user_stats.py --backfill               # recalcula todas as contas
+    python user_stats.py --backfill --contas 1 2  # só as contas indicadas
+    python user_stats.py --verificar              # compara com as views *_ao_vivo
+    python user_stats.py --verificar --corrigir   # e recalcula as contas divergentes
+
+A verificação sai com código 1 se alguma conta divergir (e não for corrigida).
+O recálculo trava escritas em EscutaMusica/EscutaEpisodio enquanto roda; em
+bancos grandes prefira --contas ou um horário de pouco uso.
+"""
+import argparse
+import sys
+import time
+
+import streamlit.config
+import streamlit.logger
+
+# Sem os avisos de "bare mode" do Streamlit ao rodar pela linha de comando
+streamlit.config.set_option("logger.level", "error")
+streamlit.logger.set_log_level("error")
+
+from db import init_connection  # noqa: E402
+
+# Tabela de resumo -> (view com o agregado ao vivo, colunas comparadas)
+RESUMOS = {
+    "user_stats": ("user_stats_ao_vivo", "id_da_conta, total_musicas, tempo_total_segundos"),
+    "user_genero_stats": ("user_genero_stats_ao_vivo", "id_da_conta, genero, escutas, reproducoes"),
+    "user_artista_stats": ("user_artista_stats_ao_vivo", "id_da_conta, id_do_artista, escutas, reproducoes"),
+}
+
+
+def backfill(engine, contas=None):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("SELECT recalcular_user_stats(%s);", (contas,))
+
+
+def divergencias(engine):
+    # Tabela de resumo -> contas em que ela difere do agregado ao vivo
+    resultado = {}
+    with engine.connect() as conn:
+        for tabela, (view, colunas) in RESUMOS.items():
+            linhas = conn.exec_driver_sql(f"""
+                SELECT DISTINCT id_da_conta FROM (
+                    (SELECT {colunas} FROM {tabela} EXCEPT SELECT {colunas} FROM {view})
+                    UNION ALL
+                    (SELECT {colunas} FROM {view} EXCEPT SELECT {colunas} FROM {tabela})
+                ) AS diferencas
+                ORDER BY id_da_conta;""")
+            resultado[tabela] = [conta for (conta,) in linhas]
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", action="store_true", help="recalcula o resumo a partir das escutas")
+    parser.add_argument("--contas", type=int, nargs="+", help="restringe o backfill a estas contas")
+    parser.add_argument("--verificar", action="store_true", help="compara o resumo com as views *_ao_vivo")
+    parser.add_argument("--corrigir", action="store_true", help="com --verificar, recalcula as contas divergentes")
+    args = parser.parse_args(argv)
+    if not (args.backfill or args.verificar):
+        parser.error("use --backfill e/ou --verificar")
+
+    engine = init_connection()
+    if engine is None:
+        sys.exit("Não foi possível conectar ao banco (verifique o .env).")
+
+    if args.backfill:
+        inicio = time.perf_counter()
+        backfill(engine, args.contas)
+        alvo = f"{len(args.contas)} conta(s)" if args.contas else "todas as contas"
+        print(f"Resumo recalculado para {alvo} ({time.perf_counter() - inicio:.1f}s)")
+
+    if args.verificar:
+        por_tabela = divergencias(engine)
+        contas = sorted(set().union(*por_tabela.values()))
+        for tabela, divergentes in por_tabela.items():
+            print(f"{tabela}: {len(divergentes)} conta(s) divergente(s)"
+                  + (f" {divergentes[:10]}" if divergentes else ""))
+        if contas and args.corrigir:
+            backfill(engine, contas)
+            print(f"{len(contas)} conta(s) recalculada(s)")
+        elif contas:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()